@@ -1,5 +1,77 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
-from .models import Question
+from .counters import reset_votes
+from .models import Choice, Question
 
-admin.site.register(Question)
\ No newline at end of file
+# Written only by the counters with database-side updates, never from a form.
+COUNTER_FIELDS = {Question: {"total_votes", "leader"}, Choice: {"votes"}}
+
+
+def save_without_counters(obj):
+    """
+    Saves an edited question or choice without writing its counter columns back, so the
+    votes applied while the form was open are not overwritten with the values it loaded.
+    """
+    if obj._state.adding:
+        obj.save()
+        return
+    obj.save(update_fields=[
+        field.name
+        for field in obj._meta.concrete_fields
+        if not field.primary_key and field.name not in COUNTER_FIELDS[type(obj)]
+    ])
+
+
+class ChoiceInline(admin.TabularInline):
+    model = Choice
+    extra = 0
+    fields = ["choice_text", "votes"]
+    # Votes only change through the counters, see the reset action.
+    readonly_fields = ["votes"]
+
+
+@admin.register(Question)
+class QuestionAdmin(admin.ModelAdmin):
+    """
+    Lists the questions with their vote totals and leaders, read from the denormalized
+    ``Question.total_votes`` and ``Question.leader`` rather than aggregated per page,
+    and resets or closes the selected questions with set-based UPDATEs.
+    """
+
+    inlines = [ChoiceInline]
+    list_display = ["question_text", "pub_date", "total_votes", "leader", "is_closed"]
+    list_select_related = ["leader"]
+    search_fields = ["question_text"]
+    date_hierarchy = "pub_date"
+    # Walks the (pub_date, id) index.
+    ordering = ["-pub_date", "-id"]
+    # Skips the unfiltered COUNT(*) shown next to the search results.
+    show_full_result_count = False
+    readonly_fields = ["total_votes", "leader"]
+    actions = ["reset_selected_votes", "close_selected", "reopen_selected"]
+
+    def save_model(self, request, obj, form, change):
+        save_without_counters(obj)
+
+    def save_formset(self, request, form, formset, change):
+        instances = formset.save(commit=False)
+        for obj in formset.deleted_objects:
+            obj.delete()
+        for instance in instances:
+            save_without_counters(instance)
+        formset.save_m2m()
+
+    @admin.action(description="Reset the votes of the selected questions")
+    def reset_selected_votes(self, request, queryset):
+        count = reset_votes(queryset)
+        self.message_user(request, f"Reset the votes of {count} questions.", messages.SUCCESS)
+
+    @admin.action(description="Close the selected questions")
+    def close_selected(self, request, queryset):
+        count = queryset.update(is_closed=True)
+        self.message_user(request, f"Closed {count} questions.", messages.SUCCESS)
+
+    @admin.action(description="Reopen the selected questions")
+    def reopen_selected(self, request, queryset):
+        count = queryset.update(is_closed=False)
+        self.message_user(request, f"Reopened {count} questions.", messages.SUCCESS)
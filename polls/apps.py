@@ -1,6 +1,35 @@
-from django.apps import AppConfig
+import logging
+import time
+
+from django.apps import AppConfig, apps
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
 
 
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+
+        if getattr(settings, "POLLS_WARMUP_ON_READY", False):
+            self.warm_up()
+
+    def warm_up(self):
+        """
+        Warms the worker up before it serves, see ``polls.warmup``.
+
+        The URLconf can only be loaded once every app is ready, so the routes are only
+        resolved when polls is the last app in ``INSTALLED_APPS``.
+        """
+        from .warmup import STEPS, warm_up
+
+        steps = list(STEPS)
+        if list(apps.get_app_configs())[-1] is not self:
+            steps.remove("routes")
+
+        start = time.perf_counter()
+        warm_up(steps)
+        logger.info("Warmed up %s in %.1fms.", ", ".join(steps), (time.perf_counter() - start) * 1000)
@@ -0,0 +1,55 @@
+""" This package contains the benchmark suites run by the ``polls_bench`` command """
+
+import math
+import time
+
+
+def percentile(samples, fraction):
+    """
+    Returns the given percentile of a list of samples, by nearest rank.
+
+    Args:
+        samples (list): The samples, in any order.
+        fraction (float): The percentile, between 0 and 1 (e.g. 0.95).
+
+    Returns:
+        float: The sample at that percentile.
+
+    Raises:
+        ValueError: If there are no samples.
+    """
+    if not samples:
+        raise ValueError("No samples to take a percentile of.")
+
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def measure(func, iterations=1000, warmup=10):
+    """
+    Calls ``func`` repeatedly and summarizes its latency.
+
+    Args:
+        func (callable): The function to time, called without arguments.
+        iterations (int, optional): The number of timed calls. Defaults to 1000.
+        warmup (int, optional): The number of untimed calls made first. Defaults to 10.
+
+    Returns:
+        dict: The ``mean``, ``p50``, ``p95`` and ``p99`` latencies, in microseconds.
+    """
+    for _ in range(warmup):
+        func()
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1e6)
+
+    return {
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+    }
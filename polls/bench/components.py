@@ -0,0 +1,59 @@
+""" Benchmark of the component tags, rendered through templates and through the fast renderers """
+
+from django.template import Context, Template
+from django.test.utils import override_settings
+
+# One representative call per component, as used in the templates.
+COMPONENT_CALLS = {
+    "text": "{% load atoms_tags %}{% text 'Some text' size='1' %}",
+    "title": "{% load atoms_tags %}{% title 'Some title' size='2' %}",
+    "divider": "{% load molecules_tags %}{% divider 'Divider' orientation='center' type='horizontal' %}",
+    "breadcrumb": "{% load molecules_tags %}{% breadcrumb item1='Home' item2='General' type='3' item3='Info' %}",
+    "dropdown": "{% load molecules_tags %}{% dropdown title='English' type='primary' items=items %}",
+    "input_checkbox": "{% load molecules_tags %}{% input_checkbox label='Checkbox' checked=True %}",
+    "input_text": "{% load molecules_tags %}{% input_text placeholder='Enter your text ...' value=value left_icon='bi bi-person' %}",
+    "input_password": "{% load molecules_tags %}{% input_password placeholder='Password' left_icon='bi bi-lock' error=True %}",
+    "input_number": "{% load molecules_tags %}{% input_number min='2' max='10' step='2' value='2' placeholder='Enter a number' %}",
+    "input_search": "{% load molecules_tags %}{% input_search placeholder='Search by ...' value=value %}",
+}
+
+CONTEXT = {
+    "items": [{"label": "English", "active": True}, {"label": "Português"}, {"label": "Español", "disabled": True}],
+    "value": "Some <value>",
+}
+
+
+def run(measure, iterations):
+    """
+    Times every component with ``POLLS_COMPONENT_RENDERER`` set to "template" and "fast".
+
+    The component output cache is disabled, so every call renders. The two paths are
+    checked to produce the same HTML before being timed.
+
+    Args:
+        measure (callable): The timing function, see ``polls.bench.measure``.
+        iterations (int): The number of timed renders per component and path.
+
+    Returns:
+        dict: Per component, the ``template`` and ``fast`` latencies and the ``speedup``
+        of the fast path at the median.
+    """
+    results = {}
+
+    for name, source in COMPONENT_CALLS.items():
+        template = Template(source)
+        outputs = {}
+        timings = {}
+
+        for renderer in ("template", "fast"):
+            with override_settings(POLLS_COMPONENT_RENDERER=renderer, POLLS_COMPONENT_CACHE=False):
+                outputs[renderer] = template.render(Context(CONTEXT))
+                timings[renderer] = measure(lambda: template.render(Context(CONTEXT)), iterations)
+
+        if outputs["template"] != outputs["fast"]:
+            raise AssertionError(f"The fast renderer of {name} does not match its template.")
+
+        timings["speedup"] = timings["template"]["p50"] / timings["fast"]["p50"]
+        results[name] = timings
+
+    return results
@@ -0,0 +1,65 @@
+""" Benchmark of the polls forms and widgets rendering, with and without the widget cache """
+
+import datetime
+
+from django.test.utils import override_settings
+
+from polls.forms import ContactForm, MyForm
+from polls.templatetags.memo import render_cache
+from polls.widgets import CustomTextInput2, PasswordInput
+
+CONTACT_DATA = {
+    "subject": "Hi <there>",
+    "message": "Hello",
+    "sender": "not-an-email",
+    "cc_myself": "on",
+    "birth_year_year": "1981",
+    "birth_year_month": "2",
+    "birth_year_day": "3",
+}
+
+RENDERS = {
+    "contact_form": lambda: str(ContactForm()),
+    "contact_form_bound": lambda: str(ContactForm(CONTACT_DATA)),
+    "contact_form_initial": lambda: str(ContactForm(initial={"birth_year": datetime.date(1982, 12, 31)})),
+    "name_form": lambda: str(MyForm()),
+    "name_form_bound": lambda: str(MyForm({"test": "secret"})),
+    "password_input": lambda: PasswordInput(left_icon="bi bi-lock").render("password", "secret"),
+    "custom_text_input": lambda: CustomTextInput2().render("name", "value", attrs={}),
+}
+
+
+def run(measure, iterations):
+    """
+    Times the rendering of the polls forms and custom widgets, with ``POLLS_FORM_CACHE``
+    off and on.
+
+    The two paths are checked to produce the same HTML before being timed.
+
+    Args:
+        measure (callable): The timing function, see ``polls.bench.measure``.
+        iterations (int): The number of timed renders per form or widget and path.
+
+    Returns:
+        dict: Per form or widget, the ``uncached`` and ``cached`` latencies and the
+        ``speedup`` of the cached path at the median.
+    """
+    results = {}
+
+    for name, render in RENDERS.items():
+        outputs = {}
+        timings = {}
+
+        for path, enabled in (("uncached", False), ("cached", True)):
+            render_cache.clear()
+            with override_settings(POLLS_FORM_CACHE=enabled, POLLS_COMPONENT_CACHE=False):
+                outputs[path] = render()
+                timings[path] = measure(render, iterations)
+
+        if outputs["uncached"] != outputs["cached"]:
+            raise AssertionError(f"The cached rendering of {name} does not match.")
+
+        timings["speedup"] = timings["uncached"]["p50"] / timings["cached"]["p50"]
+        results[name] = timings
+
+    return results
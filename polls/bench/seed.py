@@ -0,0 +1,57 @@
+""" Seeds the benchmark database with polls """
+
+import datetime
+import random
+
+from django.utils import timezone
+
+from polls.counters import repair_question_totals
+from polls.models import Choice, Question
+
+
+def seed(questions=1000, choices=4, votes=100000, batch_size=1000, random_seed=0):
+    """
+    Fills the database with questions, choices and votes spread over the choices.
+
+    Args:
+        questions (int, optional): The number of questions. Defaults to 1000.
+        choices (int, optional): The number of choices per question. Defaults to 4.
+        votes (int, optional): The total number of votes. Defaults to 100000.
+        batch_size (int, optional): The number of rows per INSERT. Defaults to 1000.
+        random_seed (int, optional): The seed of the vote distribution. Defaults to 0.
+
+    Returns:
+        list: The ids of the created questions, newest first.
+    """
+    rng = random.Random(random_seed)
+    now = timezone.now()
+
+    Question.objects.bulk_create(
+        [
+            Question(question_text=f"Question {i}?", pub_date=now - datetime.timedelta(minutes=i))
+            for i in range(questions)
+        ],
+        batch_size=batch_size,
+    )
+    question_ids = list(Question.objects.order_by("-pub_date", "-id").values_list("id", flat=True)[:questions])
+
+    tallies = [0] * (len(question_ids) * choices)
+    for _ in range(votes):
+        tallies[rng.randrange(len(tallies))] += 1
+
+    Choice.objects.bulk_create(
+        [
+            Choice(
+                question_id=question_id,
+                choice_text=f"Choice {c}",
+                votes=tallies[q * choices + c],
+            )
+            for q, question_id in enumerate(question_ids)
+            for c in range(choices)
+        ],
+        batch_size=batch_size,
+    )
+    for index in range(0, len(question_ids), batch_size):
+        repair_question_totals(question_ids[index:index + batch_size])
+
+    return question_ids
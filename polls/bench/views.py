@@ -0,0 +1,80 @@
+""" Benchmark of the polls views, measuring latency and query count per request """
+
+from django.core.cache import cache
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from polls.models import Choice
+
+CONTACT_FORM_DATA = {
+    "subject": "Hello",
+    "message": "Benchmark message",
+    "sender": "bench@example.com",
+    "cc_myself": "on",
+    "birth_year_day": "1",
+    "birth_year_month": "1",
+    "birth_year_year": "1980",
+}
+
+
+def _requests(question_ids):
+    question_id = question_ids[0]
+    choice_id = Choice.objects.filter(question_id=question_id).values_list("id", flat=True).first()
+
+    return {
+        "index": ("get", reverse("polls:index"), None),
+        "archive": ("get", reverse("polls:archive"), None),
+        "top": ("get", reverse("polls:top"), None),
+        "detail": ("get", reverse("polls:detail", args=(question_id,)), None),
+        "results": ("get", reverse("polls:results", args=(question_id,)), None),
+        "data": ("get", reverse("polls:data", args=(question_id,)), None),
+        "vote": ("post", reverse("polls:vote", args=(question_id,)), {"choice": choice_id}),
+        "contact_form": ("get", reverse("polls:contact_form"), None),
+        "contact_form_post": ("post", reverse("polls:contact_form"), CONTACT_FORM_DATA),
+    }
+
+
+def run(measure, iterations, question_ids):
+    """
+    Times each polls view through the test client against the seeded database.
+
+    Each view is requested once with the cache cleared to count the queries of a cold
+    request, then timed warm.
+
+    Args:
+        measure (callable): The timing function, see ``polls.bench.measure``.
+        iterations (int): The number of timed requests per view.
+        question_ids (list): The ids of the seeded questions.
+
+    Returns:
+        dict: Per view, the latencies, the ``status`` code and the ``queries`` and
+        ``cold_queries`` counts of one warm and one cold request.
+    """
+    client = Client()
+    results = {}
+
+    for name, (method, url, data) in _requests(question_ids).items():
+        request = getattr(client, method)
+
+        # Every request clears the query log, so it must be empty when a capture starts
+        # and the captured queries must be counted before the next request.
+        cache.clear()
+        reset_queries()
+        with CaptureQueriesContext(connection) as cold:
+            request(url, data)
+        cold_queries = len(cold)
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as warm:
+            response = request(url, data)
+        queries = len(warm)
+
+        timings = measure(lambda: request(url, data), iterations)
+        timings["status"] = response.status_code
+        timings["queries"] = queries
+        timings["cold_queries"] = cold_queries
+        results[name] = timings
+
+    return results
@@ -0,0 +1,30 @@
+""" This module contains the system checks of the polls settings """
+
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from . import tallies
+
+# Caches that keep their entries in the process, so each worker has its own.
+PROCESS_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register()
+def check_tally_cache(app_configs, **kwargs):
+    """ Warns when the tally cache is not shared by the workers, outside of DEBUG. """
+    if settings.DEBUG:
+        return []
+    backend = tallies.get_cache()
+    path = f"{type(backend).__module__}.{type(backend).__name__}"
+    if path not in PROCESS_CACHES:
+        return []
+    return [
+        Warning(
+            f"The polls tally cache uses {path}, so each worker process keeps its own vote counts.",
+            hint="Point POLLS_TALLY_CACHE at a cache shared by every worker, e.g. Redis or Memcached.",
+            id="polls.W001",
+        )
+    ]
@@ -0,0 +1,424 @@
+""" This module contains the strategies used to apply votes to the Choice counters """
+
+import atexit
+import logging
+import random
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from . import history, tallies
+from .models import Choice, ChoiceVoteShard, Question, VoteOutbox
+
+logger = logging.getLogger(__name__)
+
+
+def apply_increments(increments, update_totals=False):
+    """
+    Applies vote increments to the database as atomic database-side updates.
+
+    The increment is computed by the database (``votes = votes + n``), so concurrent
+    writers never overwrite each other's votes and only the ``votes`` column is written.
+    When ``POLLS_VOTE_SHARDS`` is set, each increment lands on a random shard row of
+    the choice instead of the choice row itself.
+
+    Everything is written in one transaction, and the cached tallies are updated once
+    it commits.
+
+    Args:
+        increments (dict): A mapping of (question_id, choice_id) to the number of votes to add.
+        update_totals (bool, optional): Also add the votes to the totals and leaders of the
+            questions. Every choice of a question shares its row lock, so only batched
+            writes (the vote buffer and the outbox) do; single votes and shards leave the
+            totals to ``polls_repair_totals`` and ``polls_compact_shards``. Defaults to False.
+
+    Returns:
+        int: The number of counter rows updated.
+    """
+    by_choice = {}
+    for (_, choice_id), count in increments.items():
+        if count:
+            by_choice[choice_id] = by_choice.get(choice_id, 0) + count
+
+    if not by_choice:
+        return 0
+
+    # All or nothing, so a failed batch can be retried as a whole without counting twice.
+    with transaction.atomic():
+        shards = getattr(settings, "POLLS_VOTE_SHARDS", 0)
+        if shards:
+            updated = sum(
+                _increment_shard(choice_id, random.randrange(shards), count)
+                for choice_id, count in by_choice.items()
+            )
+        elif len(by_choice) == 1:
+            [(choice_id, count)] = by_choice.items()
+            updated = Choice.objects.filter(pk=choice_id).update(votes=F("votes") + count)
+        else:
+            delta = Case(
+                *[When(pk=choice_id, then=Value(count)) for choice_id, count in by_choice.items()],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            updated = Choice.objects.filter(pk__in=by_choice).update(votes=F("votes") + delta)
+
+        if update_totals and not shards:
+            by_question = {}
+            for (question_id, _), count in increments.items():
+                by_question[question_id] = by_question.get(question_id, 0) + count
+            add_question_totals(by_question)
+
+        if history.is_history_enabled():
+            history.record_events(increments)
+
+        tallies.add_votes(increments)
+
+    return updated
+
+
+def _leader():
+    # Served by the (question, id) index: a question only has a handful of choices.
+    return Subquery(
+        Choice.objects.filter(question=OuterRef("pk")).order_by("-votes", "id").values("id")[:1]
+    )
+
+
+def add_question_totals(by_question):
+    """
+    Adds votes to ``Question.total_votes`` and refreshes ``Question.leader``.
+
+    Args:
+        by_question (dict): A mapping of question_id to the number of votes added.
+
+    Returns:
+        int: The number of questions updated.
+    """
+    by_question = {question_id: count for question_id, count in by_question.items() if count}
+    if not by_question:
+        return 0
+
+    if len(by_question) == 1:
+        [(question_id, count)] = by_question.items()
+        delta = Value(count)
+    else:
+        delta = Case(
+            *[When(pk=question_id, then=Value(count)) for question_id, count in by_question.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    return Question.objects.filter(pk__in=by_question).update(
+        total_votes=F("total_votes") + delta, leader=_leader()
+    )
+
+
+def repair_question_totals(question_ids):
+    """
+    Recomputes ``Question.total_votes`` and ``Question.leader`` from the choices and their shards.
+
+    Args:
+        question_ids (list): The ids of the questions to repair.
+
+    Returns:
+        int: The number of questions updated.
+    """
+    choice_votes = (
+        Choice.objects.filter(question=OuterRef("pk"))
+        .values("question")
+        .annotate(total=Sum("votes"))
+        .values("total")
+    )
+    shard_votes = (
+        ChoiceVoteShard.objects.filter(choice__question=OuterRef("pk"))
+        .values("choice__question")
+        .annotate(total=Sum("votes"))
+        .values("total")
+    )
+    return Question.objects.filter(pk__in=question_ids).update(
+        total_votes=Coalesce(Subquery(choice_votes), 0) + Coalesce(Subquery(shard_votes), 0),
+        leader=_leader(),
+    )
+
+
+def _increment_shard(choice_id, shard, count):
+    shard_rows = ChoiceVoteShard.objects.filter(choice_id=choice_id, shard=shard)
+    updated = shard_rows.update(votes=F("votes") + count)
+
+    if not updated:
+        # Shard rows are created lazily; a concurrent creator is not an error.
+        ChoiceVoteShard.objects.bulk_create(
+            [ChoiceVoteShard(choice_id=choice_id, shard=shard)], ignore_conflicts=True
+        )
+        updated = shard_rows.update(votes=F("votes") + count)
+
+    return updated
+
+
+def with_shard_votes(queryset):
+    """
+    Loads choices with the votes still held in their shards added to ``votes``.
+
+    Args:
+        queryset (QuerySet): The choices to load.
+
+    Returns:
+        list: The Choice instances, with ``votes`` holding the up-to-date total.
+    """
+    choices = list(queryset.annotate(shard_votes=Coalesce(Sum("vote_shards__votes"), 0)))
+
+    for choice in choices:
+        choice.votes += choice.shard_votes
+
+    return choices
+
+
+def compact_shards(choice_ids):
+    """
+    Folds the votes held in the shards of the given choices back into ``Choice.votes``.
+
+    Each shard is decremented by the amount that was read from it rather than reset
+    to zero, so votes landing on a shard while it is being compacted are kept. The
+    totals and leaders of the questions catch up with the moved votes.
+
+    Args:
+        choice_ids (list): The ids of the choices to compact.
+
+    Returns:
+        int: The number of votes moved from the shards into the choices.
+    """
+    with transaction.atomic():
+        shards = list(
+            ChoiceVoteShard.objects.select_for_update()
+            .filter(choice_id__in=choice_ids)
+            .exclude(votes=0)
+            .values_list("id", "choice_id", "choice__question_id", "votes")
+        )
+        if not shards:
+            return 0
+
+        ChoiceVoteShard.objects.filter(pk__in=[shard_id for shard_id, _, _, _ in shards]).update(
+            votes=F("votes") - Case(
+                *[When(pk=shard_id, then=Value(votes)) for shard_id, _, _, votes in shards],
+                output_field=IntegerField(),
+            )
+        )
+
+        by_choice = {}
+        by_question = {}
+        for _, choice_id, question_id, votes in shards:
+            by_choice[choice_id] = by_choice.get(choice_id, 0) + votes
+            by_question[question_id] = by_question.get(question_id, 0) + votes
+
+        delta = Case(
+            *[When(pk=choice_id, then=Value(votes)) for choice_id, votes in by_choice.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        Choice.objects.filter(pk__in=by_choice).update(votes=F("votes") + delta)
+        add_question_totals(by_question)
+
+    return sum(by_choice.values())
+
+
+def drain_outbox(batch_size=1000):
+    """
+    Applies up to ``batch_size`` queued votes from the outbox and removes them.
+
+    The votes are grouped per choice, so a burst of votes on one choice becomes a
+    single increment. Rows locked by a concurrent worker are skipped where the
+    database supports it.
+
+    Args:
+        batch_size (int, optional): The maximum number of queued votes to apply. Defaults to 1000.
+
+    Returns:
+        int: The number of queued votes applied.
+    """
+    with transaction.atomic():
+        rows = list(
+            VoteOutbox.objects.select_for_update(skip_locked=True)
+            .order_by("id")
+            .values_list("id", "question_id", "choice_id")[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        increments = {}
+        drained = {}
+        for _, question_id, choice_id in rows:
+            key = (question_id, choice_id)
+            increments[key] = increments.get(key, 0) + 1
+            drained[question_id] = drained.get(question_id, 0) + 1
+
+        apply_increments(increments, update_totals=True)
+        for question_id, count in drained.items():
+            tallies.add_pending(question_id, -count)
+        VoteOutbox.objects.filter(pk__in=[row_id for row_id, _, _ in rows]).delete()
+
+    return len(rows)
+
+
+def reset_votes(questions):
+    """
+    Sets the votes of the given questions back to zero, with one statement per table.
+
+    The votes held in shards or queued in the outbox are dropped too. Votes still in
+    the write-behind buffer of a process are applied after the reset.
+
+    Args:
+        questions (QuerySet): The questions to reset.
+
+    Returns:
+        int: The number of questions reset.
+    """
+    question_ids = questions.values("pk")
+    with transaction.atomic():
+        VoteOutbox.objects.filter(question__in=question_ids).delete()
+        ChoiceVoteShard.objects.filter(choice__question__in=question_ids).delete()
+        Choice.objects.filter(question__in=question_ids).update(votes=0)
+        reset = questions.update(total_votes=0, leader=None)
+        for question_id in questions.values_list("pk", flat=True).iterator():
+            tallies.invalidate_tally(question_id)
+    return reset
+
+
+class VoteBuffer:
+    """
+    Collects vote increments in process and writes them behind as one batched UPDATE.
+
+    The buffer is flushed when it holds ``max_votes`` votes or when ``flush_interval``
+    seconds have passed since the first pending vote, whichever happens first.
+    """
+
+    def __init__(self, max_votes=100, flush_interval=0.05):
+        self.max_votes = max_votes
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._count = 0
+        self._timer = None
+
+    def add(self, question_id, choice_id, count=1):
+        """
+        Buffers ``count`` votes for a choice, flushing if the buffer is full.
+
+        Args:
+            question_id (int): The id of the question the choice belongs to.
+            choice_id (int): The id of the voted choice.
+            count (int, optional): The number of votes to add. Defaults to 1.
+        """
+        batch = None
+
+        with self._lock:
+            key = (question_id, choice_id)
+            self._pending[key] = self._pending.get(key, 0) + count
+            self._count += count
+
+            if self._count >= self.max_votes:
+                batch = self._drain()
+            elif self._timer is None:
+                self._arm_timer()
+
+        if batch:
+            try:
+                self._apply(batch)
+            except Exception:
+                # The votes are back in the buffer; the vote itself was counted.
+                logger.exception("Could not flush %s buffered votes.", sum(batch.values()))
+
+    def flush(self):
+        """
+        Writes every pending increment to the database.
+
+        Returns:
+            int: The number of Choice rows updated.
+        """
+        with self._lock:
+            batch = self._drain()
+
+        return self._apply(batch) if batch else 0
+
+    @property
+    def pending(self):
+        """ Returns the number of votes not yet written to the database. """
+        return self._count
+
+    def _drain(self):
+        batch, self._pending, self._count = self._pending, {}, 0
+
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        return batch
+
+    def _arm_timer(self):
+        self._timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _apply(self, batch):
+        try:
+            return apply_increments(batch, update_totals=True)
+        except Exception:
+            # Put the votes back, with a timer, so they are retried without another vote.
+            with self._lock:
+                for key, count in batch.items():
+                    self._pending[key] = self._pending.get(key, 0) + count
+                    self._count += count
+                if self._timer is None:
+                    self._arm_timer()
+            raise
+
+    def _flush_from_timer(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Could not flush the buffered votes.")
+        finally:
+            # Timer threads get their own connection, which would otherwise leak.
+            connection.close()
+
+
+_vote_buffer = None
+_vote_buffer_lock = threading.Lock()
+
+
+def get_vote_buffer():
+    """
+    Returns the process-wide vote buffer, creating it from the settings on first use.
+
+    Settings:
+        POLLS_VOTE_BUFFER_MAX_VOTES (int): Votes held before a flush. Defaults to 100.
+        POLLS_VOTE_BUFFER_FLUSH_MS (int): Maximum age of a pending vote, in ms. Defaults to 50.
+    """
+    global _vote_buffer
+
+    with _vote_buffer_lock:
+        if _vote_buffer is None:
+            _vote_buffer = VoteBuffer(
+                max_votes=getattr(settings, "POLLS_VOTE_BUFFER_MAX_VOTES", 100),
+                flush_interval=getattr(settings, "POLLS_VOTE_BUFFER_FLUSH_MS", 50) / 1000,
+            )
+            atexit.register(_vote_buffer.flush)
+
+    return _vote_buffer
+
+
+def record_vote(question_id, choice_id):
+    """
+    Records one vote for a choice.
+
+    The vote is applied immediately as an atomic increment, or buffered and written
+    behind in batches when ``POLLS_VOTE_WRITE_BEHIND`` is enabled.
+
+    Args:
+        question_id (int): The id of the question the choice belongs to.
+        choice_id (int): The id of the voted choice.
+    """
+    if getattr(settings, "POLLS_VOTE_WRITE_BEHIND", False):
+        get_vote_buffer().add(question_id, choice_id)
+    else:
+        apply_increments({(question_id, choice_id): 1})
@@ -1,5 +1,7 @@
 from django import forms
-from .widgets import PasswordInput
+from .widgets import (
+    CachedCheckboxInput, CachedEmailInput, CachedSelectDateWidget, CachedTextarea, CachedTextInput, PasswordInput,
+)
 
 BIRTH_YEAR_CHOICES = ["1980", "1981", "1982"]
 FAVORITE_COLORS_CHOICES = {"blue": "Blue", "white": "White"}
@@ -13,12 +15,13 @@ class CalendarWidget(forms.TextInput):
         js = ["animations.js", "actions.js"]
 
 class ContactForm(forms.Form):
-    subject = forms.CharField(widget=forms.TextInput(attrs={"size": "40"}))
-    message = forms.CharField(widget=forms.Textarea)
-    sender = forms.EmailField()
-    cc_myself = forms.BooleanField(required=False)
+    # The widgets cache their HTML with POLLS_FORM_CACHE.
+    subject = forms.CharField(widget=CachedTextInput(attrs={"size": "40"}))
+    message = forms.CharField(widget=CachedTextarea)
+    sender = forms.EmailField(widget=CachedEmailInput)
+    cc_myself = forms.BooleanField(required=False, widget=CachedCheckboxInput)
     birth_year = forms.DateField(
-        widget=forms.SelectDateWidget(years=BIRTH_YEAR_CHOICES)
+        widget=CachedSelectDateWidget(years=BIRTH_YEAR_CHOICES)
     )
 
 
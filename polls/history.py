@@ -0,0 +1,248 @@
+""" This module contains the vote event log, its time-bucketed rollups and the trend queries """
+
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from .models import RollupWatermark, VoteEvent, VoteRollup
+
+# Each resolution is rolled up from the one before it.
+RESOLUTIONS = [
+    (VoteRollup.MINUTE, datetime.timedelta(minutes=1)),
+    (VoteRollup.HOUR, datetime.timedelta(hours=1)),
+    (VoteRollup.DAY, datetime.timedelta(days=1)),
+]
+STEPS = dict(RESOLUTIONS)
+
+# Seconds each kind of row is kept, and its setting.
+RETENTIONS = {
+    "events": ("POLLS_VOTE_EVENT_RETENTION", 2 * 86400),
+    VoteRollup.MINUTE: ("POLLS_VOTE_MINUTE_RETENTION", 7 * 86400),
+    VoteRollup.HOUR: ("POLLS_VOTE_HOUR_RETENTION", 90 * 86400),
+}
+
+
+def is_history_enabled():
+    """ Returns whether applied votes are logged, from ``POLLS_VOTE_HISTORY`` (default False). """
+    return getattr(settings, "POLLS_VOTE_HISTORY", False)
+
+
+def get_retention(kind):
+    """ Returns how long events or the rollups of a resolution are kept, or None for ever. """
+    if kind not in RETENTIONS:
+        return None
+    setting, default = RETENTIONS[kind]
+    return datetime.timedelta(seconds=getattr(settings, setting, default))
+
+
+def floor(moment, resolution):
+    """ Returns the start of the bucket of the given resolution containing ``moment``, in UTC. """
+    moment = moment.astimezone(datetime.timezone.utc)
+    if resolution == VoteRollup.MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    if resolution == VoteRollup.HOUR:
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def record_events(increments):
+    """
+    Appends the applied votes to the event log, one row per choice.
+
+    Args:
+        increments (dict): A mapping of (question_id, choice_id) to the number of votes added.
+    """
+    now = timezone.now()
+    VoteEvent.objects.bulk_create(
+        [
+            VoteEvent(question_id=question_id, choice_id=choice_id, votes=count, created_at=now)
+            for (question_id, choice_id), count in increments.items()
+            if count
+        ]
+    )
+
+
+def _source(resolution):
+    # The rows a resolution is rolled up from, and their time field.
+    if resolution == VoteRollup.MINUTE:
+        return VoteEvent.objects.all(), "created_at"
+    previous = RESOLUTIONS[[name for name, _ in RESOLUTIONS].index(resolution) - 1][0]
+    return VoteRollup.objects.filter(resolution=previous), "bucket"
+
+
+def _next_source_time(resolution, start):
+    rows, time_field = _source(resolution)
+    if start is not None:
+        rows = rows.filter(**{f"{time_field}__gte": start})
+    return rows.order_by(time_field).values_list(time_field, flat=True).first()
+
+
+def _get_watermark(resolution):
+    watermark = RollupWatermark.objects.select_for_update().filter(resolution=resolution).first()
+    if watermark is not None:
+        return watermark
+
+    # Start at the oldest row of the source, so an existing log is rolled up too.
+    oldest = _next_source_time(resolution, None)
+    if oldest is None:
+        return None
+    return RollupWatermark.objects.create(resolution=resolution, until=floor(oldest, resolution))
+
+
+def _source_rows(resolution, start, end):
+    rows, time_field = _source(resolution)
+    return (
+        rows.filter(**{f"{time_field}__gte": start, f"{time_field}__lt": end})
+        .annotate(start=Trunc(time_field, resolution, tzinfo=datetime.timezone.utc))
+        .values("question_id", "choice_id", "start")
+        .annotate(total=Sum("votes"))
+        .order_by()
+    )
+
+
+def rollup(resolution, cutoff, max_buckets=60):
+    """
+    Rolls the complete buckets of a resolution before ``cutoff`` up from its source.
+
+    Minutes are rolled up from the events, hours from the minutes and days from the
+    hours. At most ``max_buckets`` buckets are written per transaction, together with
+    the watermark of the resolution, so a run can stop anywhere and be resumed.
+
+    Args:
+        resolution (str): "minute", "hour" or "day".
+        cutoff (datetime): The time before which the source is complete.
+        max_buckets (int, optional): The buckets written per transaction. Defaults to 60.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    step = STEPS[resolution]
+    end_limit = floor(cutoff, resolution)
+    written = 0
+
+    while True:
+        with transaction.atomic():
+            watermark = _get_watermark(resolution)
+            if watermark is None or watermark.until >= end_limit:
+                return written
+
+            # Skip the buckets without votes up to the next source row.
+            next_time = _next_source_time(resolution, watermark.until)
+            start = end_limit if next_time is None else min(floor(next_time, resolution), end_limit)
+            end = min(start + step * max_buckets, end_limit)
+            rollups = [
+                VoteRollup(
+                    question_id=row["question_id"],
+                    choice_id=row["choice_id"],
+                    resolution=resolution,
+                    bucket=row["start"],
+                    votes=row["total"],
+                )
+                for row in _source_rows(resolution, start, end)
+            ]
+            VoteRollup.objects.bulk_create(rollups, batch_size=1000)
+            watermark.until = end
+            watermark.save(update_fields=["until"])
+            written += len(rollups)
+
+
+def rollup_all(now=None):
+    """
+    Rolls every resolution up as far as its source is complete.
+
+    Events are only rolled up once ``POLLS_VOTE_ROLLUP_LAG`` seconds (default 60) old, so
+    votes applied in transactions still open at the end of a minute are not missed.
+
+    Args:
+        now (datetime, optional): The current time. Defaults to now.
+
+    Returns:
+        dict: The number of rollup rows written per resolution.
+    """
+    cutoff = (now or timezone.now()) - datetime.timedelta(seconds=getattr(settings, "POLLS_VOTE_ROLLUP_LAG", 60))
+    written = {}
+    for resolution, _ in RESOLUTIONS:
+        written[resolution] = rollup(resolution, cutoff)
+        watermark = RollupWatermark.objects.filter(resolution=resolution).first()
+        if watermark is None:
+            break
+        # The next resolution is complete up to where this one is.
+        cutoff = watermark.until
+    return written
+
+
+def _delete_before(queryset, time_field, before, batch_size):
+    deleted = 0
+    while True:
+        batch = list(
+            queryset.filter(**{f"{time_field}__lt": before})
+            .order_by(time_field)
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not batch:
+            return deleted
+        deleted += queryset.model.objects.filter(pk__in=batch).delete()[0]
+
+
+def prune(now=None, batch_size=5000):
+    """
+    Deletes the events and rollups past their retention, once they were rolled up.
+
+    Args:
+        now (datetime, optional): The current time. Defaults to now.
+        batch_size (int, optional): The rows deleted per statement. Defaults to 5000.
+
+    Returns:
+        dict: The number of rows deleted, for "events" and per resolution.
+    """
+    now = now or timezone.now()
+    watermarks = dict(RollupWatermark.objects.values_list("resolution", "until"))
+    deleted = {}
+
+    # A row is only deleted once the next resolution covers it.
+    sources = [
+        ("events", VoteEvent.objects.all(), "created_at", VoteRollup.MINUTE),
+        (VoteRollup.MINUTE, VoteRollup.objects.filter(resolution=VoteRollup.MINUTE), "bucket", VoteRollup.HOUR),
+        (VoteRollup.HOUR, VoteRollup.objects.filter(resolution=VoteRollup.HOUR), "bucket", VoteRollup.DAY),
+    ]
+    for kind, queryset, time_field, covered_by in sources:
+        if covered_by not in watermarks:
+            deleted[kind] = 0
+            continue
+        before = min(now - get_retention(kind), watermarks[covered_by])
+        deleted[kind] = _delete_before(queryset, time_field, before, batch_size)
+    return deleted
+
+
+def get_trend(question_id, resolution, start, end):
+    """
+    Returns the votes per choice and bucket of a question, from the rollups only.
+
+    Args:
+        question_id (int): The id of the question.
+        resolution (str): "minute", "hour" or "day".
+        start (datetime): The start of the range, included.
+        end (datetime): The end of the range, excluded.
+
+    Returns:
+        list: The buckets in time order, each with ``bucket`` and ``votes`` (the votes
+        per choice id, for the choices that got votes).
+    """
+    rows = (
+        VoteRollup.objects.filter(
+            question_id=question_id, resolution=resolution, bucket__gte=start, bucket__lt=end
+        )
+        .order_by("bucket")
+        .values_list("bucket", "choice_id", "votes")
+    )
+
+    buckets = []
+    for bucket, choice_id, votes in rows:
+        if not buckets or buckets[-1]["bucket"] != bucket:
+            buckets.append({"bucket": bucket, "votes": {}})
+        buckets[-1]["votes"][choice_id] = votes
+    return buckets
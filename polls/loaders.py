@@ -0,0 +1,74 @@
+""" This module contains the loaders that fetch a poll and its choices in a single query """
+
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .models import ChoiceVoteShard, Question, VoteOutbox
+
+
+def load_poll_bundle(question_id):
+    """
+    Loads a question with its ordered choices and vote totals in one database round trip.
+
+    The choices are LEFT JOINed to the question, and the votes still held in shards
+    or queued in the outbox are folded in through correlated subqueries.
+
+    Args:
+        question_id (int): The id of the question.
+
+    Returns:
+        dict: The bundle, with ``id``, ``question_text``, ``pub_date``, ``choices`` (each
+        with ``id``, ``choice_text`` and ``votes``), ``total_votes`` and ``pending_votes``,
+        or None if the question does not exist.
+    """
+    shard_votes = (
+        ChoiceVoteShard.objects.filter(choice=OuterRef("choice__id"))
+        .values("choice")
+        .annotate(total=Sum("votes"))
+        .values("total")
+    )
+    pending_votes = (
+        VoteOutbox.objects.filter(question=OuterRef("pk"))
+        .values("question")
+        .annotate(total=Count("id"))
+        .values("total")
+    )
+    rows = list(
+        Question.objects.filter(pk=question_id)
+        .annotate(
+            shard_votes=Coalesce(Subquery(shard_votes), 0),
+            pending_votes=Coalesce(Subquery(pending_votes), 0),
+        )
+        .values(
+            "id",
+            "question_text",
+            "pub_date",
+            "pending_votes",
+            "choice__id",
+            "choice__choice_text",
+            "choice__votes",
+            "shard_votes",
+        )
+        .order_by("choice__id")
+    )
+    if not rows:
+        return None
+
+    choices = [
+        {
+            "id": row["choice__id"],
+            "choice_text": row["choice__choice_text"],
+            "votes": row["choice__votes"] + row["shard_votes"],
+        }
+        for row in rows
+        if row["choice__id"] is not None
+    ]
+
+    return {
+        "id": rows[0]["id"],
+        "question_text": rows[0]["question_text"],
+        "pub_date": rows[0]["pub_date"],
+        "choices": choices,
+        "total_votes": sum(choice["votes"] for choice in choices),
+        "pending_votes": rows[0]["pending_votes"],
+    }
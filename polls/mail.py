@@ -0,0 +1,124 @@
+""" This module contains the outbound mail queue, sent in batches outside the request """
+
+import datetime
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def get_max_attempts():
+    """ Returns how many times an email is tried, from ``POLLS_MAIL_MAX_ATTEMPTS`` (default 5). """
+    return getattr(settings, "POLLS_MAIL_MAX_ATTEMPTS", 5)
+
+
+def get_retry_delay(attempts):
+    """
+    Returns the delay before the next attempt, doubling after every failure.
+
+    Settings:
+        POLLS_MAIL_RETRY_DELAY (float): The delay after the first failure, in seconds.
+            Defaults to 60.
+        POLLS_MAIL_MAX_RETRY_DELAY (float): The longest delay, in seconds. Defaults to 3600.
+
+    Args:
+        attempts (int): The number of failed attempts so far.
+
+    Returns:
+        datetime.timedelta: The delay.
+    """
+    delay = getattr(settings, "POLLS_MAIL_RETRY_DELAY", 60) * 2 ** (attempts - 1)
+    return datetime.timedelta(seconds=min(delay, getattr(settings, "POLLS_MAIL_MAX_RETRY_DELAY", 3600)))
+
+
+def enqueue_mail(subject, message, from_email, recipient_list):
+    """
+    Queues an email, with the arguments of ``send_mail``; it is sent by ``send_queued_mail``.
+
+    Returns:
+        OutboundEmail: The queued email.
+    """
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=message,
+        from_email=from_email,
+        recipients=list(recipient_list),
+        next_attempt_at=timezone.now(),
+    )
+
+
+def _claim(batch_size, now):
+    # Push the claimed rows into the future, so a concurrent worker does not send them
+    # again while this one talks to the mail server.
+    lease = datetime.timedelta(seconds=getattr(settings, "POLLS_MAIL_LEASE", 300))
+    with transaction.atomic():
+        emails = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(next_attempt_at__lte=now)
+            .order_by("next_attempt_at")[:batch_size]
+        )
+        if emails:
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in emails]).update(next_attempt_at=now + lease)
+    return emails
+
+
+def _fail(email, error, now):
+    email.attempts += 1
+    email.last_error = f"{type(error).__name__}: {error}"
+    if email.attempts >= get_max_attempts():
+        email.next_attempt_at = None
+    else:
+        email.next_attempt_at = now + get_retry_delay(email.attempts)
+    email.save(update_fields=["attempts", "last_error", "next_attempt_at"])
+
+
+def send_queued_mail(batch_size=100):
+    """
+    Sends up to ``batch_size`` due emails over one email backend connection.
+
+    Each email that fails is retried later with an exponential backoff, up to
+    ``POLLS_MAIL_MAX_ATTEMPTS`` attempts; the others are marked as sent.
+
+    Args:
+        batch_size (int, optional): The maximum number of emails to send. Defaults to 100.
+
+    Returns:
+        tuple: The number of emails sent and the number that failed.
+    """
+    now = timezone.now()
+    emails = _claim(batch_size, now)
+    if not emails:
+        return 0, 0
+
+    sent = []
+    failed = 0
+    connection = get_connection()
+
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            _fail(email, error, now)
+        return 0, len(emails)
+
+    try:
+        for email in emails:
+            message = EmailMessage(email.subject, email.body, email.from_email, email.recipients)
+            try:
+                connection.send_messages([message])
+            except Exception as error:
+                _fail(email, error, now)
+                failed += 1
+            else:
+                sent.append(email.pk)
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.filter(pk__in=sent).update(
+        sent_at=timezone.now(), next_attempt_at=None, attempts=F("attempts") + 1
+    )
+    return len(sent), failed
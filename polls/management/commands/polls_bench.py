@@ -0,0 +1,209 @@
+""" Management command that runs the polls benchmark suites """
+
+import json
+import platform
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+
+from polls.bench import components, forms, measure, seed, views
+
+SUITES = {
+    "components": components.run,
+    "forms": forms.run,
+    "views": views.run,
+}
+
+# The suites that run against a seeded test database.
+DATABASE_SUITES = {"views"}
+
+# The latencies compared against a baseline.
+COMPARED_METRICS = ("p50", "p95")
+
+
+def flatten(results, prefix=""):
+    """
+    Flattens nested benchmark results into dotted metric names.
+
+    Args:
+        results (dict): The results, e.g. ``{"views": {"index": {"p50": 1.0}}}``.
+        prefix (str, optional): The name prefix of the nested values.
+
+    Returns:
+        dict: The numeric values by dotted name, e.g. ``{"views.index.p50": 1.0}``.
+    """
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            values[name] = value
+    return values
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compares the latencies of a run against a baseline run.
+
+    Args:
+        results (dict): The results of the current run.
+        baseline (dict): The results of the baseline run.
+        threshold (float): The tolerated slowdown, e.g. 0.1 for 10%.
+
+    Returns:
+        list: ``(name, baseline, current)`` for every latency slower than the baseline
+        by more than the threshold, and every query count higher than the baseline.
+    """
+    current = flatten(results)
+    previous = flatten(baseline)
+    regressions = []
+
+    for name, value in current.items():
+        old_value = previous.get(name)
+        if old_value is None:
+            continue
+        metric = name.rsplit(".", 1)[-1]
+        if metric in COMPARED_METRICS and value > old_value * (1 + threshold):
+            regressions.append((name, old_value, value))
+        elif metric in ("queries", "cold_queries") and value > old_value:
+            regressions.append((name, old_value, value))
+
+    return regressions
+
+
+class Command(BaseCommand):
+    help = "Runs the polls benchmark suites and prints their latencies."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--suite",
+            action="append",
+            choices=sorted(SUITES),
+            help="Suite to run; repeat for several. Defaults to every suite.",
+        )
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=1000,
+            help="Timed runs per benchmark. Defaults to 1000.",
+        )
+        parser.add_argument(
+            "--questions",
+            type=int,
+            default=1000,
+            help="Questions seeded for the views suite. Defaults to 1000.",
+        )
+        parser.add_argument(
+            "--choices",
+            type=int,
+            default=4,
+            help="Choices seeded per question. Defaults to 4.",
+        )
+        parser.add_argument(
+            "--votes",
+            type=int,
+            default=100000,
+            help="Votes seeded across the choices. Defaults to 100000.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Writes the results to this JSON file.",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Compares the results with a JSON file written by --output.",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.1,
+            help="Tolerated p50/p95 slowdown against --compare. Defaults to 0.1 (10%%).",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1.")
+
+        suites = options["suite"] or sorted(SUITES)
+        config = {
+            key: options[key] for key in ("iterations", "questions", "choices", "votes")
+        }
+
+        baseline = None
+        if options["compare"]:
+            try:
+                with open(options["compare"]) as baseline_file:
+                    baseline = json.load(baseline_file)
+            except (OSError, ValueError) as error:
+                raise CommandError(f"Cannot read the baseline: {error}")
+
+        results = {}
+        for suite in suites:
+            if suite not in DATABASE_SUITES:
+                results[suite] = SUITES[suite](measure, options["iterations"])
+
+        if DATABASE_SUITES.intersection(suites):
+            results.update(self.run_database_suites(suites, options))
+
+        self.write_results(results)
+
+        if options["output"]:
+            report = {
+                "config": config,
+                "environment": {
+                    "python": platform.python_version(),
+                    "django": django.get_version(),
+                    "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+                },
+                "results": results,
+            }
+            with open(options["output"], "w") as output_file:
+                json.dump(report, output_file, indent=2, sort_keys=True)
+
+        if baseline is not None:
+            if baseline.get("config") != config:
+                self.stderr.write(f"The baseline was run with {baseline.get('config')}, not {config}.")
+
+            regressions = find_regressions(results, baseline.get("results", {}), options["threshold"])
+            for name, old_value, value in regressions:
+                self.stderr.write(f"  {name}: {old_value:.1f} -> {value:.1f}")
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
+            self.stdout.write(self.style.SUCCESS(f"No regression against {options['compare']}."))
+
+    def run_database_suites(self, suites, options):
+        # Like the test runner: a throwaway test database and the locmem email backend.
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={"default"})
+        try:
+            question_ids = seed.seed(options["questions"], options["choices"], options["votes"])
+            return {
+                suite: SUITES[suite](measure, options["iterations"], question_ids)
+                for suite in suites
+                if suite in DATABASE_SUITES
+            }
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def write_results(self, results):
+        for suite, benchmarks in results.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{suite}:"))
+            for name, timings in benchmarks.items():
+                if "speedup" in timings:
+                    # The timings of the baseline path, then of the faster one.
+                    baseline, faster = [path for path in timings if path != "speedup"]
+                    self.stdout.write(
+                        f"  {name:<20} {baseline} p50 {timings[baseline]['p50']:8.1f}us"
+                        f"  {faster} p50 {timings[faster]['p50']:8.1f}us"
+                        f"  speedup {timings['speedup']:5.1f}x"
+                    )
+                    continue
+
+                line = f"  {name:<20} p50 {timings['p50']:8.1f}us  p95 {timings['p95']:8.1f}us"
+                if "queries" in timings:
+                    line += f"  queries {timings['queries']} ({timings['cold_queries']} cold)"
+                self.stdout.write(line)
@@ -0,0 +1,29 @@
+""" Management command that builds the asset bundles emitted by the stylesheet and script tags """
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.templatetags.bundles import (
+    build_bundle,
+    find_bundle_sets,
+    get_bundle_key,
+    get_bundle_manifest_path,
+    write_bundle_manifest,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Builds a bundle for every component set of the asset tags in the templates and writes "
+        "their manifest. Run it before collectstatic."
+    )
+
+    def handle(self, *args, **options):
+        bundles = {}
+        for file_extension, paths in sorted(find_bundle_sets()):
+            try:
+                bundles[get_bundle_key(paths, file_extension)] = build_bundle(paths, file_extension)
+            except FileNotFoundError as error:
+                raise CommandError(f"Static file not found: {error}") from error
+
+        write_bundle_manifest(bundles)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(bundles)} bundles to {get_bundle_manifest_path()}."))
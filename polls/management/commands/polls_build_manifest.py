@@ -0,0 +1,34 @@
+""" Management command that writes the static asset manifest used by the asset tags """
+
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.templatetags.utils import MANIFEST_FOLDERS, build_static_manifest
+
+
+class Command(BaseCommand):
+    help = "Walks the polls static folders and writes their manifest to POLLS_STATIC_MANIFEST."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            help="Where to write the manifest. Defaults to the POLLS_STATIC_MANIFEST setting.",
+        )
+
+    def handle(self, *args, **options):
+        output = options["output"] or getattr(settings, "POLLS_STATIC_MANIFEST", None)
+        if not output:
+            raise CommandError("Set POLLS_STATIC_MANIFEST or pass --output.")
+
+        manifests = {
+            "|".join(key): build_static_manifest(*key)
+            for key in MANIFEST_FOLDERS
+        }
+
+        with open(output, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifests, manifest_file, indent=2, sort_keys=True)
+
+        total = sum(len(manifest["paths"]) for manifest in manifests.values())
+        self.stdout.write(self.style.SUCCESS(f"Wrote {total} static paths to {output}."))
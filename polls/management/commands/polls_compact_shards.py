@@ -0,0 +1,41 @@
+""" Management command that folds sharded vote counters back into Choice.votes """
+
+from django.core.management.base import BaseCommand
+
+from polls.counters import compact_shards
+from polls.models import ChoiceVoteShard
+
+
+class Command(BaseCommand):
+    help = "Folds the votes held in ChoiceVoteShard rows back into Choice.votes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of choices compacted per transaction. Defaults to 500.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        moved = 0
+        last_id = 0
+
+        # Walk the choice ids in keyset order rather than holding a cursor open,
+        # since each batch writes to the table being read.
+        while True:
+            batch = list(
+                ChoiceVoteShard.objects.filter(choice_id__gt=last_id)
+                .exclude(votes=0)
+                .order_by("choice_id")
+                .values_list("choice_id", flat=True)
+                .distinct()[:batch_size]
+            )
+            if not batch:
+                break
+
+            moved += compact_shards(batch)
+            last_id = batch[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Compacted {moved} votes from shards."))
@@ -0,0 +1,50 @@
+""" Management command that applies the votes queued by the async vote endpoint """
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.counters import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Applies the votes queued in VoteOutbox in bulk, grouped per choice."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of queued votes applied per transaction. Defaults to 1000.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep draining the queue instead of exiting once it is empty.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0.5,
+            help="Seconds to sleep when the queue is empty, with --loop. Defaults to 0.5.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        applied = 0
+
+        try:
+            while True:
+                drained = drain_outbox(batch_size)
+                applied += drained
+
+                if drained:
+                    self.stdout.write(f"Applied {drained} queued votes.")
+                elif options["loop"]:
+                    time.sleep(options["interval"])
+                else:
+                    break
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Applied {applied} queued votes in total."))
@@ -0,0 +1,52 @@
+""" Management command that exports the questions and choices to CSV or JSONL """
+
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.transfer import FORMATS, export_records, guess_format, write_records
+
+
+class Command(BaseCommand):
+    help = "Streams every question and choice, with its votes, to a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("output", help='File to write, or "-" for the standard output.')
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format. Defaults to csv for a .csv file and jsonl otherwise.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=2000,
+            help="Rows fetched from the database at once. Defaults to 2000.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["output"]
+        file_format = options["format"] or guess_format(path)
+        output = sys.stdout if path == "-" else open(path, "w", encoding="utf-8", newline="")
+
+        started_at = last_report = time.monotonic()
+        exported = 0
+        try:
+            for _ in write_records(export_records(options["chunk_size"]), output, file_format):
+                exported += 1
+                now = time.monotonic()
+                if now - last_report >= 2:
+                    last_report = now
+                    self.report(exported, started_at)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+
+        self.report(exported, started_at, done=True)
+
+    def report(self, exported, started_at, done=False):
+        rate = exported / max(time.monotonic() - started_at, 1e-9)
+        message = f"Exported {exported} records ({rate:.0f} records/s)."
+        # Progress goes to stderr, so the export can be written to stdout.
+        self.stderr.write(self.style.SUCCESS(message) if done else message)
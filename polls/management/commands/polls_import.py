@@ -0,0 +1,58 @@
+""" Management command that imports questions and choices exported by polls_export """
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.transfer import FORMATS, Importer, ImportState, TransferError, guess_format
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports a polls_export file in chunks, mapping the exported ids to new ones. "
+        "An interrupted import resumes where it stopped when run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("input", help="File written by polls_export.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format. Defaults to csv for a .csv file and jsonl otherwise.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Records written per transaction. Defaults to 1000.",
+        )
+        parser.add_argument(
+            "--state",
+            help="SQLite file keeping the id map and progress. Defaults to <input>.state.sqlite3.",
+        )
+        parser.add_argument(
+            "--restart",
+            action="store_true",
+            help="Start from the beginning of the file. Rows imported before are updated, not duplicated.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["input"]
+        state = ImportState(options["state"] or f"{path}.state.sqlite3")
+        started_at = time.monotonic()
+
+        try:
+            if options["restart"]:
+                state.reset(path)
+            importer = Importer(state, options["chunk_size"], progress=self.report)
+            imported = importer.run(path, options["format"] or guess_format(path))
+        except (TransferError, KeyError, ValueError) as error:
+            raise CommandError(f"Import stopped: {error}. Run the command again to resume.")
+        finally:
+            state.close()
+
+        rate = imported / max(time.monotonic() - started_at, 1e-9)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} records ({rate:.0f} records/s)."))
+
+    def report(self, imported, rate):
+        self.stdout.write(f"Imported {imported} records ({rate:.0f} records/s).")
@@ -0,0 +1,58 @@
+""" Management command that recomputes the denormalized vote totals of the questions """
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.counters import repair_question_totals
+from polls.models import Question
+
+
+class Command(BaseCommand):
+    help = "Recomputes Question.total_votes and Question.leader from the choices and their shards."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of questions repaired per UPDATE. Defaults to 1000.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep repairing every --interval seconds, so the totals follow single votes.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Seconds between two passes, with --loop. Defaults to 60.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                repaired = self.repair(options["batch_size"])
+                self.stdout.write(self.style.SUCCESS(f"Repaired the totals of {repaired} questions."))
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+    def repair(self, batch_size):
+        repaired = 0
+        last_id = 0
+
+        while True:
+            batch = list(
+                Question.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not batch:
+                return repaired
+
+            repaired += repair_question_totals(batch)
+            last_id = batch[-1]
@@ -0,0 +1,48 @@
+""" Management command that rolls the vote event log up into time buckets and prunes it """
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.history import prune, rollup_all
+
+
+class Command(BaseCommand):
+    help = "Rolls VoteEvent up into minute, hour and day VoteRollup buckets, then prunes old rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep rolling up instead of exiting after one pass.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60,
+            help="Seconds between passes, with --loop. Defaults to 60.",
+        )
+        parser.add_argument(
+            "--no-prune",
+            action="store_true",
+            help="Keep the events and rollups past their retention.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                written = rollup_all()
+                self.stdout.write(
+                    "Rolled up " + ", ".join(f"{count} {resolution}" for resolution, count in written.items()) + " buckets."
+                )
+                if not options["no_prune"]:
+                    deleted = prune()
+                    self.stdout.write(
+                        "Pruned " + ", ".join(f"{count} {kind}" for kind, count in deleted.items()) + " rows."
+                    )
+
+                if not options["loop"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
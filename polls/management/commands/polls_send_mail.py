@@ -0,0 +1,51 @@
+""" Management command that sends the emails queued by the polls views """
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.mail import send_queued_mail
+
+
+class Command(BaseCommand):
+    help = "Sends the emails queued in OutboundEmail in batches, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of emails sent per connection. Defaults to 100.",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep sending instead of exiting once no email is due.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep when no email is due, with --loop. Defaults to 1.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        total_sent = total_failed = 0
+
+        try:
+            while True:
+                sent, failed = send_queued_mail(batch_size)
+                total_sent += sent
+                total_failed += failed
+
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} emails, {failed} failed.")
+                if sent + failed < batch_size:
+                    if not options["loop"]:
+                        break
+                    time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} emails, {total_failed} failed, in total."))
@@ -0,0 +1,49 @@
+""" Management command that warms the polls app up and reports where the time goes """
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from polls.warmup import STEPS, warm_up
+
+
+class Command(BaseCommand):
+    help = (
+        "Imports the polls modules, compiles the polls templates, renders the forms, builds the "
+        "asset manifests and resolves the polls routes, reporting the time of each."
+    )
+    # The system checks load the URLconf, which would import the modules before they are timed.
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--step",
+            action="append",
+            choices=list(STEPS),
+            help="Only run this step; can be repeated. Defaults to every step.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=5,
+            help="Number of slowest items listed per step. Defaults to 5.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        results = warm_up(options["step"])
+        total = time.perf_counter() - start
+
+        for step, timings in results.items():
+            measured = {name: seconds for name, seconds in timings.items() if seconds is not None}
+            skipped = len(timings) - len(measured)
+            heading = f"{step}: {sum(measured.values()) * 1000:.1f}ms for {len(measured)} items"
+            if skipped:
+                heading += f" ({skipped} already loaded)"
+            self.stdout.write(self.style.MIGRATE_HEADING(heading))
+
+            slowest = sorted(measured.items(), key=lambda item: item[1], reverse=True)[:options["top"]]
+            for name, seconds in slowest:
+                self.stdout.write(f"  {name:<50} {seconds * 1000:8.1f}ms")
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed up in {total * 1000:.1f}ms."))
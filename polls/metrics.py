@@ -0,0 +1,345 @@
+""" This module contains the per-route request metrics and their Prometheus exposition """
+
+import atexit
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# name: (help, buckets)
+METRICS = {
+    "polls_request_duration_seconds": ("Wall time of the request.", DURATION_BUCKETS),
+    "polls_request_queries": ("Database queries issued by the request.", QUERY_BUCKETS),
+    "polls_request_db_duration_seconds": ("Time spent executing database queries.", DURATION_BUCKETS),
+    "polls_request_template_duration_seconds": ("Time spent rendering the response template.", DURATION_BUCKETS),
+}
+
+# name: (help, label)
+COUNTERS = {
+    "polls_vote_rejections_total": ("Votes rejected by the vote filter.", "reason"),
+}
+
+
+def is_metrics_enabled():
+    """ Returns whether request metrics are recorded, from ``POLLS_METRICS`` (default False). """
+    return getattr(settings, "POLLS_METRICS", False)
+
+
+def get_metrics_url():
+    """ Returns the path the metrics are served at, from ``POLLS_METRICS_URL`` (default "/metrics"). """
+    return getattr(settings, "POLLS_METRICS_URL", "/metrics")
+
+
+def get_metrics_dir():
+    """ Returns the directory shared by the workers, from ``POLLS_METRICS_DIR`` (default None). """
+    return getattr(settings, "POLLS_METRICS_DIR", None)
+
+
+class Histogram:
+    """
+    A cumulative histogram with fixed bucket upper bounds, like a Prometheus histogram.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """ Adds one observation. """
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        """ Returns the counts of the histogram, as stored in the shared directory. """
+        return {"counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    def merge(self, data):
+        """ Adds the counts of another histogram, as returned by ``to_dict``. """
+        self.counts = [count + other for count, other in zip(self.counts, data["counts"])]
+        self.sum += data["sum"]
+        self.count += data["count"]
+
+
+class Counter:
+    """
+    A monotonically increasing count, like a Prometheus counter.
+    """
+
+    def __init__(self):
+        self.value = 0
+
+    def increment(self, amount=1):
+        """ Adds to the count. """
+        self.value += amount
+
+    def to_dict(self):
+        """ Returns the count, as stored in the shared directory. """
+        return {"value": self.value}
+
+    def merge(self, data):
+        """ Adds the count of another counter, as returned by ``to_dict``. """
+        self.value += data["value"]
+
+
+def _new_metric(name):
+    return Histogram(METRICS[name][1]) if name in METRICS else Counter()
+
+
+class Registry:
+    """
+    The histograms and counters of this process, one per metric and route name or label.
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._lock = threading.Lock()
+        # Held while writing the snapshot, which takes ``_lock`` itself.
+        self._write_lock = threading.Lock()
+        self._last_write = 0.0
+
+    def observe(self, route, values):
+        """
+        Records the measurements of one request.
+
+        Args:
+            route (str): The route name, e.g. "polls:index".
+            values (dict): The value of each metric, by metric name.
+        """
+        with self._lock:
+            for name, value in values.items():
+                key = (name, route)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(METRICS[name][1])
+                histogram.observe(value)
+        self.maybe_write()
+
+    def increment(self, name, label, amount=1):
+        """
+        Adds to a counter.
+
+        Args:
+            name (str): The counter, one of ``COUNTERS``.
+            label (str): The value of the label of the counter, e.g. "rate".
+            amount (int, optional): The amount to add. Defaults to 1.
+        """
+        with self._lock:
+            counter = self._histograms.get((name, label))
+            if counter is None:
+                counter = self._histograms[(name, label)] = Counter()
+            counter.increment(amount)
+        self.maybe_write()
+
+    def snapshot(self):
+        """ Returns the metrics of this process, by "<metric> <route or label>" key. """
+        with self._lock:
+            return {f"{name} {route}": histogram.to_dict() for (name, route), histogram in self._histograms.items()}
+
+    def clear(self):
+        """ Drops every metric. """
+        with self._lock:
+            self._histograms.clear()
+
+    def maybe_write(self, force=False):
+        """
+        Writes the snapshot of this process to ``POLLS_METRICS_DIR``, at most once per
+        ``POLLS_METRICS_WRITE_INTERVAL`` seconds (default 5) unless forced.
+
+        One thread writes at a time; an unforced write is skipped while another thread writes.
+        """
+        directory = get_metrics_dir()
+        if not directory:
+            return
+
+        if not self._write_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._last_write < getattr(settings, "POLLS_METRICS_WRITE_INTERVAL", 5):
+                return
+            self._last_write = now
+
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"{os.getpid()}.json")
+            temporary_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temporary_path, "w") as metrics_file:
+                json.dump(self.snapshot(), metrics_file)
+            os.replace(temporary_path, path)
+        finally:
+            self._write_lock.release()
+
+
+registry = Registry()
+
+
+@atexit.register
+def _write_on_exit():
+    if registry._histograms:
+        registry.maybe_write(force=True)
+
+
+def collect():
+    """
+    Returns the metrics of every worker.
+
+    Without ``POLLS_METRICS_DIR`` these are the metrics of this process. Otherwise the
+    snapshots written by every worker, including ones that have exited, are merged.
+
+    Returns:
+        dict: The merged histograms and counters, by ``(metric, route or label)``.
+    """
+    directory = get_metrics_dir()
+    if directory:
+        registry.maybe_write(force=True)
+        snapshots = []
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            try:
+                with open(path) as metrics_file:
+                    snapshots.append(json.load(metrics_file))
+            except (OSError, ValueError):
+                continue
+    else:
+        snapshots = [registry.snapshot()]
+
+    histograms = {}
+    for snapshot in snapshots:
+        for key, data in snapshot.items():
+            name, route = key.split(" ", 1)
+            if name not in METRICS and name not in COUNTERS:
+                continue
+            histogram = histograms.get((name, route))
+            if histogram is None:
+                histogram = histograms[(name, route)] = _new_metric(name)
+            histogram.merge(data)
+    return histograms
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus(histograms):
+    """
+    Renders metrics in the Prometheus text exposition format.
+
+    Args:
+        histograms (dict): The metrics by ``(metric, route or label)``, as returned by ``collect``.
+
+    Returns:
+        str: The exposition text.
+    """
+    lines = []
+    for name, (help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, route), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, count in zip(buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{route="{route}",le="{_format_value(bound)}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{route="{route}",le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{route="{route}"}} {_format_value(histogram.sum)}')
+            lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+    for name, (help_text, label) in COUNTERS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (metric, value), counter in sorted(histograms.items()):
+            if metric == name:
+                lines.append(f'{name}{{{label}="{value}"}} {counter.value}')
+    return "\n".join(lines) + "\n"
+
+
+class RequestTimer:
+    """
+    Measures one request: wall time, the queries run on every database connection and
+    their duration, and the rendering of a ``TemplateResponse``.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self._start = None
+        self._stack = ExitStack()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+    def __enter__(self):
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.duration = time.perf_counter() - self._start
+        self._stack.close()
+
+    def render(self, response):
+        """ Renders a ``TemplateResponse`` now, timing it, so the wall time includes it. """
+        if hasattr(response, "render") and not getattr(response, "is_rendered", True):
+            start = time.perf_counter()
+            response.render()
+            self.template_time += time.perf_counter() - start
+        return response
+
+    def values(self):
+        """ Returns the measurements by metric name. """
+        return {
+            "polls_request_duration_seconds": self.duration,
+            "polls_request_queries": self.queries,
+            "polls_request_db_duration_seconds": self.db_time,
+            "polls_request_template_duration_seconds": self.template_time,
+        }
+
+
+def instrument_view(route):
+    """
+    Records the metrics of a view under the given route name when ``POLLS_METRICS`` is on.
+
+    Use it on views that are not served through ``MetricsMiddleware``; the middleware does
+    not record a request twice.
+
+    Args:
+        route (str): The route name, e.g. "polls:index".
+
+    Returns:
+        function: The view decorator.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_metrics_enabled() or getattr(request, "_polls_metrics_recorded", False):
+                return view(request, *args, **kwargs)
+
+            request._polls_metrics_recorded = True
+            with RequestTimer() as timer:
+                response = timer.render(view(request, *args, **kwargs))
+            registry.observe(route, timer.values())
+            return response
+
+        return wrapper
+
+    return decorator
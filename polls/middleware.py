@@ -0,0 +1,82 @@
+""" This module contains the middleware of the polls app """
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from . import metrics
+from .routers import get_replicas, pinned_to_primary
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class MetricsMiddleware:
+    """
+    Records the wall time, query count, database time and template render time of every
+    polls view per route name, and serves them as Prometheus text at ``POLLS_METRICS_URL``.
+
+    Nothing is recorded or served unless ``POLLS_METRICS`` is enabled.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not metrics.is_metrics_enabled():
+            return self.get_response(request)
+
+        if request.path == metrics.get_metrics_url():
+            return HttpResponse(
+                metrics.render_prometheus(metrics.collect()),
+                content_type="text/plain; version=0.0.4; charset=utf-8",
+            )
+
+        with metrics.RequestTimer() as timer:
+            request._polls_metrics_timer = timer
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        if match is not None and "polls" in match.app_names and not getattr(request, "_polls_metrics_recorded", False):
+            request._polls_metrics_recorded = True
+            metrics.registry.observe(match.view_name, timer.values())
+        return response
+
+    def process_template_response(self, request, response):
+        timer = getattr(request, "_polls_metrics_timer", None)
+        if timer is not None:
+            timer.render(response)
+        return response
+
+
+class ReadYourWritesMiddleware:
+    """
+    Pins a client to the primary database for a short while after it wrote, so that its
+    next pages, e.g. the results it is redirected to after voting, show its write even
+    when the replicas lag behind.
+
+    Requests with an unsafe method read from the primary, and their response sets a
+    cookie, ``POLLS_PRIMARY_PIN_COOKIE`` (default "polls_primary"), for
+    ``POLLS_PRIMARY_PIN_SECONDS`` seconds (default 5). Requests carrying the cookie read
+    from the primary too. Nothing is done unless ``POLLS_DATABASE_REPLICAS`` is set.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not get_replicas():
+            return self.get_response(request)
+
+        cookie = getattr(settings, "POLLS_PRIMARY_PIN_COOKIE", "polls_primary")
+        wrote = request.method not in SAFE_METHODS
+        with pinned_to_primary(wrote or cookie in request.COOKIES):
+            response = self.get_response(request)
+
+        if wrote:
+            response.set_cookie(
+                cookie,
+                "1",
+                max_age=getattr(settings, "POLLS_PRIMARY_PIN_SECONDS", 5),
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_vote_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='is_closed',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,83 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    """
+    CREATE VIRTUAL TABLE polls_question_fts USING fts5(
+        question_text, content='polls_question', content_rowid='id',
+        prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # The triggers keep the index in step with every write, bulk ones included. SQLite
+    # drops them when a later migration rebuilds polls_question, which must recreate them.
+    """
+    CREATE TRIGGER polls_question_fts_insert AFTER INSERT ON polls_question BEGIN
+        INSERT INTO polls_question_fts (rowid, question_text) VALUES (new.id, new.question_text);
+    END
+    """,
+    """
+    CREATE TRIGGER polls_question_fts_delete AFTER DELETE ON polls_question BEGIN
+        INSERT INTO polls_question_fts (polls_question_fts, rowid, question_text)
+        VALUES ('delete', old.id, old.question_text);
+    END
+    """,
+    """
+    CREATE TRIGGER polls_question_fts_update AFTER UPDATE OF question_text ON polls_question BEGIN
+        INSERT INTO polls_question_fts (polls_question_fts, rowid, question_text)
+        VALUES ('delete', old.id, old.question_text);
+        INSERT INTO polls_question_fts (rowid, question_text) VALUES (new.id, new.question_text);
+    END
+    """,
+    "INSERT INTO polls_question_fts (polls_question_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS polls_question_fts_insert",
+    "DROP TRIGGER IF EXISTS polls_question_fts_delete",
+    "DROP TRIGGER IF EXISTS polls_question_fts_update",
+    "DROP TABLE IF EXISTS polls_question_fts",
+]
+
+POSTGRESQL_CREATE = [
+    "CREATE INDEX polls_question_text_search ON polls_question USING gin (to_tsvector('simple', question_text))",
+]
+
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS polls_question_text_search",
+]
+
+
+def has_fts5(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite" and has_fts5(schema_editor):
+        statements = SQLITE_CREATE
+    elif vendor == "postgresql":
+        statements = POSTGRESQL_CREATE
+    else:
+        # polls.search falls back to icontains.
+        return
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRESQL_DROP}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_question_is_closed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -7,6 +7,21 @@ from django.utils import timezone
 class Question(models.Model):
     question_text = models.CharField(max_length=200)
     pub_date = models.DateTimeField("date published")
+    # Kept up to date by counters.apply_increments; see polls_repair_totals.
+    total_votes = models.PositiveIntegerField(default=0)
+    leader = models.ForeignKey(
+        "Choice", null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
+    )
+    # Closed questions are shown but take no more votes.
+    is_closed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the archive walks (pub_date, id) in descending order.
+            models.Index(fields=["pub_date", "id"], name="polls_question_pub_date_id"),
+            # The top polls are read in (total_votes, id) descending order.
+            models.Index(fields=["total_votes", "id"], name="polls_question_total_votes_id"),
+        ]
 
     def __str__(self):
         return self.question_text
@@ -20,5 +35,140 @@ class Choice(models.Model):
     choice_text = models.CharField(max_length=200)
     votes = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # vote looks a choice up by (question_id, id).
+            models.Index(fields=["question", "id"], name="polls_choice_question_id"),
+        ]
+
+    def __str__(self):
+        return self.choice_text
+
+
+class ChoiceVoteShard(models.Model):
+    """
+    One of several counter rows holding part of a choice's votes.
+
+    Spreading the increments of a hot choice over many rows keeps concurrent voters
+    from serializing on a single row lock. The shards are periodically folded back
+    into ``Choice.votes`` by the ``polls_compact_shards`` command.
+    """
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name="vote_shards")
+    shard = models.PositiveSmallIntegerField()
+    votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["choice", "shard"], name="polls_unique_choice_shard"),
+        ]
+
+    def __str__(self):
+        return f"{self.choice_id}#{self.shard}"
+
+
+class VoteOutbox(models.Model):
+    """
+    A vote accepted by the async vote endpoint and not yet applied to the counters.
+
+    Rows are appended by the request and drained in bulk by the ``polls_drain_votes``
+    command, which keeps the counter update off the request latency path.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.choice_id} @ {self.created_at}"
+
+
+class OutboundEmail(models.Model):
+    """
+    An email queued by a view and not yet handed to the email backend.
+
+    Rows are sent in batches over one connection by the ``polls_send_mail`` command.
+    ``next_attempt_at`` is when the row is due next; it is cleared once the email is
+    sent or has failed ``POLLS_MAIL_MAX_ATTEMPTS`` times.
+    """
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="polls_outboundemail_due"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)}"
+
+
+class VoteEvent(models.Model):
+    """
+    An append-only record of votes applied to a choice, one row per choice and batch.
+
+    Events are written next to the counter updates when ``POLLS_VOTE_HISTORY`` is set,
+    rolled up into ``VoteRollup`` by ``polls_rollup_votes`` and pruned after
+    ``POLLS_VOTE_EVENT_RETENTION``.
+    """
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    votes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # The rollup reads the events of a time range; pruning deletes the oldest.
+            models.Index(fields=["created_at"], name="polls_voteevent_created_at"),
+        ]
+
+    def __str__(self):
+        return f"{self.votes} x {self.choice_id} @ {self.created_at}"
+
+
+class VoteRollup(models.Model):
+    """
+    The votes a choice got in one minute, hour or day, starting at ``bucket``.
+    """
+    MINUTE = "minute"
+    HOUR = "hour"
+    DAY = "day"
+    RESOLUTIONS = [(MINUTE, "Minute"), (HOUR, "Hour"), (DAY, "Day")]
+
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    resolution = models.CharField(max_length=6, choices=RESOLUTIONS)
+    bucket = models.DateTimeField()
+    votes = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["choice", "resolution", "bucket"], name="polls_unique_choice_rollup"
+            ),
+        ]
+        indexes = [
+            # Trend charts read a time range of one question at one resolution.
+            models.Index(fields=["question", "resolution", "bucket"], name="polls_voterollup_range"),
+            # Rollups and pruning read a time range of one resolution.
+            models.Index(fields=["resolution", "bucket"], name="polls_voterollup_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.votes} x {self.choice_id} @ {self.resolution} {self.bucket}"
+
+
+class RollupWatermark(models.Model):
+    """
+    The time up to which the buckets of a resolution are complete.
+    """
+    resolution = models.CharField(max_length=6, primary_key=True, choices=VoteRollup.RESOLUTIONS)
+    until = models.DateTimeField()
+
     def __str__(self):
-        return self.choice_text
\ No newline at end of file
+        return f"{self.resolution} until {self.until}"
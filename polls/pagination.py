@@ -0,0 +1,48 @@
+""" This module contains the opaque cursor tokens used by the keyset-paginated listings """
+
+import binascii
+import json
+
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+class InvalidCursor(ValueError):
+    """ Raised when a cursor token cannot be decoded. """
+
+
+def encode_cursor(*values):
+    """
+    Encodes the sort key of the last row of a page into an opaque cursor token.
+
+    Args:
+        *values: The JSON-serializable values of the sort key, e.g. ("2024-01-01T00:00:00+00:00", 42).
+
+    Returns:
+        str: A URL-safe cursor token.
+    """
+    return urlsafe_base64_encode(json.dumps(values, separators=(",", ":")).encode())
+
+
+def decode_cursor(token, size):
+    """
+    Decodes a cursor token back into the sort key values it was built from.
+
+    Args:
+        token (str): The cursor token, as returned by ``encode_cursor``.
+        size (int): The number of values the sort key is expected to have.
+
+    Returns:
+        list: The sort key values.
+
+    Raises:
+        InvalidCursor: If the token is malformed or has the wrong number of values.
+    """
+    try:
+        values = json.loads(urlsafe_base64_decode(token))
+    except (binascii.Error, ValueError, TypeError) as error:
+        raise InvalidCursor(token) from error
+
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor(token)
+
+    return values
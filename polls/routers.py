@@ -0,0 +1,63 @@
+""" This module contains the database router sending reads to replicas and writes to the primary """
+
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set for the requests that must read what they, or the same client just before, wrote.
+_pinned = contextvars.ContextVar("polls_pinned_to_primary", default=False)
+
+
+def get_replicas():
+    """ Returns the aliases of the read replicas, from ``POLLS_DATABASE_REPLICAS`` (default none). """
+    return getattr(settings, "POLLS_DATABASE_REPLICAS", [])
+
+
+def is_pinned():
+    """ Returns whether reads go to the primary in the current context. """
+    return _pinned.get()
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    """ Sends the reads of the enclosed code to the primary (or lets them go to the replicas). """
+    token = _pinned.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Routes the writes of the polls models to the default database and their reads to a
+    random replica. The models of other apps, e.g. sessions and auth, are left to the
+    other routers and the default database.
+
+    Reads go to the primary too while pinned, see ``ReadYourWritesMiddleware``, inside a
+    transaction on the primary, so reads that lock rows or must see the writes before
+    them stay on it, and when no replica is configured.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label != "polls":
+            return None
+        replicas = get_replicas()
+        if not replicas or is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label != "polls":
+            return None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold the same rows as the primary.
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,146 @@
+""" This module contains the full-text search of the questions, ranked and keyset-paginated """
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.db import connections, router
+
+from . import tallies
+from .models import Question
+
+# Letters and digits only, so terms never carry the query syntax of a backend.
+TERM = re.compile(r"[^\W_]+")
+MAX_TERMS = 8
+# Shorter terms match whole words only: a one letter prefix matches most of the table.
+MIN_PREFIX = 2
+
+FTS_TABLE = "polls_question_fts"
+
+SQLITE_SEARCH = """
+    SELECT id, score FROM (
+        SELECT rowid AS id, bm25(polls_question_fts) AS score FROM polls_question_fts WHERE polls_question_fts MATCH %s
+    )
+    {after}
+    ORDER BY score, id
+    LIMIT %s
+"""
+
+# Ranks are negated so that, like bm25 on SQLite, lower scores are better.
+POSTGRESQL_SEARCH = """
+    SELECT id, score FROM (
+        SELECT id, -ts_rank(to_tsvector('simple', question_text), query) AS score
+        FROM polls_question, to_tsquery('simple', %s) AS query
+        WHERE to_tsvector('simple', question_text) @@ query
+    ) AS matches
+    {after}
+    ORDER BY score, id
+    LIMIT %s
+"""
+
+# Resumes after the (score, id) of the last result of the previous page.
+AFTER = "WHERE score > %s OR (score = %s AND id > %s)"
+
+_fts_tables = {}
+
+
+def get_terms(text):
+    """ Returns the lowercased search terms of a query, at most ``MAX_TERMS`` of them. """
+    return TERM.findall(text.lower())[:MAX_TERMS]
+
+
+def has_fts_table(alias):
+    """ Returns whether the FTS5 table of the questions exists on a SQLite database. """
+    connection = connections[alias]
+    key = (alias, connection.settings_dict["NAME"])
+    if key not in _fts_tables:
+        _fts_tables[key] = FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def _search_fallback(terms, after, limit):
+    # Without a full-text index every match is scanned; there is no rank.
+    queryset = Question.objects.order_by("id")
+    if after:
+        queryset = queryset.filter(id__gt=after[1])
+    for term in terms:
+        queryset = queryset.filter(question_text__icontains=term)
+    return [(question_id, 0.0) for question_id in queryset.values_list("id", flat=True)[:limit]]
+
+
+def _search_ids(terms, after, limit):
+    alias = router.db_for_read(Question)
+    connection = connections[alias]
+    if connection.vendor == "sqlite" and has_fts_table(alias):
+        sql = SQLITE_SEARCH
+        query = " ".join(f'"{term}"*' if len(term) >= MIN_PREFIX else f'"{term}"' for term in terms)
+    elif connection.vendor == "postgresql":
+        sql = POSTGRESQL_SEARCH
+        query = " & ".join(f"{term}:*" if len(term) >= MIN_PREFIX else term for term in terms)
+    else:
+        return _search_fallback(terms, after, limit)
+
+    if after:
+        score, question_id = after
+        sql, params = sql.format(after=AFTER), [query, score, score, question_id, limit]
+    else:
+        sql, params = sql.format(after=""), [query, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def search_questions(text, after=None, limit=10):
+    """
+    Returns the questions matching every term of a query, best first.
+
+    Each term of ``MIN_PREFIX`` or more characters matches the words it is a prefix of, so
+    a query can be searched while it is being typed. SQLite uses the FTS5 table and ranks with bm25, PostgreSQL the GIN
+    index on ``to_tsvector('simple', question_text)`` and ranks with ts_rank; other
+    databases fall back to unranked ``icontains`` filters.
+
+    Args:
+        text (str): The query.
+        after (tuple, optional): The (score, id) of the last result of the previous page.
+        limit (int, optional): The maximum number of results. Defaults to 10.
+
+    Returns:
+        list: The results, each with ``id``, ``question_text``, ``pub_date`` and ``score``
+        (lower is better).
+    """
+    terms = get_terms(text)
+    if not terms:
+        return []
+
+    scores = dict(_search_ids(terms, after, limit))
+    questions = Question.objects.filter(pk__in=scores).values("id", "question_text", "pub_date")
+    results = [dict(question, score=scores[question["id"]]) for question in questions]
+    results.sort(key=lambda result: (result["score"], result["id"]))
+    return results
+
+
+def get_cached_page(text, cursor, page_size, build):
+    """
+    Returns a page of search results from the cache, building it on a miss.
+
+    Pages are cached for ``POLLS_SEARCH_CACHE_TIMEOUT`` seconds (default 10), so a burst of
+    keystrokes repeating the same prefixes costs one query per prefix. The key includes
+    the version of the question list, so new questions show up once it is bumped.
+
+    Args:
+        text (str): The query.
+        cursor (str): The cursor of the page, or an empty string for the first page.
+        page_size (int): The number of results per page.
+        build (callable): Returns the page on a cache miss.
+
+    Returns:
+        dict: The page.
+    """
+    digest = hashlib.sha1(f"{' '.join(get_terms(text))}|{cursor}|{page_size}".encode()).hexdigest()
+    key = f"polls:search:{tallies.get_version()}:{digest}"
+    cache = tallies.get_cache()
+    page = cache.get(key)
+    if page is None:
+        page = build()
+        cache.set(key, page, getattr(settings, "POLLS_SEARCH_CACHE_TIMEOUT", 10))
+    return page
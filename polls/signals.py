@@ -0,0 +1,21 @@
+""" This module contains the signal handlers that keep the polls caches consistent """
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import tallies
+from .models import Choice, Question
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question_tally(sender, instance, **kwargs):
+    """ Drops the cached tally of a question that was edited or deleted, and changes the question list. """
+    tallies.invalidate_tally(instance.pk)
+    transaction.on_commit(tallies.bump_version)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def invalidate_choice_tally(sender, instance, **kwargs):
+    """ Drops the cached tally of the question whose choice was edited or deleted. """
+    tallies.invalidate_tally(instance.question_id)
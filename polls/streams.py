@@ -0,0 +1,236 @@
+""" This module contains the in-process fan-out of live tallies to Server-Sent Events streams """
+
+import asyncio
+import json
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.dispatch import receiver
+
+from . import tallies
+from .loaders import load_poll_bundle
+
+logger = logging.getLogger(__name__)
+
+
+def get_interval():
+    """ Returns the minimum time between two updates, in seconds, from ``POLLS_STREAM_INTERVAL_MS`` (default 500). """
+    return getattr(settings, "POLLS_STREAM_INTERVAL_MS", 500) / 1000
+
+
+def get_fallback_interval():
+    """ Returns how often the tally is reread from the database, in seconds, from ``POLLS_STREAM_FALLBACK_MS`` (default 5000). """
+    return getattr(settings, "POLLS_STREAM_FALLBACK_MS", 5000) / 1000
+
+
+def get_heartbeat():
+    """ Returns the seconds between keep-alive comments, from ``POLLS_STREAM_HEARTBEAT`` (default 15). """
+    return getattr(settings, "POLLS_STREAM_HEARTBEAT", 15)
+
+
+def get_max_age():
+    """ Returns the lifetime of a stream in seconds, from ``POLLS_STREAM_MAX_AGE`` (default 300). """
+    return getattr(settings, "POLLS_STREAM_MAX_AGE", 300)
+
+
+def format_event(version, bundle):
+    """
+    Formats a tally as a Server-Sent Event.
+
+    Args:
+        version (int): The version of the question, sent as the event id.
+        bundle (dict): The poll bundle.
+
+    Returns:
+        bytes: The event.
+    """
+    data = json.dumps(bundle, cls=DjangoJSONEncoder, separators=(",", ":"))
+    return f"id: {version}\nevent: tally\ndata: {data}\n\n".encode()
+
+
+class Topic:
+    """
+    The watchers of one question, and the last event sent to them.
+    """
+
+    def __init__(self, question_id):
+        self.question_id = question_id
+        self.queues = set()
+        self.wake = asyncio.Event()
+        self.version = None
+        self.event = None
+        self.task = None
+
+
+class Broadcaster:
+    """
+    Fans the tally of each watched question out to its streams, from one event loop.
+
+    One task per watched question reads the tally, from the cache when its version
+    changed and from the database every ``POLLS_STREAM_FALLBACK_MS``, and hands the same
+    encoded event to every stream at most once per ``POLLS_STREAM_INTERVAL_MS``. The
+    number of watchers does not change the number of cache or database reads.
+    """
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.topics = {}
+
+    def subscribe(self, question_id):
+        """
+        Registers a stream of a question.
+
+        Args:
+            question_id (int): The id of the question.
+
+        Returns:
+            tuple: The topic of the question and the queue receiving its events. The
+            queue only keeps the latest event, so a slow stream skips to the newest tally.
+        """
+        topic = self.topics.get(question_id)
+        if topic is None:
+            topic = self.topics[question_id] = Topic(question_id)
+            topic.task = self.loop.create_task(self._run(topic))
+
+        queue = asyncio.Queue(maxsize=1)
+        topic.queues.add(queue)
+        return topic, queue
+
+    def unsubscribe(self, question_id, queue):
+        """ Removes a stream, stopping the task of the question after its last stream. """
+        topic = self.topics.get(question_id)
+        if topic is None:
+            return
+
+        topic.queues.discard(queue)
+        if not topic.queues:
+            topic.task.cancel()
+            del self.topics[question_id]
+
+    def notify(self, question_id):
+        """ Wakes the task of a question, from any thread, when its tally changed in this process. """
+        topic = self.topics.get(question_id)
+        if topic is not None:
+            try:
+                self.loop.call_soon_threadsafe(topic.wake.set)
+            except RuntimeError:
+                # The loop is closed.
+                pass
+
+    def publish(self, topic, version, bundle):
+        """ Sends a tally to every stream of the question, unless it was already sent. """
+        event = format_event(version, bundle)
+        if event == topic.event:
+            return
+
+        topic.version = version
+        topic.event = event
+        for queue in topic.queues:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _run(self, topic):
+        interval = get_interval()
+        fallback_interval = get_fallback_interval()
+        last_read = self.loop.time()
+
+        while True:
+            try:
+                await asyncio.wait_for(topic.wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            topic.wake.clear()
+
+            try:
+                version = await sync_to_async(tallies.get_version)(topic.question_id)
+                if self.loop.time() - last_read >= fallback_interval:
+                    # Votes applied by other processes only reach a local cache through here.
+                    last_read = self.loop.time()
+                    bundle = await sync_to_async(load_poll_bundle)(topic.question_id)
+                elif version != topic.version:
+                    bundle = await sync_to_async(tallies.get_poll_bundle)(topic.question_id)
+                else:
+                    continue
+            except Exception:
+                # The streams keep their last event; the next interval tries again.
+                logger.exception("Could not read the tally of question %s.", topic.question_id)
+                bundle = None
+
+            if bundle is not None:
+                self.publish(topic, version, bundle)
+            # Coalesce the changes of the next interval into one event.
+            await asyncio.sleep(interval)
+
+
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    """ Returns the broadcaster of the running event loop. """
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = Broadcaster(loop)
+    return broadcaster
+
+
+@receiver(tallies.version_changed)
+def notify_streams(sender, question_id, **kwargs):
+    """ Wakes the streams of a question whose tally changed in this process. """
+    if question_id is None:
+        return
+    for broadcaster in list(_broadcasters.values()):
+        broadcaster.notify(question_id)
+
+
+async def stream_tally(question_id, last_event_id=None):
+    """
+    Yields the Server-Sent Events of a question: its tally now, then on every change.
+
+    The stream sends a keep-alive comment every ``POLLS_STREAM_HEARTBEAT`` seconds and
+    ends after ``POLLS_STREAM_MAX_AGE`` seconds; the client reconnects with the id of the
+    last event and only gets a snapshot if the tally changed in between.
+
+    Args:
+        question_id (int): The id of the question.
+        last_event_id (str, optional): The ``Last-Event-ID`` sent by a reconnecting client.
+
+    Yields:
+        bytes: The events.
+    """
+    broadcaster = get_broadcaster()
+    topic, queue = broadcaster.subscribe(question_id)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + get_max_age()
+
+    try:
+        yield b"retry: 2000\n\n"
+
+        event = topic.event
+        if event is None:
+            version = await sync_to_async(tallies.get_version)(question_id)
+            bundle = await sync_to_async(tallies.get_poll_bundle)(question_id)
+            if bundle is None:
+                return
+            event = format_event(version, bundle)
+        if not event.startswith(f"id: {last_event_id}\n".encode()):
+            yield event
+
+        while True:
+            timeout = min(get_heartbeat(), deadline - loop.time())
+            if timeout <= 0:
+                break
+            try:
+                next_event = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield b": keep-alive\n\n"
+                continue
+            if next_event != event:
+                event = next_event
+                yield event
+    finally:
+        broadcaster.unsubscribe(question_id, queue)
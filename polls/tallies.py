@@ -0,0 +1,267 @@
+""" This module contains the per-question result tally cache used by the results page """
+
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.dispatch import Signal
+
+from .loaders import load_poll_bundle
+from .routers import pinned_to_primary
+
+# Sent with ``question_id`` (None for the question list) after a version was bumped.
+version_changed = Signal()
+
+
+def get_cache():
+    """
+    Returns the cache holding the tallies.
+
+    The cache must be shared by every worker, e.g. Redis or Memcached: votes are added to
+    the cached counters of the worker that applied them only, so with a per-process cache
+    such as ``LocMemCache`` each worker shows its own counts. See ``checks.check_tally_cache``.
+
+    Settings:
+        POLLS_TALLY_CACHE (str): The alias of the cache in ``CACHES``. Defaults to "default".
+            Eviction follows that cache's own options (e.g. ``MAX_ENTRIES``).
+    """
+    return caches[getattr(settings, "POLLS_TALLY_CACHE", "default")]
+
+
+def get_timeout():
+    """ Returns the tally TTL in seconds, from ``POLLS_TALLY_CACHE_TIMEOUT`` (default 300). """
+    return getattr(settings, "POLLS_TALLY_CACHE_TIMEOUT", 300)
+
+
+def _question_key(question_id):
+    return f"polls:tally:{question_id}"
+
+
+def _votes_key(question_id, choice_id):
+    return f"polls:tally:{question_id}:votes:{choice_id}"
+
+
+def _pending_key(question_id):
+    return f"polls:tally:{question_id}:pending"
+
+
+def _generation_key(question_id):
+    return f"polls:tally:{question_id}:generation"
+
+
+def _version_key(question_id):
+    return "polls:version:index" if question_id is None else f"polls:version:{question_id}"
+
+
+def get_version_timeout():
+    """
+    Returns the lifetime of a version in seconds, from ``POLLS_VERSION_TIMEOUT`` (default a day).
+
+    A version that expired is recreated with the current time, which only costs one full
+    response to the clients holding the old one.
+    """
+    return getattr(settings, "POLLS_VERSION_TIMEOUT", 86400)
+
+
+def get_version(question_id=None):
+    """
+    Returns the version of a question, or of the question list, creating it if needed.
+
+    A version is the time of the last change in microseconds. It changes whenever the
+    votes, pending votes, choices or text of the question change, or for the question list,
+    whenever a question is added, edited or deleted.
+
+    Args:
+        question_id (int, optional): The id of the question, or None for the question list.
+
+    Returns:
+        int: The version.
+    """
+    cache = get_cache()
+    key = _version_key(question_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, get_version_timeout())
+        # A cache that stores nothing yields a new version per call, so pages never match.
+        version = cache.get(key) or time.time_ns() // 1000
+    return version
+
+
+def bump_version(question_id=None):
+    """
+    Gives a question, or the question list, a new version.
+
+    Args:
+        question_id (int, optional): The id of the question, or None for the question list.
+    """
+    get_cache().set(_version_key(question_id), time.time_ns() // 1000, get_version_timeout())
+    version_changed.send(sender=None, question_id=question_id)
+
+
+def get_tally(question_id):
+    """
+    Returns the cached tally of a question, or None on a cache miss.
+
+    The tally is stored as one entry for the question and its choice texts, and one
+    counter per choice, so votes can be added with an atomic ``incr``.
+
+    Args:
+        question_id (int): The id of the question.
+
+    Returns:
+        dict: The tally, in the poll bundle format of ``loaders.load_poll_bundle``.
+    """
+    cache = get_cache()
+    question = cache.get(_question_key(question_id))
+    if question is None:
+        return None
+
+    keys = [_votes_key(question_id, choice["id"]) for choice in question["choices"]]
+    keys.append(_pending_key(question_id))
+    values = cache.get_many(keys)
+    if len(values) != len(keys):
+        return None
+
+    choices = [
+        dict(choice, votes=values[_votes_key(question_id, choice["id"])])
+        for choice in question["choices"]
+    ]
+
+    return {
+        "id": question["id"],
+        "question_text": question["question_text"],
+        "pub_date": question["pub_date"],
+        "choices": choices,
+        "total_votes": sum(choice["votes"] for choice in choices),
+        "pending_votes": values[_pending_key(question_id)],
+    }
+
+
+def build_tally(question_id):
+    """
+    Loads the tally of a question from the database and stores it in the cache.
+
+    Votes committed while the tally is loaded may be missing from it, and their ``incr``
+    can land before it is cached, so it would stay stale until it expires. Votes change
+    the generation of the question before adding to its counters, so the tally is dropped
+    again when the generation changed between the load and the write.
+
+    Args:
+        question_id (int): The id of the question.
+
+    Returns:
+        dict: The tally, in the format returned by ``get_tally``, or None if the
+        question does not exist.
+    """
+    # Later votes are added to the cached counters, so they must start from the primary,
+    # not from a lagging replica.
+    cache = get_cache()
+    generation = cache.get(_generation_key(question_id))
+    with pinned_to_primary():
+        bundle = load_poll_bundle(question_id)
+    if bundle is None:
+        return None
+
+    entries = {
+        _question_key(question_id): {
+            "id": bundle["id"],
+            "question_text": bundle["question_text"],
+            "pub_date": bundle["pub_date"],
+            "choices": [
+                {"id": choice["id"], "choice_text": choice["choice_text"]}
+                for choice in bundle["choices"]
+            ],
+        },
+        _pending_key(question_id): bundle["pending_votes"],
+    }
+    for choice in bundle["choices"]:
+        entries[_votes_key(question_id, choice["id"])] = choice["votes"]
+
+    cache.set_many(entries, get_timeout())
+    if cache.get(_generation_key(question_id)) != generation:
+        cache.delete(_question_key(question_id))
+
+    return bundle
+
+
+def get_poll_bundle(question_id):
+    """
+    Returns the poll bundle of a question from the cache, loading it on a miss.
+
+    Args:
+        question_id (int): The id of the question.
+
+    Returns:
+        dict: The poll bundle, or None if the question does not exist.
+    """
+    tally = get_tally(question_id)
+    if tally is None:
+        tally = build_tally(question_id)
+
+    return tally
+
+
+def invalidate_tally(question_id):
+    """
+    Drops the cached tally of a question, e.g. after its choices were edited.
+
+    Args:
+        question_id (int): The id of the question.
+    """
+    def invalidate():
+        # Dropped again, as a read before the commit may have cached the old rows.
+        get_cache().delete(_question_key(question_id))
+        bump_version(question_id)
+
+    get_cache().delete(_question_key(question_id))
+    transaction.on_commit(invalidate)
+
+
+def _touch(question_id):
+    # Any change of the generation makes a concurrent build_tally drop what it cached.
+    get_cache().set(_generation_key(question_id), time.time_ns(), get_timeout())
+
+
+def _incr(key, delta):
+    try:
+        get_cache().incr(key, delta)
+    except ValueError:
+        # Not cached: the next read rebuilds the tally from the database.
+        pass
+
+
+def add_votes(increments):
+    """
+    Adds applied votes to the cached tallies once the current transaction commits.
+
+    Args:
+        increments (dict): A mapping of (question_id, choice_id) to the number of votes added.
+    """
+    def update():
+        for question_id in {question_id for question_id, _ in increments}:
+            _touch(question_id)
+        for (question_id, choice_id), count in increments.items():
+            if count:
+                _incr(_votes_key(question_id, choice_id), count)
+        # Bumped after the tally, so a page carrying the new version shows the new votes.
+        for question_id in {question_id for question_id, _ in increments}:
+            bump_version(question_id)
+
+    transaction.on_commit(update)
+
+
+def add_pending(question_id, count):
+    """
+    Adjusts the cached number of queued votes of a question once the current transaction commits.
+
+    Args:
+        question_id (int): The id of the question.
+        count (int): The number of votes queued (positive) or drained (negative).
+    """
+    def update():
+        _touch(question_id)
+        _incr(_pending_key(question_id), count)
+        bump_version(question_id)
+
+    transaction.on_commit(update)
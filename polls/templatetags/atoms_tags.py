@@ -1,10 +1,11 @@
 """ This module contains the template tags for the atoms components"""
 
 from django import template
+from .memo import memoized_inclusion_tag
 
 register = template.Library()
 
-@register.inclusion_tag("gui/components/atoms/text.html")
+@memoized_inclusion_tag(register, "polls/components/atoms/text.html")
 def text(k_text="Text", **kwargs):
     """
     Renders a text component with the specified size, text, and style.
@@ -32,7 +33,7 @@ def text(k_text="Text", **kwargs):
 
     return { "size": size, "text": k_text, "style": style }
 
-@register.inclusion_tag("gui/components/atoms/title.html")
+@memoized_inclusion_tag(register, "polls/components/atoms/title.html")
 def title(k_title="Title", **kwargs):
     """
     Renders a title component with the specified size, text, and style.
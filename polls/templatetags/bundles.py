@@ -0,0 +1,238 @@
+""" This module contains the asset bundler used by the stylesheet and script tags """
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import smart_split
+from django.template.utils import get_app_template_dirs
+
+from .utils import BASE_DIR, get_static_paths
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+_manifest = None
+_manifest_lock = threading.Lock()
+# The file sets already reported as missing a bundle.
+_missing = set()
+
+
+def is_bundling_enabled():
+    """ Returns whether the asset tags emit bundles, from ``POLLS_ASSET_BUNDLE`` (default False). """
+    return getattr(settings, "POLLS_ASSET_BUNDLE", False)
+
+
+def get_bundle_root():
+    """
+    Returns the static directory the bundles are written to.
+
+    Settings:
+        POLLS_ASSET_BUNDLE_ROOT (str): Defaults to the polls app static directory, so the
+            bundles are served by the staticfiles finders and picked up by collectstatic.
+            Another directory must be in ``STATICFILES_DIRS``.
+    """
+    return getattr(settings, "POLLS_ASSET_BUNDLE_ROOT", os.path.join(BASE_DIR, "polls", "static"))
+
+
+def _source_files(paths):
+    sources = []
+    for path in paths:
+        absolute_path = finders.find(path)
+        if absolute_path is None:
+            raise FileNotFoundError(path)
+        sources.append(absolute_path)
+    return sources
+
+
+def _write(path, content):
+    # Write then rename, so a concurrent request never serves a partial file.
+    temporary_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporary_path, "wb") as bundle_file:
+        bundle_file.write(content)
+    os.replace(temporary_path, path)
+
+
+def build_bundle(paths, file_extension):
+    """
+    Concatenates static files into one content-hashed bundle with precompressed variants.
+
+    The bundle is written as ``polls/bundles/<hash><extension>`` next to a gzip (``.gz``)
+    variant and, when the optional ``brotli`` package is installed, a brotli (``.br``) one.
+    Stylesheets must not rely on ``url()`` paths relative to their original location.
+
+    Args:
+        paths (list): The static paths of the files to bundle, in order.
+        file_extension (str): The extension of the bundle, e.g. ".css".
+
+    Returns:
+        dict: The bundle, with ``path`` (its static path) and ``sources`` (the modification
+        time of every bundled file, used to detect changes in DEBUG).
+    """
+    sources = _source_files(paths)
+    parts = []
+    mtimes = {}
+
+    for source in sources:
+        with open(source, "rb") as source_file:
+            parts.append(source_file.read())
+        mtimes[source] = os.stat(source).st_mtime
+
+    content = b"\n".join(parts)
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    path = f"polls/bundles/{digest}{file_extension}"
+    absolute_path = os.path.join(get_bundle_root(), path)
+
+    if not os.path.exists(absolute_path):
+        os.makedirs(os.path.dirname(absolute_path), exist_ok=True)
+        _write(absolute_path, content)
+        _write(f"{absolute_path}.gz", gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write(f"{absolute_path}.br", brotli.compress(content))
+
+    return {"path": path, "sources": mtimes}
+
+
+def get_bundle_manifest_path():
+    """
+    Returns the file mapping each bundled file set to its bundle, written by ``polls_build_bundles``.
+
+    Settings:
+        POLLS_ASSET_BUNDLE_MANIFEST (str): Defaults to ``polls/bundles/manifest.json`` under
+            the bundle root.
+    """
+    return getattr(
+        settings,
+        "POLLS_ASSET_BUNDLE_MANIFEST",
+        os.path.join(get_bundle_root(), "polls", "bundles", "manifest.json"),
+    )
+
+
+def get_bundle_key(paths, file_extension):
+    """ Returns the manifest key of a set of static files. """
+    return f"{file_extension}|{','.join(paths)}"
+
+
+def write_bundle_manifest(bundles):
+    """
+    Writes the bundle manifest.
+
+    Args:
+        bundles (dict): The bundles, as returned by ``build_bundle``, by ``get_bundle_key``.
+    """
+    global _manifest
+
+    path = get_bundle_manifest_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write(path, json.dumps(bundles, indent=2, sort_keys=True).encode())
+    _manifest = None
+
+
+def _load_bundle_manifest():
+    global _manifest
+
+    # Read once; only DEBUG checks the file for changes on every render.
+    path = get_bundle_manifest_path()
+    if _manifest is not None and _manifest[0] == path and not settings.DEBUG:
+        return _manifest[2]
+
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        mtime = None
+
+    with _manifest_lock:
+        if _manifest is None or _manifest[:2] != (path, mtime):
+            bundles = {}
+            if mtime is not None:
+                with open(path, encoding="utf-8") as manifest_file:
+                    bundles = json.load(manifest_file)
+            _manifest = (path, mtime, bundles)
+        return _manifest[2]
+
+
+def _is_stale(bundle):
+    try:
+        return any(os.stat(source).st_mtime != mtime for source, mtime in bundle["sources"].items())
+    except FileNotFoundError:
+        return True
+
+
+def get_bundle_path(paths, file_extension):
+    """
+    Returns the static path of the bundle of the given files, from the bundle manifest.
+
+    Bundles are never built here: they must exist before ``collectstatic`` runs, so
+    ``polls_build_bundles`` writes them at deploy time. A file set without a bundle, or in
+    DEBUG one whose files changed since, gets None, and the files are served one by one.
+
+    Args:
+        paths (list): The static paths of the files to bundle, in order.
+        file_extension (str): The extension of the bundle, e.g. ".css".
+
+    Returns:
+        str: The static path of the bundle, or None.
+    """
+    if not paths:
+        return None
+
+    key = get_bundle_key(paths, file_extension)
+    bundle = _load_bundle_manifest().get(key)
+    if bundle is None:
+        if key not in _missing:
+            _missing.add(key)
+            logger.warning("No bundle for %s, run polls_build_bundles.", key)
+        return None
+    if settings.DEBUG and _is_stale(bundle):
+        return None
+    return bundle["path"]
+
+
+# The tags whose arguments select bundled files, with the folder and extension they read.
+BUNDLE_TAGS = {
+    "get_stylesheets": ("polls/css", ".css"),
+    "get_scripts": ("polls/js", ".js"),
+    "get_script_preloads": ("polls/js", ".js"),
+}
+BUNDLE_TAG = re.compile(r"{%\s*(" + "|".join(BUNDLE_TAGS) + r")((?:\s+(?:'[^']*'|\"[^\"]*\"))*)\s*%}")
+
+
+def find_bundle_sets():
+    """
+    Finds the file sets the asset tags of the project templates ask for.
+
+    Returns:
+        set: The (file extension, paths) of each set, the paths in tag order.
+    """
+    directories = list(get_app_template_dirs("templates"))
+    for engine in engines.all():
+        if isinstance(engine, DjangoTemplates):
+            directories.extend(engine.engine.dirs)
+
+    sets = set()
+    for directory in directories:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if not filename.endswith(".html"):
+                    continue
+                with open(os.path.join(root, filename), encoding="utf-8") as template_file:
+                    source = template_file.read()
+                for tag, arguments in BUNDLE_TAG.findall(source):
+                    folder, file_extension = BUNDLE_TAGS[tag]
+                    components = [argument[1:-1] for argument in smart_split(arguments)]
+                    paths = get_static_paths("polls", folder, file_extension, components)
+                    if paths:
+                        sets.add((file_extension, tuple(paths)))
+    return sets
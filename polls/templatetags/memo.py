@@ -0,0 +1,182 @@
+""" This module contains the rendered-output cache used by the component template tags """
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+
+class RenderCache:
+    """
+    A bounded, thread-safe LRU cache of rendered component HTML, with hit and miss counters.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """ Returns the cached HTML for ``key``, or None, counting the hit or miss. """
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+            return html
+
+    def set(self, key, html):
+        """ Stores the HTML for ``key``, evicting the least recently used entry when full. """
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        """ Changes the maximum size, evicting the least recently used entries beyond it. """
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """ Drops every entry and resets the counters. """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        """ Returns the hits, misses, current size and maximum size of the cache. """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+render_cache = RenderCache(getattr(settings, "POLLS_COMPONENT_CACHE_SIZE", 1024))
+
+
+@receiver(setting_changed)
+def resize_render_cache(setting, value, **kwargs):
+    """ Follows changes of ``POLLS_COMPONENT_CACHE_SIZE``, e.g. in tests. """
+    if setting == "POLLS_COMPONENT_CACHE_SIZE":
+        render_cache.resize(1024 if value is None else value)
+
+
+def is_render_cache_enabled():
+    """ Returns whether component output is cached, from ``POLLS_COMPONENT_CACHE`` (default False). """
+    return getattr(settings, "POLLS_COMPONENT_CACHE", False)
+
+
+def is_fast_renderer_enabled():
+    """ Returns whether components skip the template engine, from ``POLLS_COMPONENT_RENDERER``. """
+    return getattr(settings, "POLLS_COMPONENT_RENDERER", "template") == "fast"
+
+
+def _freeze(value):
+    # The type is part of the key: True and 1, or str and SafeString, render differently.
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return (type(value).__name__, value)
+    if isinstance(value, (list, tuple)):
+        return ("list", tuple(_freeze(item) for item in value))
+    if isinstance(value, dict):
+        return ("dict", tuple(sorted((key, _freeze(item)) for key, item in value.items())))
+    raise TypeError(f"Cannot build a cache key from {type(value).__name__}")
+
+
+def make_key(name, args, kwargs, autoescape):
+    """
+    Builds the cache key of a tag call from its normalized arguments.
+
+    Args:
+        name (str): The name of the tag.
+        args (tuple): The positional arguments of the call.
+        kwargs (dict): The keyword arguments of the call.
+        autoescape (bool): Whether the calling template autoescapes.
+
+    Returns:
+        tuple: The key, or None when an argument is not a plain literal and the call
+        must not be cached.
+    """
+    try:
+        return (name, autoescape, _freeze(list(args)), _freeze(kwargs))
+    except TypeError:
+        return None
+
+
+def memoized_inclusion_tag(register, filename):
+    """
+    Registers an inclusion tag whose rendered output can be cached per normalized arguments.
+
+    The tag renders exactly like ``register.inclusion_tag(filename)``. With
+    ``POLLS_COMPONENT_RENDERER = "fast"`` it uses the template-free renderer of the
+    component from ``renderers.FAST_RENDERERS`` instead, which produces the same HTML. When
+    ``POLLS_COMPONENT_CACHE`` is enabled, the output of calls made with plain literal
+    arguments is kept in a bounded LRU (``POLLS_COMPONENT_CACHE_SIZE``, default 1024),
+    per active language and localization, so identical components are rendered once.
+
+    Args:
+        register (Library): The template library to register the tag in.
+        filename (str): The template rendered by the tag.
+
+    Returns:
+        function: A decorator taking the function that builds the template context.
+    """
+    def dec(func):
+        def render(context, *args, **kwargs):
+            key = None
+            if is_render_cache_enabled():
+                key = make_key(func.__name__, args, kwargs, context.autoescape)
+                if key is not None:
+                    # The same call renders differently per language and localization.
+                    key = (*key, get_language(), context.use_l10n)
+                    html = render_cache.get(key)
+                    if html is not None:
+                        return html
+
+            values = func(*args, **kwargs)
+            fast_renderer = None
+            # The renderers print missing variables as "", like the default string_if_invalid.
+            if is_fast_renderer_enabled() and not context.template.engine.string_if_invalid:
+                from .renderers import FAST_RENDERERS
+                fast_renderer = FAST_RENDERERS.get(filename)
+
+            if fast_renderer is not None:
+                html = mark_safe(fast_renderer(values, context))
+            else:
+                template = context.render_context.get(render)
+                if template is None:
+                    template = context.template.engine.get_template(filename)
+                    context.render_context[render] = template
+
+                new_context = context.new(values)
+                csrf_token = context.get("csrf_token")
+                if csrf_token is not None:
+                    new_context["csrf_token"] = csrf_token
+
+                html = mark_safe(template.render(new_context))
+
+            if key is not None:
+                render_cache.set(key, html)
+            return html
+
+        render.__doc__ = func.__doc__
+        register.simple_tag(render, takes_context=True, name=func.__name__)
+        return func
+
+    return dec
@@ -1,11 +1,12 @@
 """ This module contains the template tags for the molecules components"""
 
 from django import template
+from .memo import memoized_inclusion_tag
 from .utils import get_html_attrs_from_kwargs
 
 register = template.Library()
 
-@register.inclusion_tag("polls/components/molecules/divider.html")
+@memoized_inclusion_tag(register, "polls/components/molecules/divider.html")
 def divider(title=None, **kwargs):
     """
     Renders a divider component with the specified type, title, and orientation.
@@ -33,7 +34,7 @@ def divider(title=None, **kwargs):
 
     return { "type": k_type, "title": title, "orientation": orientation }
 
-@register.inclusion_tag("polls/components/molecules/input_checkbox.html")
+@memoized_inclusion_tag(register, "polls/components/molecules/input_checkbox.html")
 def input_checkbox(**kwargs):
     """
     Renders an input checkbox component with the specified properties.
@@ -74,7 +75,7 @@ def input_checkbox(**kwargs):
 
     return { "label": label, "checked": checked, "disabled": disabled, "indeterminate": indeterminate}
 
-@register.inclusion_tag("polls/components/molecules/breadcrumb.html")
+@memoized_inclusion_tag(register, "polls/components/molecules/breadcrumb.html")
 def breadcrumb(item1="Home", item2="Overview", **kwargs):
     """
     Renders a breadcrumb component with item1 and item2 menu.
@@ -104,7 +105,7 @@ def breadcrumb(item1="Home", item2="Overview", **kwargs):
 
     return { "item1": item1, "item2": item2 , "type": k_type, "item3": item3 }
 
-@register.inclusion_tag("polls/components/molecules/dropdown.html")
+@memoized_inclusion_tag(register, "polls/components/molecules/dropdown.html")
 def dropdown(title=None, **kwargs):
     """
     Renders a dropdown component with the specified properties.
@@ -135,7 +136,7 @@ def dropdown(title=None, **kwargs):
 
     return { "title": title, "type": k_type, "items": items }
 
-@register.inclusion_tag('polls/components/molecules/input_text.html')
+@memoized_inclusion_tag(register, 'polls/components/molecules/input_text.html')
 def input_text(**kwargs):
     """
     Renders an input text component with the specified attributes.
@@ -173,7 +174,7 @@ def input_text(**kwargs):
         'error': error
     }
 
-@register.inclusion_tag('polls/components/molecules/base_input.html')
+@memoized_inclusion_tag(register, 'polls/components/molecules/base_input.html')
 def base_input(*args, **kwargs):
     """
     Renders a base input component with the specified attributes.
@@ -230,7 +231,7 @@ def base_input(*args, **kwargs):
         'widget': widget
     }
 
-@register.inclusion_tag('polls/components/molecules/input_password.html')
+@memoized_inclusion_tag(register, 'polls/components/molecules/input_password.html')
 def input_password(**kwargs):
     """
     Renders an input field for a password with optional attributes.
@@ -274,7 +275,7 @@ def input_password(**kwargs):
         'error': error, 
     }
 
-@register.inclusion_tag('polls/components/molecules/input_number.html')
+@memoized_inclusion_tag(register, 'polls/components/molecules/input_number.html')
 def input_number(**kwargs):
     """
     Renders an input number component with the specified attributes.
@@ -326,7 +327,7 @@ def input_number(**kwargs):
         'html_attrs': get_html_attrs_from_kwargs(kwargs)
     }
 
-@register.inclusion_tag("polls/components/molecules/input_search.html")
+@memoized_inclusion_tag(register, "polls/components/molecules/input_search.html")
 def input_search(**kwargs):
     """
     Renders an input search component with the specified attributes.
@@ -0,0 +1,347 @@
+""" This module contains template-free renderers for the atoms and molecules components
+
+Each renderer produces exactly the HTML of its component template, from the context
+built by the component's tag function. Values are rendered with the same localization
+and autoescaping rules as ``{{ variable }}``, so the two paths are interchangeable.
+"""
+
+from django.template.base import render_value_in_context
+from django.utils.safestring import SafeData, mark_safe
+
+from . import atoms_tags, molecules_tags
+
+_MISSING = object()
+
+
+def _resolve(obj, *bits):
+    # Mirrors Variable._resolve_lookup: item, then attribute, calling callables.
+    for bit in bits:
+        try:
+            obj = obj[bit]
+        except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+            try:
+                obj = getattr(obj, bit)
+            except (TypeError, AttributeError):
+                return _MISSING
+
+        if callable(obj) and not getattr(obj, "do_not_call_in_templates", False):
+            if getattr(obj, "alters_data", False):
+                return _MISSING
+            try:
+                obj = obj()
+            except TypeError:
+                return _MISSING
+
+    return obj
+
+
+def _is_true(value):
+    return value is not _MISSING and bool(value)
+
+
+def _value(value, context):
+    if value is _MISSING:
+        return ""
+    return render_value_in_context(value, context)
+
+
+def _text(value, context):
+    # {% text value type='default' size='1' %}
+    return render_text(atoms_tags.text(value, type="default", size="1"), context)
+
+
+def _widget_attrs(widget, context):
+    # {% include "django/forms/widgets/attrs.html" %}
+    items = _resolve(widget, "attrs", "items")
+    if items is _MISSING or items is None:
+        return ""
+
+    html = []
+    for name, value in items:
+        if value is not False:
+            html.append(" " + _value(name, context))
+            if value is not True:
+                # |stringformat:'s' keeps the input's safeness.
+                formatted = "%s" % (str(value) if isinstance(value, tuple) else value)
+                if isinstance(value, SafeData):
+                    formatted = mark_safe(formatted)
+                html.append('="' + _value(formatted, context) + '"')
+    return "".join(html)
+
+
+def _nested_base_input(values, context, *args, **kwargs):
+    # {% base_input ... placeholder=placeholder ... %} inside another molecule.
+    for name in ("placeholder", "left_icon", "value", "disabled", "error"):
+        kwargs[name] = values.get(name, "")
+    return render_base_input(molecules_tags.base_input(*args, **kwargs), context)
+
+
+def _joined_html_attrs(values):
+    # html_attrs|safeseq|join:" "
+    return mark_safe(" ".join(values["html_attrs"]))
+
+
+def render_text(values, context):
+    """ Renders polls/components/atoms/text.html. """
+    return (
+        f'<p class="k-text k-text__size--{_value(values["size"], context)} '
+        f'k-text__style--{_value(values["style"], context)}">{_value(values["text"], context)}</p>\n'
+    )
+
+
+def render_title(values, context):
+    """ Renders polls/components/atoms/title.html. """
+    size = values["size"]
+
+    for level in ("1", "2", "3", "4", "5"):
+        if size == level:
+            return (
+                f'\n  <h{level} class="k-title k-title__size--{_value(size, context)} '
+                f'k-title__style--{_value(values["style"], context)}">'
+                f'{_value(values["title"], context)}</h{level}>\n\n'
+            )
+
+    return "\n"
+
+
+def render_base_input(values, context):
+    """ Renders polls/components/molecules/base_input.html. """
+    left_icon = values["left_icon"]
+    right_icon = values["right_icon"]
+    disabled = values["disabled"]
+    value = values["value"]
+
+    html = [
+        '\n<div class="k-base-input ',
+        "k-base-input__with--left-icon" if left_icon else "",
+        " ",
+        "k-base-input__with--right-icon" if right_icon else "",
+        " ",
+        "k-base-input__disabled" if disabled else "",
+        '" onmouseleave="blurChildInput(this)">\n  ',
+    ]
+    if left_icon:
+        html.append(f'\n  <i class="k-base-input__icon {_value(left_icon, context)}"></i>\n  ')
+
+    html += [
+        "\n  <input ",
+        _widget_attrs(values["widget"], context),
+        " ",
+        "".join(_value(attr, context) for attr in values["html_attrs"] or ()),
+        f' type="{_value(values["type"], context)}"',
+        f' placeholder="{_value(values["placeholder"], context)}"',
+        ' class="k-base-input__placeholder ',
+        "k-base-input__error" if values["error"] else "",
+        '" ',
+        "disabled" if disabled else "",
+        " ",
+        f'value="{_value(value, context)}"' if value else "",
+        ">\n  ",
+    ]
+    if right_icon:
+        html.append(f'\n  <i class="k-base-input__icon {_value(right_icon, context)}" ')
+        if values["on_right_icon_click"]:
+            html.append(f'onClick="{_value(values["on_right_icon_click"], context)}"')
+        html.append("></i>\n  ")
+
+    html.append("\n</div>")
+    return "".join(html)
+
+
+def render_input_text(values, context):
+    """ Renders polls/components/molecules/input_text.html. """
+    base_input = _nested_base_input(values, context, k_type="text")
+    return f'\n\n<div class="k-input-text">\n  {base_input}\n</div>\n'
+
+
+def render_input_password(values, context):
+    """ Renders polls/components/molecules/input_password.html. """
+    base_input = _nested_base_input(
+        values,
+        context,
+        k_type="text",
+        right_icon="bi bi-eye",
+        on_right_icon_click="toggleRightIcon(this)",
+        widget=values.get("widget", ""),
+    )
+    return f'\n\n<div class="k-input-password">\n  {base_input}\n</div>\n\n'
+
+
+def render_input_search(values, context):
+    """ Renders polls/components/molecules/input_search.html. """
+    base_input = _nested_base_input(
+        values,
+        context,
+        _joined_html_attrs(values),
+        type="search",
+        right_icon="bi bi-search",
+        on_right_icon_click="handleSearch(this)",
+    )
+    return f'\n\n<div class="k-input-search">\n    {base_input}\n</div>\n'
+
+
+def render_input_number(values, context):
+    """ Renders polls/components/molecules/input_number.html. """
+    base_input = _nested_base_input(values, context, _joined_html_attrs(values), type="number")
+    disabled = "k-input-number__disabled" if values["disabled"] else ""
+    return (
+        f'\n\n<div class="k-input-number {disabled}">\n    {base_input}\n'
+        '    <div class="k-input-number__controls-wrap" onmouseenter="focusParentInput(this)" onmouseleave="blurParentInput(this)">\n'
+        '        <div class="k-input-number__control" onclick="increaseInputNumber(this)">\n'
+        '            <i class="bi bi-chevron-up"></i>\n'
+        '        </div>\n'
+        '        <div class="k-input-number__control" onclick="decreaseInputNumber(this)">\n'
+        '            <i class="bi bi-chevron-down"></i>\n'
+        '        </div>\n'
+        '    </div>\n'
+        '</div>'
+    )
+
+
+def render_input_checkbox(values, context):
+    """ Renders polls/components/molecules/input_checkbox.html. """
+    disabled = values["disabled"]
+    indeterminate = values["indeterminate"]
+    label = values["label"]
+
+    html = [
+        '\n\n<label class="k-input-checkbox ',
+        "k-input-checkbox__disabled" if disabled else "",
+        '">\n  <input \n    type="checkbox" \n    name="checkbox" \n    ',
+        "disabled" if disabled else "",
+        " \n    ",
+        "checked" if values["checked"] and not indeterminate else "",
+        " \n    ",
+        "indeterminate" if indeterminate else "",
+        "\n  />\n  ",
+    ]
+    if label:
+        html.append(f'\n    <span class="k-input-checkbox__label">\n      {_text(label, context)}\n    </span>\n  ')
+
+    html.append("\n</label>\n")
+    return "".join(html)
+
+
+_DIVIDER_LINE = '      <span class="k-divider-horizontal__line--{} k-divider-horizontal__line"></span>\n'
+_DIVIDER_LINES = {"center": ("full", "full"), "left": ("short", "full"), "right": ("full", "short")}
+
+
+def render_divider(values, context):
+    """ Renders polls/components/molecules/divider.html. """
+    k_type = values["type"]
+    title = values["title"]
+    orientation = values["orientation"]
+    branch = ""
+
+    if k_type == "horizontal" and title and orientation in _DIVIDER_LINES:
+        first, last = _DIVIDER_LINES[orientation]
+        branch = (
+            '\n    <div class="k-divider-horizontal">\n'
+            + _DIVIDER_LINE.format(first)
+            + f'      <span class="k-divider-horizontal__title">{_text(title, context)}</span>\n'
+            + _DIVIDER_LINE.format(last)
+            + "    </div>\n  "
+        )
+    elif k_type == "horizontal" and not title:
+        branch = '\n    <div class="k-divider-horizontal">\n' + _DIVIDER_LINE.format("full") + "    </div>\n  "
+    elif k_type == "vertical":
+        branch = '\n    <div class="k-divider-vertical">\n      <span class="k-divider-vertical__line"></span>\n    </div>\n  '
+
+    return f'\n\n<div class="k-divider">\n  {branch}\n</div>\n'
+
+
+_BREADCRUMB_ITEM = (
+    '            <li class="breadcrumb-item k-breadcrumb__item">\n'
+    '                <span class="k-breadcrumb__item-title">{}</span></li>\n'
+    '            <li class="k-breadcrumb__divider" >/</li>\n'
+)
+_BREADCRUMB_ACTIVE_ITEM = '            <li class="breadcrumb-item-active k-breadcrumb__item--active">{}</li>\n        '
+
+
+def render_breadcrumb(values, context):
+    """ Renders polls/components/molecules/breadcrumb.html. """
+    k_type = values["type"]
+    branch = ""
+
+    if k_type == "2":
+        branch = (
+            "\t" * 9 + "\n"
+            + _BREADCRUMB_ITEM.format(_text(values["item1"], context))
+            + _BREADCRUMB_ACTIVE_ITEM.format(_text(values["item2"], context))
+        )
+    elif k_type == "3" and values["item3"]:
+        branch = (
+            "\n"
+            + _BREADCRUMB_ITEM.format(_text(values["item1"], context))
+            + _BREADCRUMB_ITEM.format(_text(values["item2"], context))
+            + _BREADCRUMB_ACTIVE_ITEM.format(_text(values["item3"], context))
+        )
+
+    return (
+        '\n<nav aria-label="breadcrumb">\n    <ol class="breadcrumb bg-transparent k-breadcrumb">\n        '
+        + branch
+        + "\t" * 9 + "\n    </ol>\n</nav>\n"
+    )
+
+
+_DROPDOWN_BUTTON = (
+    '\n        <button class="btn dropdown-toggle k-dropdown__button k-dropdown__button--{}" type="button" '
+    'id="dropdownMenuButton" data-toggle="dropdown" aria-haspopup="true" aria-expanded="false">\n'
+)
+_DROPDOWN_ICONS = {
+    "secondary": '<i class="bi bi-chevron-down"></i>',
+    "primary": '<i class="bi bi-chevron-down k-dropdown__icon"></i>',
+    "borderless": '<i class="bi bi-chevron-down"></i>',
+}
+
+
+def render_dropdown(values, context):
+    """ Renders polls/components/molecules/dropdown.html. """
+    k_type = values["type"]
+    branch = ""
+
+    if k_type in _DROPDOWN_ICONS:
+        branch = (
+            _DROPDOWN_BUTTON.format(k_type)
+            + f"            {_text(values['title'], context)}\n"
+            + f"            {_DROPDOWN_ICONS[k_type]}\n"
+            + "        </button>\n    "
+        )
+    elif k_type == "icon":
+        branch = (
+            _DROPDOWN_BUTTON.format("icon")
+            + '            <i class="bi bi-chevron-down"></i>\n'
+            + "        </button>    \n    "
+        )
+
+    items = []
+    for item in values["items"] or ():
+        disabled = " disabled " if _is_true(_resolve(item, "disabled")) else ""
+        active = " active " if _is_true(_resolve(item, "active")) else ""
+        items.append(
+            f'\n            <a class="dropdown-item {disabled} {active}" href="#">'
+            f'{_value(_resolve(item, "label"), context)}</a>\n        '
+        )
+
+    return (
+        '\n\n<div class="dropdown k-dropdown">\n    '
+        + branch
+        + '\n    <div class="dropdown-menu k-dropdown__menu" aria-labelledby="dropdownMenuButton">\n        '
+        + "".join(items)
+        + "\n    </div>\n</div>"
+    )
+
+
+FAST_RENDERERS = {
+    "polls/components/atoms/text.html": render_text,
+    "polls/components/atoms/title.html": render_title,
+    "polls/components/molecules/base_input.html": render_base_input,
+    "polls/components/molecules/breadcrumb.html": render_breadcrumb,
+    "polls/components/molecules/divider.html": render_divider,
+    "polls/components/molecules/dropdown.html": render_dropdown,
+    "polls/components/molecules/input_checkbox.html": render_input_checkbox,
+    "polls/components/molecules/input_number.html": render_input_number,
+    "polls/components/molecules/input_password.html": render_input_password,
+    "polls/components/molecules/input_search.html": render_input_search,
+    "polls/components/molecules/input_text.html": render_input_text,
+}
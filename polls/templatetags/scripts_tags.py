@@ -1,6 +1,7 @@
 """" This module is used to import style sheets dynamically """
 
 from django import template
+from .bundles import get_bundle_path, is_bundling_enabled
 from .utils import get_static_paths
 
 register = template.Library()
@@ -13,6 +14,9 @@ def get_scripts(*args):
     Args:
         *args: Variable number of arguments representing the names of the JavaScript files.
 
+    With ``POLLS_ASSET_BUNDLE`` enabled, the selected scripts are emitted as one tag for
+    their content-hashed bundle, built beforehand by ``polls_build_bundles``.
+
     Returns:
         A dictionary containing the paths of the JavaScript files.
         
@@ -29,6 +33,34 @@ def get_scripts(*args):
         ```
     """
     path = get_static_paths("polls", "polls/js", ".js", args)
-    print('path: ', path)
+
+    bundle = get_bundle_path(path, ".js") if is_bundling_enabled() else None
+    if bundle:
+        path = [bundle]
 
     return { "path": path }
+
+@register.inclusion_tag("polls/script_preloads.html")
+def get_script_preloads(*args):
+    """
+    Emits preload hints for the scripts that ``get_scripts`` will load with the same arguments.
+
+    Place it in the ``<head>`` so the browser fetches the scripts while it parses the page,
+    instead of when it reaches the ``get_scripts`` tag at the end of the body.
+
+    Args:
+        *args: Variable number of arguments representing the names of the JavaScript files.
+
+    Returns:
+        A dictionary containing the paths of the JavaScript files.
+
+    Example:
+        ```
+        # importing
+        {% load scripts_tags %}
+
+        # using
+        {% get_script_preloads 'input_password' %}
+        ```
+    """
+    return get_scripts(*args)
@@ -1,6 +1,7 @@
 """" This module is used to import style sheets dynamically """
 
 from django import template
+from .bundles import get_bundle_path, is_bundling_enabled
 from .utils import get_static_paths
 
 register = template.Library()
@@ -13,6 +14,9 @@ def get_stylesheets(*args):
     Args:
         *args: Variable number of arguments representing the names of the CSS files.
 
+    With ``POLLS_ASSET_BUNDLE`` enabled, the selected stylesheets are emitted as one tag for
+    their content-hashed bundle, built beforehand by ``polls_build_bundles``.
+
     Returns:
         A dictionary containing the paths of the CSS stylesheets.
 
@@ -30,4 +34,8 @@ def get_stylesheets(*args):
     """
     path = get_static_paths("polls", "polls/css", ".css", args)
 
+    bundle = get_bundle_path(path, ".css") if is_bundling_enabled() else None
+    if bundle:
+        path = [bundle]
+
     return { "path": path }
@@ -1,11 +1,110 @@
 """ This module contains utility functions to be used in building templatetags """
 
+import json
 import os
+import threading
 from pathlib import Path
 
+from django.conf import settings
+from django.utils.html import conditional_escape
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
-print('BASE_DIR: ', BASE_DIR)
+# The folders read by the get_stylesheets and get_scripts tags.
+MANIFEST_FOLDERS = [
+    ("polls", "polls/css", ".css"),
+    ("polls", "polls/js", ".js"),
+]
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def build_static_manifest(app_name="gui", folder_name="css", file_extension=".css"):
+    """
+    Walks a static folder once and indexes its files by component name.
+
+    Args:
+        app_name (str): The name of the Django app. Defaults to "gui".
+        folder_name (str): The name of the folder within the app's static directory. Defaults to "css".
+        file_extension (str): The file extension of the static files. Defaults to ".css".
+
+    Returns:
+        dict: The manifest, with ``paths`` (every path, in a stable order), ``positions``
+        (the index of each path), ``components`` (the paths of each component name) and
+        ``mtimes`` (the modification time of every walked directory, used to detect added
+        or removed files).
+    """
+    absolute_static_path = os.path.join(BASE_DIR, app_name, "static")
+    absolute_folder_path = os.path.join(absolute_static_path, folder_name)
+    paths = []
+    components = {}
+    mtimes = {}
+
+    for root, dirs, files in os.walk(absolute_folder_path):
+        dirs.sort()
+        mtimes[root] = os.stat(root).st_mtime
+
+        for absolute_filename in sorted(files):
+            if absolute_filename.endswith(file_extension):
+                href = os.path.join(os.path.relpath(root, absolute_static_path), absolute_filename)
+                filename = absolute_filename[:-len(file_extension)]
+                paths.append(href)
+                components.setdefault(filename, []).append(href)
+
+    positions = {href: position for position, href in enumerate(paths)}
+
+    return {"paths": paths, "positions": positions, "components": components, "mtimes": mtimes}
+
+
+def _is_stale(manifest):
+    try:
+        return any(os.stat(root).st_mtime != mtime for root, mtime in manifest["mtimes"].items())
+    except FileNotFoundError:
+        return True
+
+
+def _load_manifest_file(key):
+    manifest_path = getattr(settings, "POLLS_STATIC_MANIFEST", None)
+    if not manifest_path or not os.path.exists(manifest_path):
+        return None
+
+    with open(manifest_path, encoding="utf-8") as manifest_file:
+        manifests = json.load(manifest_file)
+
+    return manifests.get("|".join(key))
+
+
+def get_static_manifest(app_name="gui", folder_name="css", file_extension=".css"):
+    """
+    Returns the in-memory manifest of a static folder, building it on first use.
+
+    Outside DEBUG the manifest is read from ``POLLS_STATIC_MANIFEST`` when that file
+    exists (see the ``polls_build_manifest`` command), or walked once and kept for the
+    life of the process. In DEBUG it is rebuilt whenever a walked directory changes.
+
+    Args:
+        app_name (str): The name of the Django app. Defaults to "gui".
+        folder_name (str): The name of the folder within the app's static directory. Defaults to "css".
+        file_extension (str): The file extension of the static files. Defaults to ".css".
+
+    Returns:
+        dict: The manifest, as returned by ``build_static_manifest``.
+    """
+    key = (app_name, folder_name, file_extension)
+    manifest = _manifests.get(key)
+
+    if manifest is not None and not (settings.DEBUG and _is_stale(manifest)):
+        return manifest
+
+    with _manifests_lock:
+        manifest = None if settings.DEBUG else _load_manifest_file(key)
+        if manifest is None:
+            manifest = build_static_manifest(app_name, folder_name, file_extension)
+        _manifests[key] = manifest
+
+    return manifest
+
 
 def get_static_paths(app_name="gui", folder_name="css", file_extension=".css", components=None):
     """
@@ -13,6 +112,9 @@ def get_static_paths(app_name="gui", folder_name="css", file_extension=".css", c
     It also receives a tuple with the name of the components to be filtered, the empty component 
     list indicates that all components must be taken into account
 
+    The paths come from the in-memory manifest of the folder, so no filesystem walk
+    happens on render and each component is looked up in constant time.
+
     Args:
         app_name (str): The name of the Django app. Defaults to "gui".
         folder_name (str): The name of the folder within the app's static directory. Defaults to "css".
@@ -20,39 +122,23 @@ def get_static_paths(app_name="gui", folder_name="css", file_extension=".css", c
         components (list): A list of specific components to include. If None, include all components. Defaults to None.
 
     Returns:
-        list: A list of paths to the static files.
-
-    Raises:
-        FileNotFoundError: If the static folder or any of its subfolders does not exist.
+        list: A list of paths to the static files. Empty if the folder does not exist.
     """
-    
-    try:
-        absolute_static_path = os.path.join(BASE_DIR, f"{app_name}/static/")
-        absolute_folder_path = absolute_static_path + folder_name
-        print('absolute_static_path: ', absolute_static_path)
-        print('absolute_folder_path: ', absolute_folder_path)
-        stylesheets_href = []
-
-        for root, _, files in os.walk(absolute_folder_path):
-            print('files: ', files)
-            for absolute_filename in files:
-                if absolute_filename.endswith(file_extension):
-                    base_href = root.replace(absolute_static_path, '')
-                    href = os.path.join(base_href, absolute_filename)
-                    print('absolute_filename: ', absolute_filename)
-                    filename = absolute_filename.replace(file_extension, '')
-
-                    if not components or filename in components:
-                        stylesheets_href.append(href)
-
-        return stylesheets_href
-        
-    except FileNotFoundError:
-        return []
+    manifest = get_static_manifest(app_name, folder_name, file_extension)
+
+    if not components:
+        return list(manifest["paths"])
+
+    selected = set()
+    for component in components:
+        selected.update(manifest["components"].get(component, ()))
+
+    return sorted(selected, key=manifest["positions"].__getitem__)
 
 def get_html_attrs_from_kwargs(kwargs, exception_list=None):
     """
     Returns a list of HTML attribute strings generated from the given keyword arguments.
+    Names and values are HTML-escaped, unless they are already marked safe.
 
     Args:
         kwargs (dict): The keyword arguments to generate HTML attributes from.
@@ -70,8 +156,8 @@ def get_html_attrs_from_kwargs(kwargs, exception_list=None):
     for key, value in kwargs.items():
         if key not in exception_list:
             if isinstance(value, bool) and value:
-                html_attrs.append(key)
+                html_attrs.append(conditional_escape(key))
             elif isinstance(value, str):
-                html_attrs.append(f'{key}="{value}"')
+                html_attrs.append(f'{conditional_escape(key)}="{conditional_escape(value)}"')
     
     return html_attrs
\ No newline at end of file
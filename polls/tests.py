@@ -1,3 +1,1464 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import io
+import json
+import os
+import re
+import shutil
+import smtplib
+import tempfile
+import threading
+import unittest
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends import locmem
+from django.core.management import CommandError, call_command
+from django.contrib.sessions.models import Session
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connection, connections, router, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone, translation
+from django.utils.safestring import mark_safe
+
+from .admin import QuestionAdmin
+from .bench import percentile
+from .counters import (
+    VoteBuffer, apply_increments, compact_shards, drain_outbox, repair_question_totals, reset_votes,
+    with_shard_votes,
+)
+from .loaders import load_poll_bundle
+from .management.commands.polls_bench import find_regressions
+from .mail import enqueue_mail, send_queued_mail
+from .middleware import MetricsMiddleware
+from .models import Choice, ChoiceVoteShard, Question, RollupWatermark, VoteEvent, VoteOutbox, VoteRollup
+from .pagination import encode_cursor
+from .routers import PrimaryReplicaRouter
+from .forms import ContactForm
+from .search import has_fts_table
+from .streams import Broadcaster
+from .transfer import ImportState, TransferError
+from . import history, metrics, tallies, throttle
+from .templatetags import bundles, utils
+from .templatetags.memo import RenderCache, make_key, render_cache
+from .templatetags.renderers import FAST_RENDERERS
+from .warmup import warm_up
+
+# "SCAN [TABLE] <table or alias> [AS <alias>]" without "USING [COVERING] INDEX" is a full
+# table scan; SQLite before 3.36 writes "TABLE", later versions only name the alias.
+FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(?P<table>\w+)(?: AS \w+)?$")
+# The aliases Django gives the tables of subqueries and joins, e.g. "polls_choice" U0.
+TABLE_ALIAS = re.compile(r'"(?P<table>\w+)" (?:AS )?"?(?P<alias>[A-Z]\d+)"?')
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "The query plans are checked with SQLite's EXPLAIN QUERY PLAN.")
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN on every query issued by the polls hot paths and fails if
+    any of them falls back to a full scan of a polls table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.questions = [
+            Question.objects.create(question_text=f"Question {i}", pub_date=now - datetime.timedelta(days=i))
+            for i in range(10)
+        ]
+        cls.question = cls.questions[0]
+        cls.choice = Choice.objects.create(question=cls.question, choice_text="Yes")
+        Choice.objects.create(question=cls.question, choice_text="No")
+        ChoiceVoteShard.objects.create(choice=cls.choice, shard=0, votes=2)
+        VoteOutbox.objects.create(question=cls.question, choice=cls.choice)
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNoFullScans(self, queries, allowed=()):
+        tables = {*connection.introspection.table_names(), "sqlite_master", "sqlite_schema", "sqlite_temp_master"}
+        for query in queries:
+            sql = query["sql"]
+            if not sql.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+                continue
+
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+
+            aliases = {match.group("alias"): match.group("table") for match in TABLE_ALIAS.finditer(sql)}
+            for step in plan:
+                match = FULL_SCAN.match(step)
+                if not match:
+                    continue
+                table = aliases.get(match.group("table"), match.group("table"))
+                # A name that is not a table is an alias that could not be mapped back.
+                if (table.startswith("polls_") or table not in tables) and table not in allowed:
+                    self.fail(f"Full scan of {table}:\n{sql}\n" + "\n".join(plan))
+
+    def assertViewUsesIndexes(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as context:
+            getattr(self.client, method)(url, data)
+        self.assertNoFullScans(context.captured_queries)
+
+    def test_index(self):
+        self.assertViewUsesIndexes("get", reverse("polls:index"))
+
+    def test_archive(self):
+        self.assertViewUsesIndexes("get", reverse("polls:archive"))
+
+    def test_archive_with_cursor(self):
+        question = self.questions[4]
+        cursor = encode_cursor(question.pub_date.isoformat(), question.id)
+        self.assertViewUsesIndexes("get", reverse("polls:archive"), {"cursor": cursor})
+
+    def test_archive_with_invalid_cursor(self):
+        for values in (("2024-01-01T00:00:00+00:00", "x"), ("2024-01-01T00:00:00+00:00", None), (1, 2)):
+            response = self.client.get(reverse("polls:archive"), {"cursor": encode_cursor(*values)})
+            self.assertEqual(response.status_code, 404)
+
+    def test_top(self):
+        self.assertViewUsesIndexes("get", reverse("polls:top"))
+
+    def test_detail(self):
+        self.assertViewUsesIndexes("get", reverse("polls:detail", args=(self.question.id,)))
+
+    def test_results(self):
+        self.assertViewUsesIndexes("get", reverse("polls:results", args=(self.question.id,)))
+
+    def test_data(self):
+        self.assertViewUsesIndexes("get", reverse("polls:data", args=(self.question.id,)))
+
+    def test_trend(self):
+        self.assertViewUsesIndexes("get", reverse("polls:trend", args=(self.question.id,)), {"resolution": "minute"})
+
+    def test_search(self):
+        self.assertViewUsesIndexes("get", reverse("polls:search"), {"q": "quest 1"})
+
+    def test_vote(self):
+        self.assertViewUsesIndexes("post", reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice.id})
+
+    def test_vote_with_invalid_choice(self):
+        self.assertViewUsesIndexes("post", reverse("polls:vote", args=(self.question.id,)), {"choice": 0})
+
+    def test_vote_async(self):
+        self.assertViewUsesIndexes(
+            "post", reverse("polls:vote_async", args=(self.question.id,)), {"choice": self.choice.id}
+        )
+
+    def test_admin_changelist(self):
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "admin"))
+        self.assertViewUsesIndexes("get", reverse("admin:polls_question_changelist"))
+
+    def test_reset_votes(self):
+        with CaptureQueriesContext(connection) as context:
+            reset_votes(Question.objects.filter(pk=self.question.pk))
+        self.assertNoFullScans(context.captured_queries)
+
+    def test_drain_outbox(self):
+        with CaptureQueriesContext(connection) as context:
+            drain_outbox()
+        # Draining reads the head of the queue in rowid order, bounded by the batch size.
+        self.assertNoFullScans(context.captured_queries, allowed=("polls_voteoutbox",))
+
+    def test_compact_shards(self):
+        with CaptureQueriesContext(connection) as context:
+            compact_shards([self.choice.id])
+        self.assertNoFullScans(context.captured_queries)
+
+
+@override_settings(
+    DATABASE_ROUTERS=["polls.routers.PrimaryReplicaRouter"],
+    POLLS_DATABASE_REPLICAS=["replica"],
+    MIDDLEWARE=[*settings.MIDDLEWARE, "polls.middleware.ReadYourWritesMiddleware"],
+)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Checks the read routing with a replica that is a separate database, so it only sees
+    the rows copied by ``replicate``, like a replica lagging behind.
+    """
+
+    # Resolved in setUpClass, once the replica alias exists.
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        # Without a "replica" alias in the settings, a second SQLite database is made up.
+        if "replica" not in connections:
+            directory = tempfile.mkdtemp()
+            connections.settings["replica"] = {
+                **connections.settings[DEFAULT_DB_ALIAS],
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": os.path.join(directory, "replica.sqlite3"),
+                "OPTIONS": {},
+            }
+            cls.addClassCleanup(shutil.rmtree, directory)
+            cls.addClassCleanup(connections.settings.pop, "replica")
+            cls.addClassCleanup(connections.__delitem__, "replica")
+            cls.addClassCleanup(lambda: connections["replica"].close())
+            call_command("migrate", database="replica", verbosity=0)
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        self.question = Question.objects.create(question_text="Replicated", pub_date=timezone.now())
+        self.choice = Choice.objects.create(question=self.question, choice_text="Yes")
+        self.replicate()
+
+    def replicate(self):
+        for model in (Question, Choice):
+            model.objects.using("replica").all().delete()
+            model.objects.using("replica").bulk_create(model.objects.using("default").all())
+
+    def test_reads_go_to_the_replica(self):
+        Question.objects.create(question_text="Lagging", pub_date=timezone.now())
+        self.assertEqual(PrimaryReplicaRouter().db_for_read(Question), "replica")
+        self.assertEqual(Question.objects.count(), 1)
+
+        self.replicate()
+        self.assertEqual(Question.objects.count(), 2)
+
+    def test_other_apps_stay_on_the_primary(self):
+        self.assertEqual(router.db_for_read(User), DEFAULT_DB_ALIAS)
+        self.assertEqual(router.db_for_read(Session), DEFAULT_DB_ALIAS)
+
+    def test_reads_in_a_transaction_go_to_the_primary(self):
+        Question.objects.create(question_text="Lagging", pub_date=timezone.now())
+        with transaction.atomic():
+            self.assertEqual(Question.objects.count(), 2)
+
+    def test_vote_pins_the_client_to_the_primary(self):
+        response = self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("polls_primary", response.cookies)
+        self.assertEqual(Choice.objects.using("default").get(pk=self.choice.id).votes, 1)
+        self.assertEqual(Choice.objects.using("replica").get(pk=self.choice.id).votes, 0)
+
+        Question.objects.create(question_text="Lagging", pub_date=timezone.now())
+        self.assertContains(self.client.get(reverse("polls:index")), "Lagging")
+        self.assertNotContains(self.client_class().get(reverse("polls:index")), "Lagging")
+
+    def test_results_show_the_vote_despite_lag(self):
+        self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.choice.id})
+        response = self.client_class().get(reverse("polls:data", args=(self.question.id,)))
+        self.assertEqual(response.json()["total_votes"], 1)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "Checks the SQLite FTS5 search.")
+class SearchTests(TestCase):
+    """
+    Checks the prefix matching, pagination and indexing of the question search.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        if not has_fts_table("default"):
+            raise unittest.SkipTest("This SQLite has no FTS5.")
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for text in ["What's up?", "What is the weather like?", "Whatever you like", "Café or tea?", "Why?"]:
+            Question.objects.create(question_text=text, pub_date=now)
+
+    def setUp(self):
+        cache.clear()
+
+    def search(self, query, cursor=None):
+        data = {"q": query, "cursor": cursor} if cursor else {"q": query}
+        return self.client.get(reverse("polls:search"), data).json()
+
+    def test_prefixes_match(self):
+        texts = [result["question_text"] for result in self.search("wha")["results"]]
+        self.assertCountEqual(texts, ["What's up?", "What is the weather like?", "Whatever you like"])
+        self.assertEqual([r["question_text"] for r in self.search("cafe")["results"]], ["Café or tea?"])
+
+    def test_every_term_must_match(self):
+        texts = [result["question_text"] for result in self.search("what lik")["results"]]
+        self.assertCountEqual(texts, ["What is the weather like?", "Whatever you like"])
+
+    def test_pages_follow_each_other(self):
+        with self.settings(POLLS_SEARCH_PAGE_SIZE=2):
+            first = self.search("wha")
+            second = self.search("wha", first["next_cursor"])
+        self.assertEqual(len(first["results"]), 2)
+        self.assertEqual(len(second["results"]), 1)
+        self.assertIsNone(second["next_cursor"])
+        ids = [result["id"] for result in first["results"] + second["results"]]
+        self.assertEqual(len(set(ids)), 3)
+
+    def test_edits_are_indexed(self):
+        Question.objects.filter(question_text="Why?").update(question_text="Wherefore?")
+        self.assertEqual(self.search("why")["results"], [])
+        self.assertEqual(len(self.search("wherefore")["results"]), 1)
+
+
+class FormCacheTests(TestCase):
+    """
+    Checks that forms render the same with their widget HTML cached.
+    """
+
+    def setUp(self):
+        render_cache.clear()
+
+    def render(self, data=None, initial=None, cached=True):
+        with self.settings(POLLS_FORM_CACHE=cached):
+            return str(ContactForm(data, initial=initial))
+
+    def test_bound_values_are_filled_in(self):
+        first = {"subject": "<b>Hi</b>", "message": "One", "sender": "a@example.com", "birth_year_year": "1981"}
+        second = dict(first, subject="Bye & co", message="Two", cc_myself="on", birth_year_month="2")
+        for data in (first, second, first):
+            self.assertEqual(self.render(data), self.render(data, cached=False))
+        self.assertIn("&lt;b&gt;Hi&lt;/b&gt;", self.render(first))
+
+    def test_initial_dates(self):
+        initial = {"birth_year": datetime.date(1982, 12, 31)}
+        self.assertEqual(self.render(initial=initial), self.render(initial=initial, cached=False))
+        self.assertEqual(self.render(), self.render(cached=False))
+        self.assertGreater(render_cache.info()["hits"], 0)
+
+
+class WarmupTests(TestCase):
+    """
+    Checks that the warmup reaches every kind of first-request cost.
+    """
+
+    def test_warm_up(self):
+        results = warm_up()
+        self.assertIn("polls/components/molecules/input_password.html", results["templates"])
+        self.assertIn("ContactForm", results["forms"])
+        self.assertIn("polls|polls/css|.css", results["manifests"])
+        self.assertIn("polls:detail", results["routes"])
+
+
+@override_settings(POLLS_VOTE_FILTER=True, POLLS_VOTE_RATE=0.001, POLLS_VOTE_BURST=2)
+class VoteFilterTests(TestCase):
+    """
+    Checks the rate limit and duplicate filter in front of the vote view.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Filtered", pub_date=timezone.now())
+        cls.choice = Choice.objects.create(question=cls.question, choice_text="Yes")
+
+    def setUp(self):
+        cache.clear()
+        throttle._vote_filter = None
+        self.addCleanup(setattr, throttle, "_vote_filter", None)
+        self.url = reverse("polls:vote", args=(self.question.id,))
+
+    def test_new_session_cookies_do_not_reset_the_limit(self):
+        statuses = []
+        for index in range(3):
+            self.client.cookies["sessionid"] = f"forged{index}"
+            statuses.append(self.client.post(self.url, {"choice": 0}).status_code)
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_only_valid_votes_are_remembered(self):
+        with self.settings(POLLS_VOTE_BURST=10):
+            Question.objects.filter(pk=self.question.id).update(is_closed=True)
+            self.assertContains(self.client.post(self.url, {"choice": self.choice.id}), "This poll is closed.")
+            Question.objects.filter(pk=self.question.id).update(is_closed=False)
+            self.client.post(self.url, {"choice": self.choice.id})
+            self.client.post(self.url, {"choice": self.choice.id})
+        self.assertEqual(Choice.objects.get(pk=self.choice.id).votes, 1)
+        self.assertEqual(throttle.get_vote_filter().stats(), {"rate": 0, "duplicate": 1})
+
+
+class BundleTests(TestCase):
+    """
+    Checks that bundles are built by polls_build_bundles and only looked up by the asset tags.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        bundles._manifest = None
+        self.addCleanup(setattr, bundles, "_manifest", None)
+
+    def render(self):
+        return Template("{% load stylesheets_tags %}{% get_stylesheets %}").render(Context())
+
+    def test_tags_fall_back_to_the_files_without_a_bundle(self):
+        with self.settings(POLLS_ASSET_BUNDLE=True, POLLS_ASSET_BUNDLE_ROOT=self.root):
+            with self.assertLogs("polls.templatetags.bundles", "WARNING"):
+                bundles._missing.clear()
+                html = self.render()
+        self.assertNotIn("polls/bundles/", html)
+        self.assertEqual(os.listdir(self.root), [])
+
+    def test_tags_emit_the_built_bundle(self):
+        with self.settings(POLLS_ASSET_BUNDLE=True, POLLS_ASSET_BUNDLE_ROOT=self.root):
+            call_command("polls_build_bundles", stdout=io.StringIO())
+            with open(bundles.get_bundle_manifest_path(), encoding="utf-8") as manifest_file:
+                built = {bundle["path"] for bundle in json.load(manifest_file).values()}
+            html = self.render()
+        self.assertEqual(html.count("<link"), 1)
+        self.assertTrue(any(path in html for path in built))
+        for path in built:
+            self.assertTrue(os.path.exists(os.path.join(self.root, path)))
+
+    def test_manifest_is_only_checked_for_changes_in_debug(self):
+        with self.settings(POLLS_ASSET_BUNDLE=True, POLLS_ASSET_BUNDLE_ROOT=self.root):
+            call_command("polls_build_bundles", stdout=io.StringIO())
+            self.render()
+            with mock.patch("polls.templatetags.bundles.os.stat", wraps=os.stat) as stat:
+                self.render()
+                stat.assert_not_called()
+                with self.settings(DEBUG=True):
+                    self.render()
+                stat.assert_called()
+
+    def test_finds_quoted_names_with_spaces(self):
+        directory = os.path.join(self.root, "templates")
+        os.makedirs(directory)
+        with open(os.path.join(directory, "page.html"), "w", encoding="utf-8") as template_file:
+            template_file.write("{% get_stylesheets 'base' \"not a file\" %}")
+        templates = [{**settings.TEMPLATES[0], "DIRS": [directory]}]
+        with self.settings(TEMPLATES=templates), mock.patch.object(
+            bundles, "get_static_paths", return_value=["polls/css/base.css"]
+        ) as get_static_paths:
+            bundles.find_bundle_sets()
+        get_static_paths.assert_any_call("polls", "polls/css", ".css", ["base", "not a file"])
+
+
+class StaticManifestTests(TestCase):
+    """
+    Checks that the asset tags read static paths from the manifest, kept fresh in DEBUG.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        self.folder = os.path.join(self.root, "app", "static", "app", "css")
+        os.makedirs(self.folder)
+        self.add_file("base.css")
+        utils._manifests.clear()
+        self.addCleanup(utils._manifests.clear)
+
+    def add_file(self, name, mtime=None):
+        with open(os.path.join(self.folder, name), "w", encoding="utf-8"):
+            pass
+        if mtime is not None:
+            # Directory mtimes can be too coarse to see two writes in a row.
+            os.utime(self.folder, (mtime, mtime))
+
+    def paths(self):
+        with mock.patch.object(utils, "BASE_DIR", self.root):
+            return utils.get_static_paths("app", "app/css", ".css")
+
+    def test_walked_once_outside_debug(self):
+        self.assertEqual(self.paths(), ["app/css/base.css"])
+        self.add_file("added.css", mtime=1)
+        self.assertEqual(self.paths(), ["app/css/base.css"])
+
+    def test_rebuilt_in_debug_when_a_folder_changes(self):
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.paths(), ["app/css/base.css"])
+            self.add_file("added.css", mtime=1)
+            self.assertEqual(self.paths(), ["app/css/added.css", "app/css/base.css"])
+
+    def test_read_from_the_manifest_file(self):
+        output = os.path.join(self.root, "manifest.json")
+        call_command("polls_build_manifest", "--output", output, stdout=io.StringIO())
+        walked = utils.get_static_paths("polls", "polls/css", ".css")
+        with open(output, encoding="utf-8") as manifest_file:
+            manifests = json.load(manifest_file)
+        manifest = manifests["polls|polls/css|.css"]
+        manifest["positions"]["polls/css/from-file.css"] = len(manifest["paths"])
+        manifest["paths"].append("polls/css/from-file.css")
+        manifest["components"]["from-file"] = ["polls/css/from-file.css"]
+        with open(output, "w", encoding="utf-8") as manifest_file:
+            json.dump(manifests, manifest_file)
+
+        utils._manifests.clear()
+        with self.settings(POLLS_STATIC_MANIFEST=output), mock.patch.object(utils.os, "walk") as walk:
+            self.assertEqual(utils.get_static_paths("polls", "polls/css", ".css"), [*walked, "polls/css/from-file.css"])
+            self.assertEqual(
+                utils.get_static_paths("polls", "polls/css", ".css", ["from-file"]), ["polls/css/from-file.css"]
+            )
+        walk.assert_not_called()
+
+    def test_walks_without_a_manifest_file(self):
+        with self.settings(POLLS_STATIC_MANIFEST=os.path.join(self.root, "missing.json")):
+            self.assertEqual(self.paths(), ["app/css/base.css"])
+
+
+class TallyTests(TestCase):
+    """
+    Checks that the cached tallies never keep counts older than the database.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Tallied", pub_date=timezone.now())
+        cls.choice = Choice.objects.create(question=cls.question, choice_text="Yes")
+
+    def setUp(self):
+        cache.clear()
+
+    def test_votes_committed_during_a_build_are_not_lost(self):
+        def load_then_vote(question_id):
+            bundle = load_poll_bundle(question_id)
+            with self.captureOnCommitCallbacks(execute=True):
+                apply_increments({(question_id, self.choice.id): 1})
+            return bundle
+
+        with mock.patch("polls.tallies.load_poll_bundle", side_effect=load_then_vote):
+            self.assertEqual(tallies.build_tally(self.question.id)["total_votes"], 0)
+        self.assertEqual(tallies.get_poll_bundle(self.question.id)["total_votes"], 1)
+
+    def test_invalidation_drops_tallies_cached_before_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            tallies.invalidate_tally(self.question.id)
+            # Read by another request before the edit below commits.
+            tallies.get_poll_bundle(self.question.id)
+            Choice.objects.bulk_create([Choice(question=self.question, choice_text="No")])
+        self.assertEqual(len(tallies.get_poll_bundle(self.question.id)["choices"]), 2)
+
+    def test_deploys_change_the_etag(self):
+        url = reverse("polls:results", args=(self.question.id,))
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        with self.settings(POLLS_DEPLOY_VERSION="next"):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class TransferTests(TestCase):
+    """
+    Checks the export, the import and the resume of an interrupted import.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        for index in range(3):
+            question = Question.objects.create(question_text=f"Exported {index}", pub_date=now)
+            Choice.objects.create(question=question, choice_text="Yes", votes=index)
+            Choice.objects.create(question=question, choice_text="No", votes=1)
+        repair_question_totals(Question.objects.values_list("id", flat=True))
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "polls.jsonl")
+
+    def export(self, path=None):
+        call_command("polls_export", path or self.path, stderr=io.StringIO())
+
+    def load(self, *args, path=None):
+        call_command("polls_import", path or self.path, "--chunk-size", "2", *args, stdout=io.StringIO())
+
+    def snapshot(self):
+        return sorted(
+            Choice.objects.values_list("question__question_text", "question__total_votes", "choice_text", "votes")
+        )
+
+    def test_round_trip(self):
+        for path in (self.path, self.path.replace(".jsonl", ".csv")):
+            with self.subTest(path=path):
+                self.export(path)
+                expected = self.snapshot()
+                Question.objects.all().delete()
+                self.load(path=path)
+                self.assertEqual(self.snapshot(), expected)
+
+    def test_import_again_updates_rows(self):
+        self.export()
+        self.load()
+        count = Choice.objects.count()
+        self.load("--restart")
+        self.assertEqual(Choice.objects.count(), count)
+
+    def test_resume_after_a_committed_chunk(self):
+        self.export()
+        count = Choice.objects.count()
+        with mock.patch.object(ImportState, "end_chunk", side_effect=TransferError("interrupted")):
+            with self.assertRaises(CommandError):
+                self.load()
+        self.load()
+        self.assertEqual(Choice.objects.count(), count * 2)
+
+    def test_resume_after_a_rolled_back_update(self):
+        self.export()
+        self.load()
+        Question.objects.update(question_text="Edited")
+        begin_chunk = ImportState.begin_chunk
+
+        def interrupted(state, *args):
+            begin_chunk(state, *args)
+            raise TransferError("interrupted")
+
+        with mock.patch.object(ImportState, "begin_chunk", interrupted):
+            with self.assertRaises(CommandError):
+                self.load("--restart")
+        self.load()
+        # Only the exported questions are edited again, not their imported copies.
+        self.assertEqual(Question.objects.filter(question_text="Edited").count(), 3)
+
+    def test_new_choices_drop_the_tally(self):
+        self.export()
+        source = Question.objects.get(question_text="Exported 0")
+        self.load()
+        question = Question.objects.filter(question_text="Exported 0").latest("id")
+        self.assertEqual(len(tallies.get_poll_bundle(question.id)["choices"]), 2)
+
+        with open(self.path, "a", encoding="utf-8") as output:
+            output.write(json.dumps({"type": "choice", "id": 0, "question": source.id, "text": "Maybe", "votes": 0}))
+            output.write("\n")
+        self.load()
+        self.assertEqual(len(tallies.get_poll_bundle(question.id)["choices"]), 3)
+
+
+class AdminTests(TestCase):
+    """
+    Checks that saving a question in the admin keeps the votes applied meanwhile.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "admin")
+        cls.question = Question.objects.create(question_text="Edited", pub_date=timezone.now())
+        cls.choice = Choice.objects.create(question=cls.question, choice_text="Yes")
+
+    def test_save_keeps_the_counters(self):
+        def vote(method):
+            # Applied after the question, then its choices, were loaded from the database.
+            def voted(admin, *args, **kwargs):
+                apply_increments({(self.question.id, self.choice.id): 1}, update_totals=True)
+                return method(admin, *args, **kwargs)
+            return voted
+
+        self.client.force_login(self.user)
+        url = reverse("admin:polls_question_change", args=(self.question.id,))
+        pub_date = timezone.localtime(self.question.pub_date)
+        with mock.patch.object(QuestionAdmin, "save_form", vote(QuestionAdmin.save_form)), \
+                mock.patch.object(QuestionAdmin, "save_related", vote(QuestionAdmin.save_related)):
+            response = self.client.post(url, {
+                "question_text": "Renamed",
+                "pub_date_0": pub_date.strftime("%Y-%m-%d"),
+                "pub_date_1": pub_date.strftime("%H:%M:%S"),
+                "choice_set-TOTAL_FORMS": "1",
+                "choice_set-INITIAL_FORMS": "1",
+                "choice_set-0-id": self.choice.id,
+                "choice_set-0-question": self.question.id,
+                "choice_set-0-choice_text": "Yes!",
+            })
+        self.assertEqual(response.status_code, 302)
+
+        question = Question.objects.get(pk=self.question.id)
+        choice = Choice.objects.get(pk=self.choice.id)
+        self.assertEqual((question.question_text, choice.choice_text), ("Renamed", "Yes!"))
+        self.assertEqual((question.total_votes, question.leader_id, choice.votes), (2, self.choice.id, 2))
+
+
+class VoteTests(TestCase):
+    """
+    Checks the atomic vote increments and the write-behind vote buffer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Counted", pub_date=timezone.now())
+        cls.yes = Choice.objects.create(question=cls.question, choice_text="Yes")
+        cls.no = Choice.objects.create(question=cls.question, choice_text="No")
+
+    def setUp(self):
+        cache.clear()
+
+    def votes(self):
+        question = Question.objects.get(pk=self.question.id)
+        return question.total_votes, dict(Choice.objects.filter(question=question).values_list("choice_text", "votes"))
+
+    def test_increments_are_computed_by_the_database(self):
+        stale = Choice.objects.get(pk=self.yes.id)
+        # Another request votes after this one read the row.
+        apply_increments({(self.question.id, self.yes.id): 2})
+        with CaptureQueriesContext(connection) as context:
+            apply_increments({(self.question.id, stale.id): 1})
+        # Single votes leave the question row, and its lock, to polls_repair_totals.
+        self.assertEqual(self.votes(), (0, {"Yes": 3, "No": 0}))
+        updates = [query["sql"].split()[1] for query in context.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(updates, ['"polls_choice"'])
+        self.assertFalse(any(query["sql"].startswith("SELECT") for query in context.captured_queries))
+
+    def test_batches_update_every_choice_at_once(self):
+        with CaptureQueriesContext(connection) as context:
+            apply_increments({(self.question.id, self.yes.id): 2, (self.question.id, self.no.id): 5}, update_totals=True)
+        self.assertEqual(self.votes(), (7, {"Yes": 2, "No": 5}))
+        updates = [query["sql"].split()[1] for query in context.captured_queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(updates, ['"polls_choice"', '"polls_question"'])
+
+    def test_buffer_flushes_when_full(self):
+        buffer = VoteBuffer(max_votes=3, flush_interval=60)
+        buffer.add(self.question.id, self.yes.id)
+        buffer.add(self.question.id, self.no.id)
+        self.assertEqual((buffer.pending, self.votes()), (2, (0, {"Yes": 0, "No": 0})))
+        self.assertIsNotNone(buffer._timer)
+
+        buffer.add(self.question.id, self.yes.id)
+        self.assertEqual((buffer.pending, self.votes()), (0, (3, {"Yes": 2, "No": 1})))
+        self.assertIsNone(buffer._timer)
+
+    def test_buffer_counts_concurrent_votes(self):
+        buffer = VoteBuffer(max_votes=10000, flush_interval=60)
+
+        def vote(choice_id):
+            for _ in range(250):
+                buffer.add(self.question.id, choice_id)
+
+        threads = [threading.Thread(target=vote, args=(choice.id,)) for choice in (self.yes, self.no) * 4]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(buffer.pending, 2000)
+        buffer.flush()
+        self.assertEqual(self.votes(), (2000, {"Yes": 1000, "No": 1000}))
+
+    def test_buffer_requeues_a_failed_batch(self):
+        buffer = VoteBuffer(max_votes=100, flush_interval=60)
+        buffer.add(self.question.id, self.yes.id, 2)
+        buffer.add(self.question.id, self.no.id)
+
+        # Fails after the choices were updated, which must be rolled back with the rest.
+        with mock.patch("polls.counters.add_question_totals", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                buffer.flush()
+        self.assertEqual((buffer.pending, self.votes()), (3, (0, {"Yes": 0, "No": 0})))
+
+        buffer.add(self.question.id, self.yes.id)
+        buffer.flush()
+        self.assertEqual((buffer.pending, self.votes()), (0, (4, {"Yes": 3, "No": 1})))
+
+    def test_buffer_keeps_the_vote_when_a_full_flush_fails(self):
+        buffer = VoteBuffer(max_votes=2, flush_interval=60)
+        buffer.add(self.question.id, self.yes.id)
+        with mock.patch("polls.counters.apply_increments", side_effect=DatabaseError("down")):
+            with self.assertLogs("polls.counters", "ERROR"):
+                buffer.add(self.question.id, self.no.id)
+        self.assertEqual(buffer.pending, 2)
+        # Retried by a timer, without waiting for another vote.
+        self.assertIsNotNone(buffer._timer)
+        buffer.flush()
+        self.assertEqual((buffer.pending, self.votes()), (0, (2, {"Yes": 1, "No": 1})))
+
+    def test_buffer_retries_a_failed_timed_flush(self):
+        buffer = VoteBuffer(max_votes=100, flush_interval=60)
+        buffer.add(self.question.id, self.yes.id)
+        with mock.patch("polls.counters.apply_increments", side_effect=DatabaseError("down")):
+            with self.assertLogs("polls.counters", "ERROR"), mock.patch("polls.counters.connection"):
+                buffer._flush_from_timer()
+        self.assertEqual(buffer.pending, 1)
+        self.assertIsNotNone(buffer._timer)
+        buffer.flush()
+        self.assertEqual((buffer.pending, self.votes()), (0, (1, {"Yes": 1, "No": 0})))
+
+
+class PollDataTests(TestCase):
+    """
+    Checks the JSON poll bundle and that a cache miss loads it in one query.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # JSON keeps milliseconds only.
+        cls.question = Question.objects.create(question_text="Bundled", pub_date=timezone.now().replace(microsecond=0))
+        cls.yes = Choice.objects.create(question=cls.question, choice_text="Yes", votes=3)
+        cls.no = Choice.objects.create(question=cls.question, choice_text="No", votes=1)
+        ChoiceVoteShard.objects.create(choice=cls.no, shard=0, votes=2)
+        VoteOutbox.objects.create(question=cls.question, choice=cls.yes)
+        cls.empty = Question.objects.create(question_text="Empty", pub_date=timezone.now())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_json_shape(self):
+        response = self.client.get(reverse("polls:data", args=(self.question.id,)))
+        self.assertEqual(response["Content-Type"], "application/json")
+        data = response.json()
+        self.assertEqual(datetime.datetime.fromisoformat(data.pop("pub_date")), self.question.pub_date)
+        self.assertEqual(data, {
+            "id": self.question.id,
+            "question_text": "Bundled",
+            "choices": [
+                {"id": self.yes.id, "choice_text": "Yes", "votes": 3},
+                {"id": self.no.id, "choice_text": "No", "votes": 3},
+            ],
+            "total_votes": 6,
+            "pending_votes": 1,
+        })
+        # Compact separators.
+        self.assertNotIn(b'": ', response.content)
+
+    def test_question_without_choices(self):
+        bundle = load_poll_bundle(self.empty.id)
+        self.assertEqual((bundle["choices"], bundle["total_votes"], bundle["pending_votes"]), ([], 0, 0))
+        self.assertIsNone(load_poll_bundle(0))
+        self.assertEqual(self.client.get(reverse("polls:data", args=(0,))).status_code, 404)
+
+    def test_cache_miss_is_one_query(self):
+        with self.assertNumQueries(1):
+            load_poll_bundle(self.question.id)
+        with self.assertNumQueries(1):
+            self.client.get(reverse("polls:data", args=(self.question.id,)))
+        with self.assertNumQueries(0):
+            self.client.get(reverse("polls:data", args=(self.question.id,)))
+
+
+class ShardTests(TestCase):
+    """
+    Checks that sharded votes are counted by every reader and survive compaction.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Sharded", pub_date=timezone.now())
+        cls.yes = Choice.objects.create(question=cls.question, choice_text="Yes", votes=10)
+        cls.no = Choice.objects.create(question=cls.question, choice_text="No", votes=4)
+        repair_question_totals([cls.question.id])
+
+    def setUp(self):
+        cache.clear()
+
+    def vote(self, votes):
+        with self.settings(POLLS_VOTE_SHARDS=4), self.captureOnCommitCallbacks(execute=True):
+            for choice, count in votes:
+                for _ in range(count):
+                    apply_increments({(self.question.id, choice.id): 1})
+
+    def test_votes_land_in_shards(self):
+        self.vote([(self.yes, 6), (self.no, 3)])
+        self.assertEqual(dict(Choice.objects.values_list("choice_text", "votes")), {"Yes": 10, "No": 4})
+
+        shards = ChoiceVoteShard.objects.all()
+        self.assertTrue({shard.shard for shard in shards} <= set(range(4)))
+        self.assertEqual(sum(shard.votes for shard in shards if shard.choice_id == self.yes.id), 6)
+        self.assertEqual(sum(shard.votes for shard in shards if shard.choice_id == self.no.id), 3)
+
+    def test_readers_add_the_shards(self):
+        self.vote([(self.yes, 6), (self.no, 3)])
+
+        bundle = load_poll_bundle(self.question.id)
+        self.assertEqual([choice["votes"] for choice in bundle["choices"]], [16, 7])
+        self.assertEqual(bundle["total_votes"], 23)
+
+        response = self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertEqual([choice["votes"] for choice in response.context["choices"]], [16, 7])
+
+        choices = with_shard_votes(Choice.objects.filter(question=self.question).order_by("pk"))
+        self.assertEqual([choice.votes for choice in choices], [16, 7])
+
+    def test_compaction_keeps_every_vote(self):
+        self.vote([(self.yes, 6), (self.no, 3)])
+        before = load_poll_bundle(self.question.id)
+
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command("polls_compact_shards", "--batch-size", "1", stdout=out)
+        self.assertIn("Compacted 9 votes from shards.", out.getvalue())
+
+        self.assertEqual(dict(Choice.objects.values_list("choice_text", "votes")), {"Yes": 16, "No": 7})
+        self.assertFalse(ChoiceVoteShard.objects.exclude(votes=0).exists())
+        self.assertEqual(Question.objects.get(pk=self.question.id).total_votes, 23)
+        self.assertEqual(load_poll_bundle(self.question.id), before)
+
+        # Votes landing after a compaction are kept for the next one.
+        self.vote([(self.no, 2)])
+        call_command("polls_compact_shards", stdout=io.StringIO())
+        self.assertEqual(Choice.objects.get(pk=self.no.id).votes, 9)
+
+
+class OutboxTests(TestCase):
+    """
+    Checks that the votes queued by the async endpoint are applied exactly once.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Queued", pub_date=timezone.now())
+        cls.yes = Choice.objects.create(question=cls.question, choice_text="Yes")
+        cls.no = Choice.objects.create(question=cls.question, choice_text="No")
+
+    def setUp(self):
+        cache.clear()
+        url = reverse("polls:vote_async", args=(self.question.id,))
+        for choice in (self.yes, self.yes, self.no, self.yes, self.no):
+            self.assertEqual(self.client.post(url, {"choice": choice.id}).status_code, 202)
+
+    def test_drained_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            drained = [drain_outbox(batch_size=2) for _ in range(4)]
+        self.assertEqual(drained, [2, 2, 1, 0])
+        self.assertFalse(VoteOutbox.objects.exists())
+
+        bundle = tallies.get_poll_bundle(self.question.id)
+        self.assertEqual(Question.objects.get(pk=self.question.id).total_votes, 5)
+        self.assertEqual((bundle["total_votes"], bundle["pending_votes"]), (5, 0))
+        self.assertEqual([choice["votes"] for choice in bundle["choices"]], [3, 2])
+
+    def test_failed_batch_stays_queued(self):
+        with mock.patch("polls.counters.add_question_totals", side_effect=DatabaseError("down")):
+            with self.assertRaises(DatabaseError):
+                drain_outbox()
+        self.assertEqual(VoteOutbox.objects.count(), 5)
+        self.assertEqual(Choice.objects.get(pk=self.yes.id).votes, 0)
+
+        call_command("polls_drain_votes", stdout=io.StringIO())
+        self.assertFalse(VoteOutbox.objects.exists())
+        self.assertEqual(Question.objects.get(pk=self.question.id).total_votes, 5)
+
+
+class FailingEmailBackend(locmem.EmailBackend):
+    """ An email backend whose server rejects every message. """
+
+    def send_messages(self, messages):
+        raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+
+
+class UnreachableEmailBackend(locmem.EmailBackend):
+    """ An email backend whose server cannot be reached. """
+
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+
+@override_settings(
+    EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+    POLLS_MAIL_MAX_ATTEMPTS=3,
+    POLLS_MAIL_RETRY_DELAY=60,
+)
+class MailTests(TestCase):
+    """
+    Checks the sending, retries and backoff of the outbound mail queue.
+    """
+
+    def setUp(self):
+        self.email = enqueue_mail("Subject", "Body", "from@example.com", ["to@example.com"])
+        self.now = self.email.next_attempt_at
+
+    def send(self, minutes=0):
+        with mock.patch("django.utils.timezone.now", return_value=self.now + datetime.timedelta(minutes=minutes)):
+            return send_queued_mail()
+
+    def test_sends_once(self):
+        self.assertEqual(self.send(), (1, 0))
+        self.assertEqual(self.send(), (0, 0))
+        self.assertEqual([message.to for message in mail.outbox], [["to@example.com"]])
+        self.email.refresh_from_db()
+        self.assertEqual((self.email.attempts, self.email.next_attempt_at), (1, None))
+        self.assertIsNotNone(self.email.sent_at)
+
+    @override_settings(EMAIL_BACKEND="polls.tests.FailingEmailBackend")
+    def test_backs_off_then_gives_up(self):
+        attempts = []
+        # Due again after 1, then 2 more minutes; not retried after the last attempt.
+        for minutes in (0, 0.5, 1, 2, 3, 10, 1000):
+            if self.send(minutes) == (0, 1):
+                self.email.refresh_from_db()
+                attempts.append((minutes, self.email.next_attempt_at))
+
+        self.assertEqual([minutes for minutes, _ in attempts], [0, 1, 3])
+        self.assertEqual(attempts[0][1], self.now + datetime.timedelta(minutes=1))
+        self.assertEqual(attempts[1][1], self.now + datetime.timedelta(minutes=3))
+        self.assertIsNone(attempts[2][1])
+        self.assertEqual(self.email.attempts, 3)
+        self.assertIn("SMTPServerDisconnected", self.email.last_error)
+        self.assertIsNone(self.email.sent_at)
+
+    def test_unreachable_server_fails_the_batch(self):
+        self.now = enqueue_mail("Other", "Body", "from@example.com", ["other@example.com"]).next_attempt_at
+        with self.settings(EMAIL_BACKEND="polls.tests.UnreachableEmailBackend"):
+            self.assertEqual(self.send(), (0, 2))
+        self.assertEqual(self.send(1), (2, 0))
+        self.assertEqual(len(mail.outbox), 2)
+
+
+class HistoryTests(TestCase):
+    """
+    Checks the rollups and pruning of the vote history, their watermarks and the trends.
+    """
+
+    start = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Trending", pub_date=cls.start)
+        cls.yes = Choice.objects.create(question=cls.question, choice_text="Yes")
+        cls.no = Choice.objects.create(question=cls.question, choice_text="No")
+        for choice, votes, offset in (
+            (cls.yes, 1, datetime.timedelta(seconds=30)),
+            (cls.no, 2, datetime.timedelta(seconds=90)),
+            (cls.yes, 3, datetime.timedelta(hours=1, minutes=5)),
+            (cls.yes, 1, datetime.timedelta(days=1, hours=1)),
+        ):
+            VoteEvent.objects.create(question=cls.question, choice=choice, votes=votes, created_at=cls.start + offset)
+
+    def at(self, **kwargs):
+        return self.start + datetime.timedelta(**kwargs)
+
+    def watermarks(self):
+        return dict(RollupWatermark.objects.values_list("resolution", "until"))
+
+    def trend(self, resolution, **end):
+        response = self.client.get(
+            reverse("polls:trend", args=(self.question.id,)),
+            {"resolution": resolution, "start": self.start.isoformat(), "end": self.at(**end).isoformat()},
+        )
+        return [
+            (datetime.datetime.fromisoformat(bucket["bucket"]), bucket["votes"])
+            for bucket in response.json()["buckets"]
+        ]
+
+    def test_rollup_watermarks(self):
+        written = history.rollup_all(now=self.at(days=3))
+        self.assertEqual(written, {"minute": 4, "hour": 4, "day": 3})
+        # Each resolution is complete up to the last full bucket of the one before it.
+        self.assertEqual(self.watermarks(), {
+            "minute": self.at(days=2, hours=23, minutes=59),
+            "hour": self.at(days=2, hours=23),
+            "day": self.at(days=2),
+        })
+
+        self.assertEqual(history.rollup_all(now=self.at(days=3)), {"minute": 0, "hour": 0, "day": 0})
+        VoteEvent.objects.create(question=self.question, choice=self.no, votes=5, created_at=self.at(days=3, minutes=10))
+        self.assertEqual(history.rollup_all(now=self.at(days=3, minutes=20))["minute"], 1)
+
+    def test_rollup_in_small_transactions(self):
+        history.rollup(VoteRollup.MINUTE, self.at(days=3), max_buckets=1)
+        self.assertEqual(VoteRollup.objects.filter(resolution=VoteRollup.MINUTE).count(), 4)
+        self.assertEqual(self.watermarks()["minute"], self.at(days=3))
+
+    def test_prune_keeps_what_is_not_rolled_up(self):
+        self.assertEqual(history.prune(now=self.at(days=30)), {"events": 0, "minute": 0, "hour": 0})
+        self.assertEqual(VoteEvent.objects.count(), 4)
+
+        history.rollup_all(now=self.at(days=3))
+        with self.settings(POLLS_VOTE_EVENT_RETENTION=2 * 86400, POLLS_VOTE_MINUTE_RETENTION=86400):
+            deleted = history.prune(now=self.at(days=3))
+        # Events before day 1, and minutes before day 2, are past their retention.
+        self.assertEqual(deleted, {"events": 3, "minute": 4, "hour": 0})
+        self.assertEqual(VoteEvent.objects.count(), 1)
+
+    def test_trends(self):
+        history.rollup_all(now=self.at(days=3))
+        yes, no = str(self.yes.id), str(self.no.id)
+        self.assertEqual(self.trend("minute", hours=2), [
+            (self.at(), {yes: 1}),
+            (self.at(minutes=1), {no: 2}),
+            (self.at(hours=1, minutes=5), {yes: 3}),
+        ])
+        self.assertEqual(self.trend("hour", days=2), [
+            (self.at(), {yes: 1, no: 2}),
+            (self.at(hours=1), {yes: 3}),
+            (self.at(days=1, hours=1), {yes: 1}),
+        ])
+        self.assertEqual(self.trend("day", days=3), [
+            (self.at(), {yes: 4, no: 2}),
+            (self.at(days=1), {yes: 1}),
+        ])
+
+
+@override_settings(POLLS_STREAM_INTERVAL_MS=10)
+class StreamTests(TestCase):
+    """
+    Checks that the live results stream sends the tally, then a new one after a vote.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.question = Question.objects.create(question_text="Live", pub_date=timezone.now())
+        cls.choice = Choice.objects.create(question=cls.question, choice_text="Yes")
+
+    def setUp(self):
+        cache.clear()
+
+    def vote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_increments({(self.question.id, self.choice.id): 1})
+
+    async def read_tally(self, events):
+        while True:
+            event = await asyncio.wait_for(anext(events), 5)
+            if event.startswith(b"id: "):
+                fields = dict(line.split(": ", 1) for line in event.decode().strip().split("\n"))
+                return fields["event"], json.loads(fields["data"])["total_votes"]
+
+    async def test_vote_is_streamed(self):
+        response = await self.async_client.get(reverse("polls:results_stream", args=(self.question.id,)))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        try:
+            self.assertEqual(await self.read_tally(events), ("tally", 0))
+            await sync_to_async(self.vote)()
+            self.assertEqual(await self.read_tally(events), ("tally", 1))
+        finally:
+            await events.aclose()
+
+    @override_settings(POLLS_STREAM_INTERVAL_MS=10)
+    async def test_failed_read_is_retried(self):
+        broadcaster = Broadcaster(asyncio.get_running_loop())
+        get_version = mock.Mock(side_effect=[DatabaseError("gone"), 1, 1])
+        with mock.patch("polls.streams.tallies.get_version", get_version):
+            with self.assertLogs("polls.streams", "ERROR"):
+                topic, queue = broadcaster.subscribe(self.question.id)
+                try:
+                    event = await asyncio.wait_for(queue.get(), 5)
+                finally:
+                    broadcaster.unsubscribe(self.question.id, queue)
+        self.assertTrue(event.startswith(b"id: 1\nevent: tally\n"))
+        self.assertFalse(broadcaster.topics)
+
+
+class TopTests(TestCase):
+    """
+    Checks the denormalized totals and leaders read by the top polls page.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        cls.questions = []
+        for index, votes in enumerate((3, 7, 5)):
+            question = Question.objects.create(question_text=f"Top {index}", pub_date=now)
+            Choice.objects.create(question=question, choice_text="Yes", votes=votes)
+            Choice.objects.create(question=question, choice_text="No", votes=1)
+            cls.questions.append(question)
+        repair_question_totals([question.id for question in cls.questions])
+
+    def test_ordered_by_total_votes(self):
+        response = self.client.get(reverse("polls:top"))
+        self.assertEqual(
+            [question.question_text for question in response.context["question_list"]],
+            ["Top 1", "Top 2", "Top 0"],
+        )
+
+    def test_leader_follows_batched_votes(self):
+        question = self.questions[0]
+        no = question.choice_set.get(choice_text="No")
+        buffer = VoteBuffer(max_votes=100, flush_interval=60)
+        buffer.add(question.id, no.id, 5)
+        buffer.flush()
+
+        question.refresh_from_db()
+        self.assertEqual((question.total_votes, question.leader_id), (9, no.id))
+
+    def test_repair_fixes_drifted_totals(self):
+        question = self.questions[2]
+        Question.objects.filter(pk=question.id).update(total_votes=100, leader=None)
+        apply_increments({(question.id, question.choice_set.get(choice_text="No").id): 6})
+
+        call_command("polls_repair_totals", "--batch-size", "2", stdout=io.StringIO())
+        question.refresh_from_db()
+        self.assertEqual((question.total_votes, question.leader.choice_text), (12, "No"))
+
+
+class BenchTests(TestCase):
+    """
+    Checks the percentiles and the regression check of polls_bench.
+    """
+
+    def test_percentile(self):
+        samples = [5, 1, 4, 2, 3]
+        self.assertEqual([percentile(samples, fraction) for fraction in (0, 0.5, 0.95, 1)], [1, 3, 5, 5])
+        self.assertEqual(percentile([7.5], 0.5), 7.5)
+        self.assertEqual(percentile([7.5], 0.99), 7.5)
+        with self.assertRaises(ValueError):
+            percentile([], 0.5)
+
+    def test_find_regressions(self):
+        baseline = {"views": {"index": {"p50": 100.0, "p95": 200.0, "p99": 300.0, "queries": 2}}}
+        results = {
+            "views": {
+                "index": {"p50": 110.0, "p95": 221.0, "p99": 900.0, "queries": 3},
+                "new": {"p50": 1000.0},
+            },
+        }
+        self.assertEqual(find_regressions(results, baseline, 0.1), [
+            ("views.index.p95", 200.0, 221.0),
+            ("views.index.queries", 2, 3),
+        ])
+        self.assertEqual(find_regressions(baseline, baseline, 0), [])
+        self.assertEqual(find_regressions({}, baseline, 0.1), [])
+        self.assertEqual(find_regressions(results, {}, 0.1), [])
+
+    def test_no_iterations(self):
+        with self.assertRaises(CommandError):
+            call_command("polls_bench", "--iterations", "0", stdout=io.StringIO())
+
+
+@override_settings(
+    POLLS_METRICS=True,
+    MIDDLEWARE=[*settings.MIDDLEWARE, "polls.middleware.MetricsMiddleware"],
+)
+class MetricsTests(TestCase):
+    """
+    Checks the request metrics, their recording per route and their exposition.
+    """
+
+    def setUp(self):
+        metrics.registry.clear()
+        self.addCleanup(metrics.registry.clear)
+
+    def test_histogram_buckets(self):
+        histogram = metrics.Histogram((1, 5))
+        for value in (0.5, 1, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.to_dict(), {"counts": [2, 1], "sum": 14.5, "count": 4})
+
+    def test_prometheus_format(self):
+        histogram = metrics.Histogram(metrics.QUERY_BUCKETS)
+        for queries in (1, 1, 4):
+            histogram.observe(queries)
+        counter = metrics.Counter()
+        counter.increment(2)
+        text = metrics.render_prometheus({
+            ("polls_request_queries", "polls:index"): histogram,
+            ("polls_vote_rejections_total", "rate"): counter,
+        })
+
+        self.assertIn("# TYPE polls_request_queries histogram\n", text)
+        self.assertIn('polls_request_queries_bucket{route="polls:index",le="0"} 0\n', text)
+        self.assertIn('polls_request_queries_bucket{route="polls:index",le="1"} 2\n', text)
+        self.assertIn('polls_request_queries_bucket{route="polls:index",le="5"} 3\n', text)
+        self.assertIn('polls_request_queries_bucket{route="polls:index",le="+Inf"} 3\n', text)
+        self.assertIn('polls_request_queries_sum{route="polls:index"} 6.0\n', text)
+        self.assertIn('polls_request_queries_count{route="polls:index"} 3\n', text)
+        self.assertIn("# TYPE polls_vote_rejections_total counter\n", text)
+        self.assertIn('polls_vote_rejections_total{reason="rate"} 2\n', text)
+
+    def test_middleware_records_the_route(self):
+        self.client.get(reverse("polls:index"))
+        self.client.get(reverse("polls:index"))
+        snapshot = metrics.registry.snapshot()
+        self.assertEqual(snapshot["polls_request_duration_seconds polls:index"]["count"], 2)
+        self.assertGreater(snapshot["polls_request_queries polls:index"]["sum"], 0)
+
+        with self.settings(POLLS_METRICS_URL="/internal/metrics"):
+            response = self.client.get("/internal/metrics")
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        self.assertIn('polls_request_duration_seconds_count{route="polls:index"} 2', response.content.decode())
+
+    def test_instrumented_views_are_counted_once(self):
+        def view(request):
+            # Resolved like a polls view, so the middleware would record it too.
+            request.resolver_match = resolve(reverse("polls:index"))
+            return HttpResponse("ok")
+
+        instrumented = metrics.instrument_view("polls:custom")(metrics.instrument_view("polls:inner")(view))
+        MetricsMiddleware(instrumented)(RequestFactory().get("/"))
+        self.assertEqual(list(metrics.registry.snapshot()), [
+            f"{name} polls:custom" for name in metrics.METRICS
+        ])
+
+    def test_snapshots_of_every_process_are_merged(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        other = metrics.Histogram(metrics.QUERY_BUCKETS)
+        other.observe(3)
+        with open(os.path.join(directory, "1.json"), "w") as metrics_file:
+            json.dump({"polls_request_queries polls:index": other.to_dict()}, metrics_file)
+        with open(os.path.join(directory, "2.json"), "w") as metrics_file:
+            metrics_file.write("{")
+
+        with self.settings(POLLS_METRICS_DIR=directory):
+            metrics.registry.observe("polls:index", {"polls_request_queries": 1})
+            merged = metrics.collect()
+        self.assertEqual(merged[("polls_request_queries", "polls:index")].to_dict()["count"], 2)
+        self.assertTrue(os.path.exists(os.path.join(directory, f"{os.getpid()}.json")))
+
+
+@override_settings(POLLS_COMPONENT_CACHE=True)
+class RenderCacheTests(TestCase):
+    """
+    Checks the LRU of rendered components and which calls it keeps.
+    """
+
+    def setUp(self):
+        render_cache.clear()
+        self.addCleanup(render_cache.clear)
+
+    def render(self, source, **context):
+        return Template("{% load atoms_tags %}" + source).render(Context(context))
+
+    def test_hits_and_misses(self):
+        first = self.render("{% text 'Hello' size='2' %}")
+        self.assertEqual(self.render("{% text 'Hello' size='2' %}"), first)
+        self.render("{% text 'Hello' size='3' %}")
+        self.assertEqual(render_cache.info(), {"hits": 1, "misses": 2, "size": 2, "maxsize": 1024})
+
+    def test_least_recently_used_is_evicted(self):
+        cache = RenderCache(maxsize=2)
+        cache.set("a", "A")
+        cache.set("b", "B")
+        cache.get("a")
+        cache.set("c", "C")
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), ("A", None, "C"))
+
+        with self.settings(POLLS_COMPONENT_CACHE_SIZE=1):
+            self.render("{% text 'One' %}{% text 'Two' %}")
+            self.assertEqual(render_cache.info()["size"], 1)
+        self.assertEqual(render_cache.maxsize, 1024)
+
+    def test_other_arguments_are_not_cached(self):
+        for _ in range(2):
+            self.render("{% text value %}", value=timezone.now())
+        self.assertEqual(render_cache.info()["size"], 0)
+        self.assertIsNone(make_key("text", (object(),), {}, True))
+
+    def test_keyed_per_language(self):
+        with translation.override("en"):
+            english = self.render("{% text value %}", value=1.5)
+        with translation.override("de"):
+            german = self.render("{% text value %}", value=1.5)
+        self.assertIn(">1.5<", english)
+        self.assertIn(">1,5<", german)
+
+
+@override_settings(POLLS_COMPONENT_CACHE=False)
+class FastRendererTests(TestCase):
+    """
+    Checks that the template-free renderers produce the HTML of the component templates.
+    """
+
+    CALLS = {
+        "atoms/text.html": [
+            "{% text %}",
+            "{% text 'Some text' size='2' style='bold' %}",
+            "{% text unsafe %}",
+            "{% text none %}",
+            "{% text '' %}",
+        ],
+        "atoms/title.html": [
+            "{% title %}",
+            *(f"{{% title 'Title' size='{size}' style='muted' %}}" for size in range(1, 7)),
+            "{% title unsafe size='2' %}",
+            "{% title none size=none %}",
+        ],
+        "molecules/base_input.html": [
+            "{% base_input %}",
+            "{% base_input 'min=\"1\"' type='number' placeholder=unsafe value=unsafe left_icon='bi bi-person' %}",
+            "{% base_input right_icon='bi bi-eye' on_right_icon_click='toggle(this)' disabled=True error=True %}",
+            "{% base_input widget=widget value=0 %}",
+            "{% base_input placeholder=none value=none left_icon=none widget=none %}",
+        ],
+        "molecules/breadcrumb.html": [
+            "{% breadcrumb %}",
+            "{% breadcrumb item1=unsafe item2='Overview' %}",
+            "{% breadcrumb type='3' item3='Info' %}",
+            "{% breadcrumb type='3' item3='' %}",
+            "{% breadcrumb type='4' %}",
+        ],
+        "molecules/divider.html": [
+            "{% divider %}",
+            *(f"{{% divider unsafe orientation='{side}' %}}" for side in ("center", "left", "right", "top")),
+            "{% divider type='vertical' %}",
+            "{% divider none type=none %}",
+        ],
+        "molecules/dropdown.html": [
+            *(f"{{% dropdown unsafe type='{kind}' items=items %}}" for kind in ("secondary", "primary", "borderless", "icon")),
+            "{% dropdown 'Title' type='other' items=items %}",
+            "{% dropdown none items=none %}",
+            "{% dropdown 'Title' items=empty %}",
+        ],
+        "molecules/input_checkbox.html": [
+            "{% input_checkbox %}",
+            *(
+                f"{{% input_checkbox label=unsafe checked={checked} disabled={disabled} indeterminate={indeterminate} %}}"
+                for checked in ("True", "False")
+                for disabled in ("True", "False")
+                for indeterminate in ("True", "False")
+            ),
+            "{% input_checkbox label=none checked=none %}",
+        ],
+        "molecules/input_number.html": [
+            "{% input_number %}",
+            "{% input_number min='2' max='10' step='2' value='2' placeholder=unsafe disabled=True %}",
+            "{% input_number data_title=unsafe error=True %}",
+            "{% input_number value=none placeholder=none %}",
+        ],
+        "molecules/input_password.html": [
+            "{% input_password %}",
+            "{% input_password placeholder=unsafe value=unsafe left_icon='bi bi-lock' error=True disabled=True %}",
+            "{% input_password value=none left_icon=none %}",
+        ],
+        "molecules/input_search.html": [
+            "{% input_search %}",
+            "{% input_search placeholder=unsafe value='test' error=True aria_label=unsafe %}",
+            "{% input_search left_icon='bi bi-person' disabled=True %}",
+            "{% input_search value=none placeholder=none %}",
+        ],
+        "molecules/input_text.html": [
+            "{% input_text %}",
+            "{% input_text placeholder=unsafe value=unsafe left_icon='bi bi-person' disabled=True error=True %}",
+            "{% input_text value=none left_icon=none %}",
+        ],
+    }
+
+    CONTEXT = {
+        "unsafe": '<b class="x">Tom & "Jerry"</b>',
+        "none": None,
+        "empty": [],
+        "items": [
+            {"label": "<i>Active</i>", "active": True},
+            {"label": "Plain"},
+            {"label": "Disabled", "disabled": True},
+            {"label": None},
+        ],
+        "widget": {"attrs": {"maxlength": 10, "required": True, "readonly": False, "title": '"quoted" <b>'}},
+    }
+
+    def render(self, source, renderer):
+        template = Template("{% load atoms_tags molecules_tags %}" + source)
+        with self.settings(POLLS_COMPONENT_RENDERER=renderer):
+            return template.render(Context(self.CONTEXT))
+
+    def test_every_component_has_a_renderer(self):
+        self.assertEqual(set(FAST_RENDERERS), {f"polls/components/{name}" for name in self.CALLS})
+
+    def test_fast_renderers_match_the_templates(self):
+        for name, calls in self.CALLS.items():
+            for source in calls:
+                with self.subTest(component=name, call=source):
+                    self.assertEqual(self.render(source, "fast"), self.render(source, "template"))
+
+    def test_fast_renderers_match_the_templates_without_autoescape(self):
+        for name, calls in self.CALLS.items():
+            for source in calls:
+                source = "{% autoescape off %}" + source + "{% endautoescape %}"
+                with self.subTest(component=name, call=source):
+                    self.assertEqual(self.render(source, "fast"), self.render(source, "template"))
+
+    def test_html_attrs_are_escaped(self):
+        attrs = utils.get_html_attrs_from_kwargs({
+            "title": '"><script>alert(1)</script>',
+            "data-<x>": "a & b",
+            "icon": mark_safe("<i>safe</i>"),
+            "required": True,
+            "hidden": False,
+            "maxlength": 10,
+            "placeholder": "skipped",
+            "empty": "",
+            "none": None,
+        })
+        self.assertEqual(attrs, [
+            'title="&quot;&gt;&lt;script&gt;alert(1)&lt;/script&gt;"',
+            'data-&lt;x&gt;="a &amp; b"',
+            'icon="<i>safe</i>"',
+            "required",
+            'empty=""',
+        ])
+        self.assertEqual(utils.get_html_attrs_from_kwargs({}), [])
+        self.assertEqual(utils.get_html_attrs_from_kwargs({"value": "1"}, exception_list=[]), ['value="1"'])
@@ -0,0 +1,201 @@
+""" This module contains the in-memory rate limit and duplicate filter in front of the vote views """
+
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import metrics
+
+
+def is_vote_filter_enabled():
+    """ Returns whether votes go through the filter, from ``POLLS_VOTE_FILTER`` (default False). """
+    return getattr(settings, "POLLS_VOTE_FILTER", False)
+
+
+def get_client_key(request):
+    """
+    Returns the key identifying the client of a request, without touching the database.
+
+    This is the remote address: a session cookie could be replaced on every request to
+    get a fresh bucket. Behind a proxy, ``REMOTE_ADDR`` must be set to the client address
+    by the proxy setup.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        str: The key.
+    """
+    return f"ip:{request.META.get('REMOTE_ADDR', '')}"
+
+
+class TokenBuckets:
+    """
+    A token bucket per key, refilled at ``rate`` tokens per second up to ``burst`` tokens.
+
+    At most ``max_keys`` buckets are kept; the least recently used one is dropped first,
+    which resets the limit of that key.
+    """
+
+    def __init__(self, rate, burst, max_keys):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def take(self, key, now):
+        """ Takes a token from the bucket of ``key``, returning False if it is empty. """
+        tokens, updated_at = self._buckets.get(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return allowed
+
+
+class RotatingBloomFilter:
+    """
+    A set of recently seen keys in fixed memory, forgetting keys after one to two windows.
+
+    Keys go into the current of two Bloom filters; every ``window`` seconds the current
+    filter becomes the previous one and the previous one is cleared. A key may be
+    reported as seen when it was not, with a probability set by ``bits`` and ``hashes``,
+    but never the other way around.
+    """
+
+    def __init__(self, bits, hashes, window):
+        self.bits = bits
+        self.hashes = hashes
+        self.window = window
+        self._current = bytearray(bits // 8 + 1)
+        self._previous = bytearray(bits // 8 + 1)
+        self._rotated_at = None
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + index * second) % self.bits for index in range(self.hashes)]
+
+    def _rotate(self, now):
+        if self._rotated_at is None:
+            self._rotated_at = now
+        elif now - self._rotated_at >= 2 * self.window:
+            self._current = bytearray(len(self._current))
+            self._previous = bytearray(len(self._previous))
+            self._rotated_at = now
+        elif now - self._rotated_at >= self.window:
+            self._previous, self._current = self._current, self._previous
+            self._current[:] = bytes(len(self._current))
+            self._rotated_at = now
+
+    def add(self, key, now):
+        """ Adds a key, returning whether it was (probably) already seen. """
+        self._rotate(now)
+        seen_current = seen_previous = True
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self._current[byte] & mask:
+                seen_current = False
+                self._current[byte] |= mask
+            if not self._previous[byte] & mask:
+                seen_previous = False
+        return seen_current or seen_previous
+
+
+class VoteFilter:
+    """
+    Rejects votes from clients voting too fast on a question, from memory only so a rate
+    limited vote costs no query, and repeated submissions of the same valid vote.
+    """
+
+    def __init__(self, rate=1.0, burst=5, max_clients=10000, duplicate_window=60, bits=1 << 22, hashes=4):
+        self._lock = threading.Lock()
+        self._buckets = TokenBuckets(rate, burst, max_clients)
+        self._seen = RotatingBloomFilter(bits, hashes, duplicate_window)
+        # Seconds until a rate limited client has a token again, for ``Retry-After``.
+        self.retry_after = max(1, math.ceil(1 / rate))
+        self.rejections = {"rate": 0, "duplicate": 0}
+
+    def check_rate(self, request, question_id):
+        """
+        Takes a token for a vote attempt, before anything else is checked.
+
+        Args:
+            request (HttpRequest): The vote request.
+            question_id (int): The id of the question.
+
+        Returns:
+            bool: Whether the client exceeded its rate on the question.
+        """
+        with self._lock:
+            limited = not self._buckets.take(f"{get_client_key(request)}|{question_id}", time.monotonic())
+        if limited:
+            self._reject("rate")
+        return limited
+
+    def check_duplicate(self, request, question_id, choice_id):
+        """
+        Records a validated vote and tells whether it was submitted before within the window.
+
+        Args:
+            request (HttpRequest): The vote request.
+            question_id (int): The id of the question.
+            choice_id (int): The id of the choice, once checked to belong to the open question.
+
+        Returns:
+            bool: Whether the vote is a duplicate.
+        """
+        with self._lock:
+            duplicate = self._seen.add(f"{get_client_key(request)}|{question_id}|{choice_id}", time.monotonic())
+        if duplicate:
+            self._reject("duplicate")
+        return duplicate
+
+    def _reject(self, reason):
+        with self._lock:
+            self.rejections[reason] += 1
+        metrics.registry.increment("polls_vote_rejections_total", reason)
+
+    def stats(self):
+        """ Returns the number of rejected votes per reason. """
+        with self._lock:
+            return dict(self.rejections)
+
+
+_vote_filter = None
+_vote_filter_lock = threading.Lock()
+
+
+def get_vote_filter():
+    """
+    Returns the vote filter of this process, created from the settings on first use.
+
+    Settings:
+        POLLS_VOTE_RATE (float): Votes per second allowed per client and question. Defaults to 1.
+        POLLS_VOTE_BURST (int): Votes allowed at once per client and question. Defaults to 5.
+        POLLS_VOTE_FILTER_MAX_CLIENTS (int): Rate limited clients kept in memory. Defaults to 10000.
+        POLLS_VOTE_DUPLICATE_WINDOW (float): Seconds a submitted vote is remembered. Defaults to 60.
+        POLLS_VOTE_FILTER_BITS (int): Bits of each of the two Bloom filters. Defaults to 2**22.
+    """
+    global _vote_filter
+
+    with _vote_filter_lock:
+        if _vote_filter is None:
+            _vote_filter = VoteFilter(
+                rate=getattr(settings, "POLLS_VOTE_RATE", 1.0),
+                burst=getattr(settings, "POLLS_VOTE_BURST", 5),
+                max_clients=getattr(settings, "POLLS_VOTE_FILTER_MAX_CLIENTS", 10000),
+                duplicate_window=getattr(settings, "POLLS_VOTE_DUPLICATE_WINDOW", 60),
+                bits=getattr(settings, "POLLS_VOTE_FILTER_BITS", 1 << 22),
+            )
+        return _vote_filter
@@ -0,0 +1,348 @@
+""" This module contains the streaming export and resumable import of questions and choices """
+
+import csv
+import datetime
+import json
+import sqlite3
+import time
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from . import tallies
+from .counters import repair_question_totals
+from .models import Choice, ChoiceVoteShard, Question
+
+FIELDS = ("type", "id", "question", "text", "pub_date", "votes")
+FORMATS = ("csv", "jsonl")
+
+
+class TransferError(Exception):
+    """ Raised when an import cannot go on, e.g. on a malformed record. """
+
+
+def guess_format(path):
+    """ Returns the format of a file from its extension, "jsonl" unless it ends in ".csv". """
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def export_records(chunk_size=2000):
+    """
+    Yields every question, then every choice, as flat records, in id order.
+
+    Rows are fetched ``chunk_size`` at a time, and the votes still held in shards are
+    added to the choice totals.
+
+    Args:
+        chunk_size (int, optional): The number of rows fetched at once. Defaults to 2000.
+
+    Yields:
+        dict: The records, with the keys of ``FIELDS``.
+    """
+    questions = Question.objects.order_by("id").values_list("id", "question_text", "pub_date")
+    for question_id, question_text, pub_date in questions.iterator(chunk_size=chunk_size):
+        yield {"type": "question", "id": question_id, "text": question_text, "pub_date": pub_date.isoformat()}
+
+    shard_votes = (
+        ChoiceVoteShard.objects.filter(choice=OuterRef("pk"))
+        .values("choice")
+        .annotate(total=Sum("votes"))
+        .values("total")
+    )
+    choices = (
+        Choice.objects.order_by("id")
+        .annotate(shard_votes=Coalesce(Subquery(shard_votes), 0))
+        .values_list("id", "question_id", "choice_text", "votes", "shard_votes")
+    )
+    for choice_id, question_id, choice_text, votes, shard_votes in choices.iterator(chunk_size=chunk_size):
+        yield {"type": "choice", "id": choice_id, "question": question_id, "text": choice_text, "votes": votes + shard_votes}
+
+
+def write_records(records, output, file_format):
+    """
+    Writes records to a text file as they come.
+
+    Args:
+        records (iterable): The records, e.g. from ``export_records``.
+        output (file): The text file to write to.
+        file_format (str): "csv" or "jsonl".
+
+    Yields:
+        dict: Each record once it was written, so the caller can report progress.
+    """
+    if file_format == "csv":
+        writer = csv.DictWriter(output, FIELDS)
+        writer.writeheader()
+        for record in records:
+            writer.writerow(record)
+            yield record
+    else:
+        for record in records:
+            output.write(json.dumps(record, separators=(",", ":")))
+            output.write("\n")
+            yield record
+
+
+class _Lines:
+    """ Iterates the lines of a binary file as text, keeping the byte offset after the last one. """
+
+    def __init__(self, stream, offset):
+        self.stream = stream
+        self.offset = offset
+
+    def __iter__(self):
+        for line in self.stream:
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+
+def read_records(stream, file_format, offset=0):
+    """
+    Reads records from a binary file, from a byte offset.
+
+    Args:
+        stream (file): The file, opened in binary mode and seekable when ``offset`` is set.
+        file_format (str): "csv" or "jsonl".
+        offset (int, optional): The offset to start from, as yielded earlier. Defaults to 0.
+
+    Yields:
+        tuple: Each record and the byte offset right after it.
+    """
+    if file_format == "csv":
+        header = next(csv.reader([stream.readline().decode("utf-8")]))
+        if offset:
+            stream.seek(offset)
+        lines = _Lines(stream, max(offset, stream.tell()))
+        for row in csv.reader(lines):
+            yield dict(zip(header, row)), lines.offset
+    else:
+        stream.seek(offset)
+        lines = _Lines(stream, offset)
+        for line in lines:
+            if line.strip():
+                yield json.loads(line), lines.offset
+
+
+class ImportState:
+    """
+    The id map and progress of an import, in a SQLite file next to the input.
+
+    A chunk is recorded as pending, with the ids it created, before the database
+    transaction commits, and as done after. On resume, a pending chunk whose created rows
+    exist was committed; otherwise its ids are dropped and it is imported again. A chunk
+    that only updated rows leaves no trace of its commit, so it is always imported again,
+    which rewrites the same values.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS id_map (
+                kind TEXT, source_id INTEGER, target_id INTEGER, PRIMARY KEY (kind, source_id)
+            );
+            CREATE TABLE IF NOT EXISTS progress (
+                input TEXT PRIMARY KEY, "offset" INTEGER, pending_kind TEXT,
+                pending_start INTEGER, pending_end INTEGER, pending_ids TEXT
+            );
+            """
+        )
+
+    def close(self):
+        self.db.close()
+
+    def reset(self, input_path):
+        """ Forgets the progress of an input, keeping the id map. """
+        with self.db:
+            self.db.execute("DELETE FROM progress WHERE input = ?", (input_path,))
+
+    def resume(self, input_path, models):
+        """
+        Returns the offset to resume an input from, settling a chunk left pending.
+
+        Args:
+            input_path (str): The input file.
+            models (dict): The model of each record type.
+
+        Returns:
+            int: The byte offset.
+        """
+        row = self.db.execute(
+            'SELECT "offset", pending_kind, pending_start, pending_end, pending_ids FROM progress WHERE input = ?',
+            (input_path,),
+        ).fetchone()
+        if row is None:
+            return 0
+
+        offset, kind, start, end, pending_ids = row
+        if kind is None:
+            return offset
+
+        created = json.loads(pending_ids)
+        committed = bool(created) and models[kind].objects.filter(pk=created[0]).exists()
+        with self.db:
+            if not committed:
+                self.db.executemany(
+                    "DELETE FROM id_map WHERE kind = ? AND target_id = ?", [(kind, pk) for pk in created]
+                )
+            self.db.execute(
+                'UPDATE progress SET "offset" = ?, pending_kind = NULL, pending_ids = NULL WHERE input = ?',
+                (end if committed else start, input_path),
+            )
+        return end if committed else start
+
+    def lookup(self, kind, source_ids):
+        """ Returns the target id of each source id already imported, by source id. """
+        result = {}
+        source_ids = list(source_ids)
+        # Stay under SQLite's limit on query parameters.
+        for index in range(0, len(source_ids), 500):
+            batch = source_ids[index:index + 500]
+            placeholders = ",".join("?" * len(batch))
+            result.update(
+                self.db.execute(
+                    f"SELECT source_id, target_id FROM id_map WHERE kind = ? AND source_id IN ({placeholders})",
+                    [kind, *batch],
+                ).fetchall()
+            )
+        return result
+
+    def begin_chunk(self, input_path, kind, start, end, id_pairs):
+        """ Records a chunk about to be committed, with the (source, target) ids it created. """
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO id_map (kind, source_id, target_id) VALUES (?, ?, ?)",
+                [(kind, source_id, target_id) for source_id, target_id in id_pairs],
+            )
+            self.db.execute(
+                'INSERT OR REPLACE INTO progress (input, "offset", pending_kind, pending_start, pending_end, pending_ids)'
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (input_path, start, kind, start, end, json.dumps([target_id for _, target_id in id_pairs])),
+            )
+
+    def end_chunk(self, input_path, end):
+        """ Records a chunk as committed. """
+        with self.db:
+            self.db.execute(
+                'UPDATE progress SET "offset" = ?, pending_kind = NULL, pending_ids = NULL WHERE input = ?',
+                (end, input_path),
+            )
+
+
+class Importer:
+    """
+    Imports the records of an export into the database in chunks, mapping their ids.
+
+    Records whose source id was imported before update the mapped rows with
+    ``bulk_update``; the others are created with ``bulk_create``, which needs a database
+    that returns the ids of inserted rows (PostgreSQL, SQLite 3.35+, MariaDB 10.5+).
+    """
+
+    models = {"question": Question, "choice": Choice}
+
+    def __init__(self, state, chunk_size=1000, progress=None, progress_interval=2.0):
+        self.state = state
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.imported = 0
+
+    def run(self, input_path, file_format):
+        """
+        Imports a file, from where a previous run of the same file stopped.
+
+        Args:
+            input_path (str): The file written by ``polls_export``.
+            file_format (str): "csv" or "jsonl".
+
+        Returns:
+            int: The number of records imported by this run.
+        """
+        offset = self.state.resume(input_path, self.models)
+        started_at = last_report = time.monotonic()
+        chunk = []
+        kind = None
+        start = offset
+
+        with open(input_path, "rb") as stream:
+            for record, end in read_records(stream, file_format, offset):
+                if chunk and (record["type"] != kind or len(chunk) >= self.chunk_size):
+                    self.import_chunk(input_path, kind, chunk, start)
+                    start = chunk[-1][1]
+                    chunk = []
+                kind = record["type"]
+                if kind not in self.models:
+                    raise TransferError(f"Unknown record type {kind!r} before byte {end}.")
+                chunk.append((record, end))
+
+                now = time.monotonic()
+                if self.progress and now - last_report >= self.progress_interval:
+                    last_report = now
+                    self.progress(self.imported, self.imported / (now - started_at))
+
+            if chunk:
+                self.import_chunk(input_path, kind, chunk, start)
+
+        tallies.bump_version()
+        return self.imported
+
+    def import_chunk(self, input_path, kind, chunk, start):
+        records = [record for record, _ in chunk]
+        end = chunk[-1][1]
+        mapped = self.state.lookup(kind, [int(record["id"]) for record in records])
+
+        if kind == "question":
+            objects = [
+                Question(
+                    pk=mapped.get(int(record["id"])),
+                    question_text=record["text"],
+                    pub_date=datetime.datetime.fromisoformat(record["pub_date"]),
+                )
+                for record in records
+            ]
+            fields = ["question_text", "pub_date"]
+        else:
+            questions = self.state.lookup("question", {int(record["question"]) for record in records})
+            objects = []
+            for record in records:
+                question_id = questions.get(int(record["question"]))
+                if question_id is None:
+                    raise TransferError(f"Choice {record['id']} refers to question {record['question']}, not imported.")
+                objects.append(
+                    Choice(
+                        pk=mapped.get(int(record["id"])),
+                        question_id=question_id,
+                        choice_text=record["text"],
+                        votes=int(record["votes"] or 0),
+                    )
+                )
+            fields = ["question_id", "choice_text", "votes"]
+
+        new = [(record, obj) for record, obj in zip(records, objects) if obj.pk is None]
+        existing = [obj for obj in objects if obj.pk is not None]
+
+        with transaction.atomic():
+            self.models[kind].objects.bulk_create([obj for _, obj in new])
+            if existing:
+                self.models[kind].objects.bulk_update(existing, fields)
+            if kind == "choice":
+                repair_question_totals({obj.question_id for obj in objects})
+
+            id_pairs = [(int(record["id"]), obj.pk) for record, obj in new]
+            if any(target_id is None for _, target_id in id_pairs):
+                raise TransferError("The database does not return the ids of bulk inserted rows.")
+            self.state.begin_chunk(input_path, kind, start, end, id_pairs)
+
+        self.state.end_chunk(input_path, end)
+        self.imported += len(records)
+
+        # Dropped as each chunk commits, so no tally outlives its chunk. New choices
+        # change the tally of their question too.
+        if kind == "question":
+            question_ids = {obj.pk for obj in existing}
+        else:
+            question_ids = {obj.question_id for obj in objects}
+        for question_id in question_ids:
+            tallies.invalidate_tally(question_id)
+
@@ -6,12 +6,26 @@ app_name = "polls"
 urlpatterns = [
   # ex: /polls/
   path("", views.IndexView.as_view(), name="index"),
+  # ex: /polls/archive/?cursor=...
+  path("archive/", views.ArchiveView.as_view(), name="archive"),
+  # ex: /polls/top/
+  path("top/", views.TopView.as_view(), name="top"),
+  # ex: /polls/search/?q=wha
+  path("search/", views.question_search, name="search"),
   # ex: /polls/5/
   path("<int:pk>/", views.DetailView.as_view(), name="detail"),
   # ex: /polls/5/results/
   path("<int:pk>/results/", views.ResultsView.as_view(), name="results"),
+  # ex: /polls/5/results/stream/
+  path("<int:pk>/results/stream/", views.results_stream, name="results_stream"),
+  # ex: /polls/5/trend/?resolution=hour
+  path("<int:pk>/trend/", views.vote_trend, name="trend"),
+  # ex: /polls/5/data/
+  path("<int:pk>/data/", views.poll_data, name="data"),
   # ex: /polls/5/vote/
   path("<int:question_id>/vote/", views.vote, name="vote"),
+  # ex: /polls/5/vote/async/
+  path("<int:question_id>/vote/async/", views.vote_async, name="vote_async"),
   # ex: /polls/form/
   path("form/", views.contact_form, name="contact_form"),
   # ex: /polls/form-widget/
@@ -1,18 +1,81 @@
-from django.http import HttpResponse, HttpResponseRedirect
+import datetime
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import (
+  Http404, HttpResponse, HttpResponseNotAllowed, HttpResponseRedirect, JsonResponse, StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render
+from django.template.response import TemplateResponse
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
 from django.views import generic
-from django.core.mail import send_mail
+from django.views.decorators.http import condition
+from django.db.models import Q
 
+from . import history, search, streams, tallies, throttle
+from .mail import enqueue_mail
+from .counters import record_vote
 from .forms import ContactForm, MyForm
 
-from .models import Question, Choice
+from .models import Question, Choice, VoteOutbox
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+
+def get_page_version(request, question_id=None):
+  """Return the version of a question, or of the question list, once per request."""
+  versions = request.__dict__.setdefault("_polls_versions", {})
+  if question_id not in versions:
+    versions[question_id] = tallies.get_version(question_id)
+  return versions[question_id]
+
+def page_etag(request, pk=None, **kwargs):
+  # The deploy version changes the ETags of pages whose templates or code changed.
+  version = get_page_version(request, pk)
+  deploy_version = getattr(settings, "POLLS_DEPLOY_VERSION", "")
+  if deploy_version:
+    return '"%s-%s-%s"' % (pk or "index", version, deploy_version)
+  return '"%s-%s"' % (pk or "index", version)
+
+def page_last_modified(request, pk=None, **kwargs):
+  version = get_page_version(request, pk)
+  return datetime.datetime.fromtimestamp(version / 1e6, tz=datetime.timezone.utc)
+
+def conditional_page(shared):
+  """Answer conditional GETs of a poll page from its version, with a 304 when unchanged.
+
+  Pages that are the same for every visitor (`shared`) may be stored by a CDN or reverse
+  proxy, which revalidates them after POLLS_CACHE_S_MAXAGE seconds (default 0, i.e. on
+  every request); the others, like forms carrying a CSRF token, only by the browser.
+  """
+  def decorator(view):
+    conditional_view = condition(etag_func=page_etag, last_modified_func=page_last_modified)(view)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+      response = conditional_view(request, *args, **kwargs)
+      if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        if shared:
+          patch_cache_control(
+            response, public=True, max_age=0, must_revalidate=True,
+            s_maxage=getattr(settings, "POLLS_CACHE_S_MAXAGE", 0),
+          )
+        else:
+          patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+      return response
+
+    return wrapper
+
+  return decorator
 
 def index(request):
   latest_question_list = Question.objects.order_by("-pub_date")[:5]
   context = {"latest_question_list": latest_question_list}
   return render(request, 'polls/index.html', context)
 
+@method_decorator(conditional_page(shared=True), name="dispatch")
 class IndexView(generic.ListView):
   template_name = "polls/index.html"
   context_object_name = "latest_question_list"
@@ -21,13 +84,89 @@ class IndexView(generic.ListView):
     """Return the last five published questions."""
     return Question.objects.order_by("-pub_date")[:5]
 
+@method_decorator(conditional_page(shared=True), name="dispatch")
+class ArchiveView(generic.ListView):
+  """List every question, newest first, with keyset pagination on (pub_date, id).
+
+  Each page is fetched with a range condition on the composite index instead of an
+  OFFSET, so deep pages cost the same as the first one. Set
+  POLLS_ARCHIVE_PAGE_SIZE to change the page size (default 20).
+  """
+  template_name = "polls/archive.html"
+  context_object_name = "question_list"
+
+  def get_page_size(self):
+    return getattr(settings, "POLLS_ARCHIVE_PAGE_SIZE", 20)
+
+  def get_queryset(self):
+    queryset = Question.objects.order_by("-pub_date", "-id")
+    token = self.request.GET.get("cursor")
+    if token:
+      try:
+        pub_date, question_id = decode_cursor(token, 2)
+        pub_date = datetime.datetime.fromisoformat(pub_date)
+        question_id = int(question_id)
+      except (InvalidCursor, TypeError, ValueError):
+        raise Http404("Invalid cursor")
+      queryset = queryset.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, id__lt=question_id)
+      )
+    # One extra row tells whether there is a next page.
+    return queryset[:self.get_page_size() + 1]
+
+  def get_context_data(self, **kwargs):
+    context = super().get_context_data(**kwargs)
+    questions = list(context["question_list"])
+    page_size = self.get_page_size()
+
+    next_cursor = None
+    if len(questions) > page_size:
+      questions = questions[:page_size]
+      last = questions[-1]
+      next_cursor = encode_cursor(last.pub_date.isoformat(), last.id)
+
+    context["question_list"] = questions
+    context["next_cursor"] = next_cursor
+    return context
+
+class TopView(generic.ListView):
+  """List the most voted questions, from the denormalized Question.total_votes.
+
+  The ordering is served by the (total_votes, id) index, so no votes are aggregated.
+  Set POLLS_TOP_SIZE to change the number of questions (default 10).
+  """
+  template_name = "polls/top.html"
+  context_object_name = "question_list"
+
+  def get_queryset(self):
+    size = getattr(settings, "POLLS_TOP_SIZE", 10)
+    return Question.objects.select_related("leader").order_by("-total_votes", "-id")[:size]
+
 def detail(request, question_id):
   question = get_object_or_404(Question, pk=question_id)
   context = {"question": question}
   return render(request, "polls/detail.html", context)
 
-class DetailView(generic.DetailView):
-  model = Question
+def get_poll_bundle_or_404(question_id):
+  """Return the poll bundle of a question, from the tally cache when possible."""
+  bundle = tallies.get_poll_bundle(question_id)
+  if bundle is None:
+    raise Http404("No question found matching the query")
+  return bundle
+
+class PollBundleMixin:
+  """Put the poll bundle of the question in the context as `question` and `choices`."""
+
+  def get_context_data(self, **kwargs):
+    context = super().get_context_data(**kwargs)
+    bundle = get_poll_bundle_or_404(self.kwargs["pk"])
+    context["question"] = bundle
+    context["choices"] = bundle["choices"]
+    context["pending_votes"] = bundle["pending_votes"]
+    return context
+
+@method_decorator(conditional_page(shared=False), name="dispatch")
+class DetailView(PollBundleMixin, generic.TemplateView):
   template_name = "polls/detail.html"
 
 
@@ -35,30 +174,168 @@ def results(request, question_id):
   response = "You're looking at the results of question %s."
   return HttpResponse(response % question_id)
 
-class ResultsView(generic.DetailView):
-  model = Question
+@method_decorator(conditional_page(shared=True), name="dispatch")
+class ResultsView(PollBundleMixin, generic.TemplateView):
   template_name = "polls/results.html"
 
+async def results_stream(request, pk):
+  """Stream the tally of a question as Server-Sent Events; needs an ASGI server."""
+  if await sync_to_async(tallies.get_poll_bundle)(pk) is None:
+    raise Http404("No question found matching the query")
+
+  response = StreamingHttpResponse(
+    streams.stream_tally(pk, request.headers.get("Last-Event-ID")),
+    content_type="text/event-stream",
+  )
+  response["Cache-Control"] = "no-cache"
+  # Stops nginx from buffering the stream.
+  response["X-Accel-Buffering"] = "no"
+  return response
+
+def vote_trend(request, pk):
+  """Return the votes per choice of a question over time, read from the vote rollups only.
+
+  Query parameters: `resolution` ("minute", "hour" or "day", default "hour"), and `start`
+  and `end` as ISO 8601 times (default: the last POLLS_TREND_DEFAULT_BUCKETS buckets, 60).
+  At most POLLS_TREND_MAX_BUCKETS buckets (1500) can be asked for at once.
+  """
+  resolution = request.GET.get("resolution", "hour")
+  if resolution not in history.STEPS:
+    return JsonResponse({"error": "Unknown resolution."}, status=400)
+  step = history.STEPS[resolution]
+
+  try:
+    end = datetime.datetime.fromisoformat(request.GET["end"]) if "end" in request.GET else timezone.now()
+    if "start" in request.GET:
+      start = datetime.datetime.fromisoformat(request.GET["start"])
+    else:
+      start = end - step * getattr(settings, "POLLS_TREND_DEFAULT_BUCKETS", 60)
+  except ValueError:
+    return JsonResponse({"error": "Invalid start or end."}, status=400)
+  if timezone.is_naive(start) or timezone.is_naive(end):
+    return JsonResponse({"error": "start and end need a UTC offset."}, status=400)
+  if (end - start) / step > getattr(settings, "POLLS_TREND_MAX_BUCKETS", 1500):
+    return JsonResponse({"error": "Too many buckets, use a coarser resolution."}, status=400)
+
+  response = JsonResponse({
+    "question": pk,
+    "resolution": resolution,
+    "start": start,
+    "end": end,
+    "buckets": history.get_trend(pk, resolution, start, end),
+  })
+  # The rollups only change when polls_rollup_votes runs.
+  patch_cache_control(response, public=True, max_age=60)
+  return response
+
+def question_search(request):
+  """Return the questions matching `q`, best first, as JSON for the input_search component.
+
+  Every term matches as a prefix, so the query can be sent while it is typed. Pages of
+  POLLS_SEARCH_PAGE_SIZE results (default 10) follow each other with `cursor`.
+  """
+  text = request.GET.get("q", "")
+  token = request.GET.get("cursor", "")
+  page_size = getattr(settings, "POLLS_SEARCH_PAGE_SIZE", 10)
+  after = None
+  if token:
+    try:
+      score, question_id = decode_cursor(token, 2)
+      after = (float(score), int(question_id))
+    except (InvalidCursor, TypeError, ValueError):
+      return JsonResponse({"error": "Invalid cursor."}, status=400)
+
+  def build_page():
+    # One extra row tells whether there is a next page.
+    results = search.search_questions(text, after, page_size + 1)
+    next_cursor = None
+    if len(results) > page_size:
+      results = results[:page_size]
+      next_cursor = encode_cursor(results[-1]["score"], results[-1]["id"])
+    for result in results:
+      result["url"] = reverse("polls:detail", args=(result["id"],))
+    return {"results": results, "next_cursor": next_cursor}
+
+  return JsonResponse(search.get_cached_page(text, token, page_size, build_page))
+
+@conditional_page(shared=True)
+def poll_data(request, pk):
+  """Return the poll bundle as compact JSON for the front end."""
+  bundle = get_poll_bundle_or_404(pk)
+  return JsonResponse(bundle, json_dumps_params={"separators": (",", ":")})
+
+
+def is_rate_limited(request, question_id):
+  """Check the vote rate of the client in memory, before any query."""
+  return throttle.is_vote_filter_enabled() and throttle.get_vote_filter().check_rate(request, question_id)
+
+def is_duplicate_vote(request, question_id, choice_id):
+  """Check a vote against the recent ones, once its choice was validated."""
+  return throttle.is_vote_filter_enabled() and throttle.get_vote_filter().check_duplicate(
+    request, question_id, choice_id
+  )
+
+def too_many_votes(response):
+  response["Retry-After"] = str(throttle.get_vote_filter().retry_after)
+  return response
+
+def question_closed(question_id, choice_id):
+  """Query whether the question of a choice is closed; empty if the choice is not one of its."""
+  return Choice.objects.filter(pk=choice_id, question_id=question_id).values_list("question__is_closed", flat=True)
 
 def vote(request, question_id):
-  question = get_object_or_404(Question, pk=question_id)
+  if is_rate_limited(request, question_id):
+    return too_many_votes(HttpResponse("Too many votes, try again later.", status=429))
+
   try:
-    selected_choice = question.choice_set.get(pk=request.POST["choice"])
-  except (KeyError, Choice.DoesNotExist):
+    choice_id = int(request.POST["choice"])
+  except (KeyError, ValueError):
+    choice_id = None
+
+  closed = None if choice_id is None else question_closed(question_id, choice_id).first()
+  if closed is None or closed:
     # Redisplay the question voting form.
+    bundle = get_poll_bundle_or_404(question_id)
     context = {
-      "question": question,
-      "error_message": "You didn't select a choice.",
+      "question": bundle,
+      "choices": bundle["choices"],
+      "error_message": "This poll is closed." if closed else "You didn't select a choice.",
     }
-    return render(request, "polls/detail.html", context)
+    return TemplateResponse(request, "polls/detail.html", context)
   else:
-    selected_choice.votes += 1
-    selected_choice.save()
+    # A duplicate was already counted: answer like the first submission did.
+    if not is_duplicate_vote(request, question_id, choice_id):
+      record_vote(question_id, choice_id)
     # Always return an HttpResponseRedirect after successfully dealing
     # with POST data. This prevents data from being posted twice if a
     # user hits the Back button.
-    return HttpResponseRedirect(reverse("polls:results", args=(question.id,)))
-    
+    return HttpResponseRedirect(reverse("polls:results", args=(question_id,)))
+
+async def vote_async(request, question_id):
+  """Validate the choice and queue the vote; polls_drain_votes applies it later."""
+  if request.method != "POST":
+    return HttpResponseNotAllowed(["POST"])
+
+  if is_rate_limited(request, question_id):
+    return too_many_votes(JsonResponse({"error": "Too many votes, try again later."}, status=429))
+
+  try:
+    choice_id = int(request.POST["choice"])
+  except (KeyError, ValueError):
+    return JsonResponse({"error": "You didn't select a choice."}, status=400)
+
+  closed = await question_closed(question_id, choice_id).afirst()
+  if closed is None:
+    return JsonResponse({"error": "You didn't select a choice."}, status=400)
+  if closed:
+    return JsonResponse({"error": "This poll is closed."}, status=409)
+  if is_duplicate_vote(request, question_id, choice_id):
+    return JsonResponse({"error": "This vote was already submitted."}, status=409)
+
+  await VoteOutbox.objects.acreate(question_id=question_id, choice_id=choice_id)
+  await sync_to_async(tallies.add_pending)(question_id, 1)
+  return JsonResponse({"queued": True}, status=202)
+
 def results(request, question_id):
   question = get_object_or_404(Question, pk=question_id)
   context = {"question": question}
@@ -69,7 +346,6 @@ def contact_form(request):
     if request.method == "POST":
         # create a form instance and populate it with data from the request:
         form = ContactForm(request.POST)
-        print('Form - POST: ', form)
         
         if form.is_valid():
           subject = form.cleaned_data["subject"]
@@ -81,16 +357,17 @@ def contact_form(request):
           if cc_myself:
               recipients.append(sender)
 
-          send_mail(subject, message, sender, recipients)
+          # Sent by polls_send_mail, off the request path.
+          enqueue_mail(subject, message, sender, recipients)
           return HttpResponseRedirect("/thanks/")
 
     # if a GET (or any other method) we'll create a blank form
     else:
         form = ContactForm()
 
-    return render(request, "polls/form.html", {"form": form})
+    return TemplateResponse(request, "polls/form.html", {"form": form})
 
 
 def name_form(request):
   form = MyForm()
-  return render(request, "polls/form.html", {"form": form})
\ No newline at end of file
+  return TemplateResponse(request, "polls/form.html", {"form": form})
\ No newline at end of file
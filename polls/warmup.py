@@ -0,0 +1,174 @@
+""" This module contains the warmup that pays the first-request costs of a worker up front """
+
+import importlib
+import os
+import sys
+import time
+
+from django.apps import apps
+from django.template import engines
+from django.template.backends.django import DjangoTemplates
+from django.urls import get_resolver, resolve, reverse
+
+# The modules imported on the first requests, not by Django at startup. The admin is left
+# out, since it needs django.contrib.admin.
+MODULES = [
+    "polls.loaders",
+    "polls.routers",
+    "polls.tallies",
+    "polls.counters",
+    "polls.history",
+    "polls.mail",
+    "polls.metrics",
+    "polls.middleware",
+    "polls.throttle",
+    "polls.search",
+    "polls.streams",
+    "polls.widgets",
+    "polls.forms",
+    "polls.pagination",
+    "polls.views",
+    "polls.urls",
+    "polls.templatetags.utils",
+    "polls.templatetags.memo",
+    "polls.templatetags.renderers",
+    "polls.templatetags.atoms_tags",
+    "polls.templatetags.molecules_tags",
+    "polls.templatetags.scripts_tags",
+    "polls.templatetags.stylesheets_tags",
+]
+
+
+def import_modules():
+    """
+    Imports the polls modules.
+
+    Returns:
+        dict: The import time in seconds of each module, or None for the modules that
+        were already imported.
+    """
+    timings = {}
+    for name in MODULES:
+        if name in sys.modules:
+            timings[name] = None
+            continue
+        start = time.perf_counter()
+        importlib.import_module(name)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def get_template_names():
+    """ Returns the names of the polls templates, components included. """
+    directory = os.path.join(apps.get_app_config("polls").path, "templates")
+    names = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if filename.endswith(".html"):
+                names.append(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, "/"))
+    return names
+
+
+def compile_templates():
+    """
+    Compiles every polls template with each Django template engine.
+
+    Engines with the cached loader, the default, keep the compiled templates for the
+    life of the process.
+
+    Returns:
+        dict: The compile time in seconds of each template.
+    """
+    timings = {}
+    for name in get_template_names():
+        start = time.perf_counter()
+        for engine in engines.all():
+            if isinstance(engine, DjangoTemplates):
+                engine.get_template(name)
+        timings[name] = time.perf_counter() - start
+    return timings
+
+
+def render_forms():
+    """
+    Renders the polls forms once, which compiles the form and widget templates.
+
+    Returns:
+        dict: The render time in seconds of each form.
+    """
+    from .forms import ContactForm, MyForm
+
+    timings = {}
+    for form_class in (ContactForm, MyForm):
+        start = time.perf_counter()
+        str(form_class())
+        timings[form_class.__name__] = time.perf_counter() - start
+    return timings
+
+
+def build_manifests():
+    """
+    Builds the in-memory manifests of the static folders read by the asset tags.
+
+    Returns:
+        dict: The build time in seconds of each folder.
+    """
+    from .templatetags.utils import MANIFEST_FOLDERS, get_static_manifest
+
+    timings = {}
+    for key in MANIFEST_FOLDERS:
+        start = time.perf_counter()
+        get_static_manifest(*key)
+        timings["|".join(key)] = time.perf_counter() - start
+    return timings
+
+
+def resolve_routes():
+    """
+    Builds the URL resolver of the project, then reverses and resolves every ``polls:``
+    route, with 1 for each path argument.
+
+    Returns:
+        dict: The time in seconds of each route, by route name. Empty when the polls URLs
+        are not included under the "polls" namespace.
+    """
+    timings = {}
+    start = time.perf_counter()
+    resolver = get_resolver()
+    namespaces = resolver.namespace_dict
+    timings["resolver"] = time.perf_counter() - start
+    if "polls" not in namespaces:
+        return timings
+
+    _, polls_resolver = namespaces["polls"]
+    for pattern in polls_resolver.url_patterns:
+        if not pattern.name:
+            continue
+        start = time.perf_counter()
+        kwargs = {name: 1 for name in getattr(pattern.pattern, "converters", {})}
+        resolve(reverse(f"polls:{pattern.name}", kwargs=kwargs))
+        timings[f"polls:{pattern.name}"] = time.perf_counter() - start
+    return timings
+
+
+STEPS = {
+    "imports": import_modules,
+    "templates": compile_templates,
+    "forms": render_forms,
+    "manifests": build_manifests,
+    "routes": resolve_routes,
+}
+
+
+def warm_up(steps=None):
+    """
+    Runs the warmup steps in order.
+
+    Args:
+        steps (list, optional): The names of the steps to run, from ``STEPS``. Defaults to all.
+
+    Returns:
+        dict: Per step, the timings it returned.
+    """
+    return {name: STEPS[name]() for name in steps or STEPS}
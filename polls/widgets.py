@@ -1,6 +1,86 @@
-from django.forms import Widget, TextInput
+from django.conf import settings
+from django.forms import CheckboxInput, EmailInput, SelectDateWidget, Textarea, Widget, TextInput
 from django.template import loader
+from django.utils.html import conditional_escape
 from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .templatetags.memo import make_key, render_cache
+
+# Stands in for the value while the HTML of a widget is cached, see CachedRenderMixin.
+VALUE_SLOT = "\x00polls-value\x00"
+
+
+def is_form_cache_enabled():
+    """ Returns whether widget HTML is cached, from ``POLLS_FORM_CACHE`` (default False). """
+    return getattr(settings, "POLLS_FORM_CACHE", False)
+
+
+class CachedRenderMixin:
+    """
+    Caches the HTML of a widget in the component LRU, ``memo.render_cache``, so option
+    lists and widget chrome are rendered once per configuration, name and attrs.
+
+    With ``value_slot``, for widgets printing their value as is, the HTML is rendered once
+    with a placeholder that each render replaces with its escaped value. Otherwise the
+    value is part of the key, and values that cannot be are rendered uncached.
+    """
+    value_slot = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The arguments the widget was built with; deep copies of the widget keep it.
+        self._render_key = make_key(f"{type(self).__module__}.{type(self).__qualname__}", args, kwargs, True)
+
+    def _value_key(self, value):
+        if self.value_slot:
+            return self.format_value(value) is not None
+        if make_key("value", (value,), {}, True) is not None:
+            return value
+        return ("formatted", self.format_value(value))
+
+    def render(self, name, value, attrs=None, renderer=None):
+        key = None
+        if is_form_cache_enabled() and self._render_key is not None:
+            value_key = self._value_key(value)
+            key = make_key(
+                "widget",
+                (self._render_key, name, value_key, self.is_required, get_language(), type(renderer).__name__),
+                {"attrs": self.attrs, "extra_attrs": attrs or {}},
+                True,
+            )
+        if key is None:
+            return super().render(name, value, attrs, renderer)
+
+        slot = self.value_slot and value_key
+        html = render_cache.get(key)
+        if html is None:
+            html = super().render(name, VALUE_SLOT if slot else value, attrs, renderer)
+            render_cache.set(key, html)
+        if slot:
+            html = mark_safe(html.replace(VALUE_SLOT, conditional_escape(self.format_value(value))))
+        return html
+
+
+class CachedTextInput(CachedRenderMixin, TextInput):
+    value_slot = True
+
+
+class CachedEmailInput(CachedRenderMixin, EmailInput):
+    value_slot = True
+
+
+class CachedTextarea(CachedRenderMixin, Textarea):
+    value_slot = True
+
+
+class CachedCheckboxInput(CachedRenderMixin, CheckboxInput):
+    pass
+
+
+class CachedSelectDateWidget(CachedRenderMixin, SelectDateWidget):
+    pass
+
 
 class CustomTextInput(Widget):
     name = 'Name Test'
@@ -24,8 +104,9 @@ class CustomTextInput2(TextInput):
         
         return super().render(name, value, attrs)
 
-class PasswordInput(Widget):
+class PasswordInput(CachedRenderMixin, Widget):
     input_type = "text"
+    value_slot = True
     template_name = "polls/components/molecules/input_password.html"
 
     def __init__(self, attrs=None, left_icon=None):